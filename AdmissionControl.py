@@ -0,0 +1,178 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+
+class DeadlineHeadroomIndex:
+    """
+    Segment tree over deadline slots 1..size holding the headroom of each slot, with suffix add and
+    suffix minimum in O(log size).
+
+    The headroom of slot k is the energy that can be delivered by the end of slot k minus the
+    remaining energy of the sessions that must be served by then.
+    Each node stores the minimum of its range plus a pending addition for the whole range.
+    """
+
+    def __init__(self, headroom: Sequence[float]):
+        self.size = len(headroom)
+        n = 1
+        while n < max(self.size, 1):
+            n *= 2
+        self.__leaves = n
+        self.__min = [math.inf] * (2 * n)
+        self.__add = [0.0] * (2 * n)
+        self.__min[n:n + self.size] = list(headroom)
+        for node in range(n - 1, 0, -1):
+            self.__min[node] = min(self.__min[2 * node], self.__min[2 * node + 1])
+
+    def values(self) -> List[float]:
+        """Headroom of every slot, pushing the pending additions down to the leaves; O(size)."""
+        values = []
+        self.__collect(1, 0, self.__leaves, 0.0, values)
+        return values[:self.size]
+
+    def add(self, slot: int, value: float):
+        """Adds value to the headroom of every slot from `slot` (1-based) on."""
+        if slot <= self.size:
+            self.__update(1, 0, self.__leaves, max(slot, 1) - 1, value)
+
+    def min_from(self, slot: int) -> float:
+        """Smallest headroom of the slots from `slot` (1-based) on, inf if there is none."""
+        if slot > self.size:
+            return math.inf
+        return self.__query(1, 0, self.__leaves, max(slot, 1) - 1)
+
+    def __collect(self, node, low, high, pending, values):
+        if low >= self.size:
+            return
+        if high - low == 1:
+            values.append(self.__min[node] + pending)
+            return
+        middle = (low + high) // 2
+        self.__collect(2 * node, low, middle, pending + self.__add[node], values)
+        self.__collect(2 * node + 1, middle, high, pending + self.__add[node], values)
+
+    def __update(self, node, low, high, start, value):
+        if high <= start:
+            return
+        if start <= low:
+            self.__min[node] += value
+            self.__add[node] += value
+            return
+        middle = (low + high) // 2
+        self.__update(2 * node, low, middle, start, value)
+        self.__update(2 * node + 1, middle, high, start, value)
+        self.__min[node] = min(self.__min[2 * node], self.__min[2 * node + 1]) + self.__add[node]
+
+    def __query(self, node, low, high, start):
+        if high <= start:
+            return math.inf
+        if start <= low:
+            return self.__min[node]
+        middle = (low + high) // 2
+        return min(self.__query(2 * node, low, middle, start), self.__query(2 * node + 1, middle, high, start)) + self.__add[node]
+
+
+class AdmissionController:
+    """
+    Decides on all arrivals of a step at once, before they are queued.
+
+    Plans against a fixed capacity, by default the supply when the first arrivals are decided.
+    Deadline slot k is the k-th time step since the simulation start; its headroom is the energy
+    the capacity delivers up to slot k minus the remaining energy of the admitted sessions due by
+    then. A request is admitted if its charging point can deliver its energy by its requested
+    leave time and if the headroom of its slot and of every later slot covers it: the earliest
+    deadline first feasibility condition. The headroom is kept in a DeadlineHeadroomIndex that the
+    simulation updates as sessions are admitted, charged and leave, so each decision and each
+    update takes O(log n) and the index is never rebuilt from the queue.
+
+    The condition is necessary, not sufficient: admitted sessions can still miss their energy if
+    the supply falls below the planned capacity, if their nominal power limits how early they can
+    charge, or if the allocator does not serve deadlines in order. The simulation therefore uses
+    EarliestDeadlineFirstStrategy by default when admission control is on.
+
+    :param capacity_factor: share of the capacity planned for, below 1 keeps a reserve
+    :param capacity: planned capacity in kW, the supply at the first decision if None
+    """
+
+    def __init__(self, capacity_factor: float = 1.0, capacity: Optional[float] = None):
+        self.capacity_factor = capacity_factor
+        self.capacity = capacity
+        self.admitted = 0
+        self.rejected = 0
+        self.__index: Optional[DeadlineHeadroomIndex] = None
+        self.__slot_energy = 0.0  # Energy the planned capacity delivers per slot
+        self.__booked: Dict[str, Tuple[int, float]] = {}  # session_id -> (deadline slot, remaining energy)
+        self.__booked_energy = 0.0
+
+    @staticmethod
+    def __slot(simulation, minutes_to_leave: float) -> int:
+        """Deadline slot of a request: the number of whole steps from the start to its leave time."""
+        minutes = simulation.elapsed_minutes() + minutes_to_leave
+        return max(int(math.ceil(minutes / simulation.time_step)), simulation.current_step + 1)
+
+    def __ensure(self, simulation, slot: int):
+        """Creates the index on first use and grows it so that it holds `slot`."""
+        if self.__index is None:
+            capacity = self.capacity if self.capacity is not None else simulation.power_supply
+            self.__slot_energy = capacity * self.capacity_factor * (simulation.time_step / 60)
+            self.__index = DeadlineHeadroomIndex([])
+        size = self.__index.size
+        if slot <= size:
+            return
+        # Slots past every booked deadline have the full booked energy due; amortized O(1) per slot
+        new_size = max(2 * size, slot, 64)
+        values = self.__index.values()
+        values.extend(self.__slot_energy * k - self.__booked_energy for k in range(size + 1, new_size + 1))
+        self.__index = DeadlineHeadroomIndex(values)
+
+    def decide(self, simulation, arrivals: List[AvailableFlexibilityRequest]
+               ) -> Tuple[List[AvailableFlexibilityRequest], List[AvailableFlexibilityRequest]]:
+        """
+        Splits the arrivals of the current step into admitted and rejected requests, in arrival order.
+        """
+        admitted, rejected = [], []
+        elapsed_minutes = simulation.elapsed_minutes()
+        for request in arrivals:
+            energy = request.requested_energy - request.charged_energy
+            minutes = simulation.minutes_to_leave(request, elapsed_minutes)
+            slot = self.__slot(simulation, minutes)
+            self.__ensure(simulation, slot)
+            steps = max(int(math.ceil(minutes / simulation.time_step)), 1)
+            reachable = request.evse_id.nominal_power_cp * steps * (simulation.time_step / 60) >= energy
+            # Headroom counts from the start; the steps already passed are no longer available
+            headroom = self.__index.min_from(slot) - self.__slot_energy * simulation.current_step
+            if reachable and headroom >= energy:
+                self.__index.add(slot, -energy)
+                self.__booked[request.session_id] = (slot, energy)
+                self.__booked_energy += energy
+                admitted.append(request)
+            else:
+                rejected.append(request)
+        self.admitted += len(admitted)
+        self.rejected += len(rejected)
+        return admitted, rejected
+
+    def update(self, session_id: str, remaining_energy: float):
+        """Books the energy an admitted session charged since its last update."""
+        booking = self.__booked.get(session_id)
+        if booking is None:
+            return
+        slot, booked = booking
+        remaining_energy = max(remaining_energy, 0.0)
+        if remaining_energy != booked:
+            self.__index.add(slot, booked - remaining_energy)
+            self.__booked[session_id] = (slot, remaining_energy)
+            self.__booked_energy += remaining_energy - booked
+
+    def release(self, session_id: str):
+        """Returns the remaining energy of a session that completed, departed or was rejected."""
+        booking = self.__booked.pop(session_id, None)
+        if booking is None:
+            return
+        slot, booked = booking
+        self.__index.add(slot, booked)
+        self.__booked_energy -= booked
+
+    def __len__(self):
+        return len(self.__booked)
@@ -0,0 +1,170 @@
+import numpy as np
+from abc import ABC, abstractmethod
+
+
+class AllocationStrategy(ABC):
+    """
+    Splits the power supply among the active sessions when their nominal power exceeds it.
+
+    Strategies work on arrays with one entry per active session, in queue order, and return the
+    allocated power in kW. Sessions with no remaining time must get 0.
+    """
+
+    @abstractmethod
+    def allocate(self, power_supply: float, nominal_power: np.ndarray, remaining_energy: np.ndarray,
+                 remaining_hours: np.ndarray, power_flexibility: np.ndarray, step_hours: float) -> np.ndarray:
+        """
+        :param power_supply: available capacity in kW
+        :param nominal_power: nominal power of each session's charging point in kW
+        :param remaining_energy: energy still to be charged in kWh
+        :param remaining_hours: hours until each session's requested leave time
+        :param power_flexibility: power flexibility of each session in kW
+        :param step_hours: length of the time step in hours
+        :return: allocated power in kW
+        """
+
+
+def _floors_and_caps(nominal_power, remaining_energy, remaining_hours, step_hours):
+    """
+    Power each session cannot postpone and the most it can use in this step.
+
+    :return: tuple of (mask of sessions still charging, floor in kW, cap in kW)
+    """
+    charging = (remaining_hours > 0) & (remaining_energy > 0)
+    cap = np.where(charging, np.minimum(nominal_power, np.maximum(remaining_energy, 0) / step_hours), 0.0)
+    deferrable_energy = nominal_power * np.maximum(remaining_hours - step_hours, 0)
+    floor = np.minimum(np.maximum(remaining_energy - deferrable_energy, 0) / step_hours, cap)
+    return charging, floor, cap
+
+
+class AllocationFactorStrategy(AllocationStrategy):
+    """
+    The original heuristic: one global allocation factor reduces each session's required power by
+    a share of its power flexibility, then power is handed out greedily in queue order.
+
+    Sessions late in the queue only get what the earlier ones left over.
+    """
+
+    def allocate(self, power_supply, nominal_power, remaining_energy, remaining_hours, power_flexibility, step_hours):
+        charging = remaining_hours > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            required_power = remaining_energy / remaining_hours
+        total_power_demand = np.minimum(nominal_power, required_power)[charging].sum()
+        flexibility_supply = power_flexibility.sum()
+        allocation_factor = (total_power_demand - power_supply) / flexibility_supply if flexibility_supply > 0 else 1.0
+        allocated_power = np.minimum(np.maximum(0, required_power - allocation_factor * power_flexibility), nominal_power)
+        allocated_power = np.where(charging, allocated_power, 0.0)
+        # greedy allocation in queue order: later requests only get what the earlier ones left
+        cumulative = np.minimum(np.cumsum(allocated_power), power_supply)
+        return np.diff(cumulative, prepend=0.0)
+
+
+class WaterFillingStrategy(AllocationStrategy):
+    """
+    Deadline-aware water-filling, independent of queue order.
+
+    Each session first gets the power it cannot postpone: the part of its remaining energy that
+    would not fit into the time after this step at nominal power. If the supply does not cover
+    these floors they are served earliest deadline first. The rest of the supply is shared so that
+    every session gets clip(weight * level, floor, cap), with one common level chosen to use all of
+    the supply. The cap is the nominal power, or less if the session finishes within the step.
+    Solving for the level takes one sort of the 2n breakpoints, O(n log n).
+    """
+
+    def weights(self, nominal_power, remaining_energy, remaining_hours):
+        """Share of the water level each session receives; equal shares by default."""
+        return np.ones_like(nominal_power, dtype=np.float64)
+
+    def allocate(self, power_supply, nominal_power, remaining_energy, remaining_hours, power_flexibility, step_hours):
+        charging, floor, cap = _floors_and_caps(nominal_power, remaining_energy, remaining_hours, step_hours)
+
+        if power_supply >= cap.sum():
+            return cap
+        if power_supply <= floor.sum():
+            # Not even the floors fit: serve them earliest deadline first
+            order = np.argsort(remaining_hours, kind="stable")
+            allocated_power = np.zeros_like(floor)
+            cumulative = np.minimum(np.cumsum(floor[order]), max(power_supply, 0.0))
+            allocated_power[order] = np.diff(cumulative, prepend=0.0)
+            return allocated_power
+        weights = np.where(charging, self.weights(nominal_power, remaining_energy, remaining_hours), 0.0)
+        return self.fill(power_supply, floor, cap, weights)
+
+    @staticmethod
+    def fill(power_supply, floor, cap, weights):
+        """
+        Finds the level L with sum(clip(weights * L, floor, cap)) == power_supply, for
+        sum(floor) <= power_supply <= sum(cap), and returns the clipped allocation.
+        """
+        positive = weights > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lower = np.where(positive, floor / weights, np.inf)
+            upper = np.where(positive, cap / weights, np.inf)
+        w = np.where(positive, weights, 0.0)
+
+        # Sessions whose lower breakpoint lies below L are no longer at their floor, those whose
+        # upper breakpoint lies below L are at their cap; the supply used is piecewise linear in L
+        lower_order = np.argsort(lower, kind="stable")
+        upper_order = np.argsort(upper, kind="stable")
+        lower_sorted = lower[lower_order]
+        upper_sorted = upper[upper_order]
+        floor_below = np.concatenate(([0.0], np.cumsum(floor[lower_order])))
+        weight_lower = np.concatenate(([0.0], np.cumsum(w[lower_order])))
+        cap_below = np.concatenate(([0.0], np.cumsum(cap[upper_order])))
+        weight_upper = np.concatenate(([0.0], np.cumsum(w[upper_order])))
+
+        def used(level):
+            a = np.searchsorted(lower_sorted, level, side="left")
+            b = np.searchsorted(upper_sorted, level, side="left")
+            return floor_below[-1] - floor_below[a] + cap_below[b] + level * (weight_lower[a] - weight_upper[b])
+
+        points = np.concatenate((lower_sorted, upper_sorted))
+        points = np.unique(points[np.isfinite(points)])
+        if len(points) == 0:
+            return floor.copy()
+        supply_at = used(points)
+        j = int(np.searchsorted(supply_at, power_supply, side="left"))
+        if j == 0:
+            level = points[0]
+        elif j == len(points):
+            level = points[-1]
+        else:
+            slope = (supply_at[j] - supply_at[j - 1]) / (points[j] - points[j - 1])
+            level = points[j - 1] + (power_supply - supply_at[j - 1]) / slope if slope > 0 else points[j - 1]
+        return np.clip(w * level, floor, cap)
+
+
+class ProportionalFairStrategy(WaterFillingStrategy):
+    """
+    Water-filling weighted by each session's required power (remaining energy over remaining time,
+    at most the nominal power), so every session receives the same fraction of what it needs.
+
+    This is the solution that maximises the sum of weighted log allocations within floors and caps.
+    """
+
+    def weights(self, nominal_power, remaining_energy, remaining_hours):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            required_power = np.where(remaining_hours > 0, remaining_energy / remaining_hours, 0.0)
+        return np.minimum(nominal_power, np.maximum(required_power, 0.0))
+
+
+class EarliestDeadlineFirstStrategy(AllocationStrategy):
+    """
+    Earliest deadline first with floors, the order AdmissionController plans with.
+
+    Every session first gets the power it cannot postpone (as in WaterFillingStrategy), earliest
+    deadline first; what is left of the supply then tops sessions up to their cap in the same
+    order, so energy is charged as early as possible for the most urgent sessions. O(n log n).
+    """
+
+    def allocate(self, power_supply, nominal_power, remaining_energy, remaining_hours, power_flexibility, step_hours):
+        charging, floor, cap = _floors_and_caps(nominal_power, remaining_energy, remaining_hours, step_hours)
+        supply = max(power_supply, 0.0)
+        if supply >= cap.sum():
+            return cap
+        order = np.argsort(np.where(charging, remaining_hours, np.inf), kind="stable")
+        allocated_power = np.zeros_like(cap)
+        floors = np.diff(np.minimum(np.cumsum(floor[order]), supply), prepend=0.0)
+        top_up = np.diff(np.minimum(np.cumsum(cap[order] - floors), supply - floors.sum()), prepend=0.0)
+        allocated_power[order] = floors + top_up
+        return allocated_power
@@ -0,0 +1,161 @@
+"""
+Benchmark suite for FlexibilitySimulation.
+
+Runs synthetic fleets of increasing size through the simulation and reports steps per second,
+peak memory and the time spent in each phase of the step loop as JSON, so results can be
+stored per commit and compared:
+
+    python Benchmark.py --output bench.json
+    python Benchmark.py --sizes 10 1000 --engine vectorized --compare bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, tracemalloc is used instead
+    resource = None
+
+from FlexSimulation import FlexibilitySimulation
+from FleetEngine import VectorizedFlexibilitySimulation
+from SimulationEvents import NullSink
+from SimulationProfiler import SimulationProfiler
+from SupplyProfile import ConstantSupplyProfile
+from SyntheticFleet import SyntheticFleetGenerator, exponential
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+ENGINES = {"object": FlexibilitySimulation, "vectorized": VectorizedFlexibilitySimulation}
+EPOCH = datetime(2024, 1, 1)
+
+
+def run_case(sessions: int, engine: str, horizon_hours: float, supply_per_car_kw: float, seed: int,
+             trace_memory: bool = False):
+    """Runs one benchmark case and returns its measurements as a dict."""
+    generator = SyntheticFleetGenerator(seed=seed, inter_arrival_minutes=exponential(horizon_hours * 60 / sessions))
+    capacity = max(supply_per_car_kw * generator.expected_concurrency(min(sessions, 10000)), supply_per_car_kw)
+    if trace_memory:
+        tracemalloc.start()
+
+    build_start = time.perf_counter()
+    requests = generator.generate(sessions, EPOCH).to_requests()
+    build_seconds = time.perf_counter() - build_start
+
+    profiler = SimulationProfiler(record_steps=False)
+    simulation = ENGINES[engine](capacity, 15, events=NullSink(), start_time=EPOCH,
+                                 supply_profile=ConstantSupplyProfile(capacity), profiler=profiler)
+    run_start = time.perf_counter()
+    simulation.run_simulation(requests, plot=False)
+    run_seconds = time.perf_counter() - run_start
+
+    if trace_memory:
+        peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    elif resource is not None:
+        # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+        scale = 2**20 if sys.platform == "darwin" else 2**10
+        peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    else:
+        peak_memory_mb = None
+
+    steps = simulation.current_step
+    return {
+        "sessions": sessions,
+        "engine": engine,
+        "capacity_kw": capacity,
+        "steps": steps,
+        "build_seconds": build_seconds,
+        "run_seconds": run_seconds,
+        "steps_per_second": steps / run_seconds if run_seconds > 0 else None,
+        "peak_memory_mb": peak_memory_mb,
+        "completed": len(simulation.completed_requests),
+        "rejected": len(simulation.rejected_requests),
+        "departed": len(simulation.departed_requests),
+        "phase_seconds": {name: stats.seconds for name, stats in profiler.phases.items()},
+        "phase_calls": {name: stats.calls for name, stats in profiler.phases.items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, engines=("object",), horizon_hours: float = 168, supply_per_car_kw: float = 7.0,
+              seed: int = 0, trace_memory: bool = False, isolate: bool = True):
+    """
+    Runs every (size, engine) case, each in a fresh process when isolate is True so that
+    peak memory is measured per case.
+    """
+    cases = []
+    for engine in engines:
+        for sessions in sizes:
+            arguments = (sessions, engine, horizon_hours, supply_per_car_kw, seed, trace_memory)
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    cases.append(pool.submit(run_case, *arguments).result())
+            else:
+                cases.append(run_case(*arguments))
+            print(f"{engine:>10} {sessions:>7} sessions: {cases[-1]['steps_per_second']:.1f} steps/s, "
+                  f"{cases[-1]['run_seconds']:.2f} s", file=sys.stderr)
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"horizon_hours": horizon_hours, "supply_per_car_kw": supply_per_car_kw, "seed": seed},
+        "cases": cases,
+    }
+
+
+def compare(current, baseline):
+    """Prints the relative change of steps per second and peak memory per case against a baseline report."""
+    previous = {(case["engine"], case["sessions"]): case for case in baseline["cases"]}
+    for case in current["cases"]:
+        old = previous.get((case["engine"], case["sessions"]))
+        if old is None or not old["steps_per_second"] or not case["steps_per_second"]:
+            continue
+        speed = case["steps_per_second"] / old["steps_per_second"]
+        line = f"{case['engine']:>10} {case['sessions']:>7} sessions: {speed:.2f}x steps/s"
+        if case["peak_memory_mb"] and old["peak_memory_mb"]:
+            line += f", {case['peak_memory_mb'] / old['peak_memory_mb']:.2f}x peak memory"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--engine", choices=sorted(ENGINES) + ["all"], default="object")
+    parser.add_argument("--horizon-hours", type=float, default=168, help="period over which the sessions arrive")
+    parser.add_argument("--supply-per-car", type=float, default=7.0, help="site capacity per concurrent car in kW")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="measure peak memory with tracemalloc (slow)")
+    parser.add_argument("--in-process", action="store_true", help="run all cases in this process")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    engines = sorted(ENGINES) if args.engine == "all" else [args.engine]
+    report = run_suite(args.sizes, engines, args.horizon_hours, args.supply_per_car, args.seed,
+                       args.trace_memory, not args.in_process)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
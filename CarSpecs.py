@@ -1,4 +1,6 @@
 class CarSpecs:
+    __slots__ = ("__make", "__model", "__year", "__battery_capacity_in_kwh", "__initial_soc", "__soc")
+
     # constructor
     def __init__(self, make: str, model: str, year: int, battery_capacity_in_kwh: float, initial_soc:float):
         self.__make = make
@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Sequence
+from ChargingPoint import ChargingPoint
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+
+class ConnectorPool:
+    """
+    Charging points of a site that are handed out to arriving cars on demand.
+
+    Free connectors are kept on a free-list stack of indices and the connector of every plugged-in
+    session is indexed by session_id, so assigning and releasing a connector is O(1) regardless
+    of the number of charging points. Occupancy is integrated over time on every change, which
+    also covers runs of steps applied at once.
+    Times are minutes since the simulation start.
+    """
+
+    def __init__(self, connectors: Sequence[ChargingPoint]):
+        self.connectors: List[ChargingPoint] = list(connectors)
+        if not self.connectors:
+            raise ValueError("A connector pool needs at least one charging point.")
+        self.__free = list(range(len(self.connectors) - 1, -1, -1))  # Lowest index is handed out first
+        self.__assigned: Dict[str, int] = {}
+        self.__last_change = 0.0
+        self.__busy_minutes = 0.0
+        self.peak_busy = 0
+        self.served = 0
+        self.waited = 0  # Sessions that had to wait for a connector
+        self.abandoned = 0  # Sessions that left before a connector became free
+        self.total_wait_minutes = 0.0
+        self.max_wait_minutes = 0.0
+        for connector in self.connectors:
+            connector.setAvailable(True)
+            connector.finish_charging()
+
+    @classmethod
+    def uniform(cls, count: int, nominal_power: float = 11) -> "ConnectorPool":
+        """Pool of count charging points with ids 1..count and the same nominal power."""
+        return cls([ChargingPoint(index + 1, nominal_power) for index in range(count)])
+
+    @property
+    def free(self) -> int:
+        return len(self.__free)
+
+    @property
+    def busy(self) -> int:
+        return len(self.__assigned)
+
+    def connector_of(self, session_id: str) -> Optional[ChargingPoint]:
+        index = self.__assigned.get(session_id)
+        return self.connectors[index] if index is not None else None
+
+    def assign(self, request: AvailableFlexibilityRequest, minute: float, waited_minutes: float = 0.0) -> ChargingPoint:
+        """Plugs a request into a free connector; raises IndexError if every connector is busy."""
+        if request.session_id in self.__assigned:
+            raise ValueError(f"Session {request.session_id} already holds a connector.")
+        index = self.__free.pop()
+        self.__account(minute)
+        self.__assigned[request.session_id] = index
+        self.peak_busy = max(self.peak_busy, len(self.__assigned))
+        connector = self.connectors[index]
+        connector.setAvailable(False)
+        connector.assign_request(request)
+        request.evse_id = connector
+        self.served += 1
+        if waited_minutes > 0:
+            self.waited += 1
+            self.total_wait_minutes += waited_minutes
+            self.max_wait_minutes = max(self.max_wait_minutes, waited_minutes)
+        return connector
+
+    def release(self, session_id: str, minute: float) -> Optional[ChargingPoint]:
+        """Frees the connector of a session, if it holds one."""
+        if session_id not in self.__assigned:
+            return None
+        self.__account(minute)
+        index = self.__assigned.pop(session_id)
+        connector = self.connectors[index]
+        connector.finish_charging()
+        connector.setAvailable(True)
+        self.__free.append(index)
+        return connector
+
+    def record_abandoned(self, waited_minutes: float):
+        """Counts a car that gave up waiting."""
+        self.abandoned += 1
+        self.total_wait_minutes += waited_minutes
+        self.max_wait_minutes = max(self.max_wait_minutes, waited_minutes)
+
+    def statistics(self, minute: float) -> dict:
+        """Occupancy and wait-time statistics up to the given minute."""
+        self.__account(minute)
+        waiting_sessions = self.waited + self.abandoned
+        return {
+            "connectors": len(self.connectors),
+            "mean_occupancy": self.__busy_minutes / (minute * len(self.connectors)) if minute > 0 and self.connectors else 0.0,
+            "peak_busy": self.peak_busy,
+            "served": self.served,
+            "waited": self.waited,
+            "abandoned": self.abandoned,
+            "mean_wait_minutes": self.total_wait_minutes / waiting_sessions if waiting_sessions else 0.0,
+            "max_wait_minutes": self.max_wait_minutes,
+        }
+
+    def __account(self, minute: float):
+        self.__busy_minutes += len(self.__assigned) * max(0.0, minute - self.__last_change)
+        self.__last_change = max(self.__last_change, minute)
+
+    def __len__(self):
+        return len(self.connectors)
@@ -0,0 +1,283 @@
+import numpy as np
+from datetime import timedelta
+from typing import Iterable, List, Optional
+from FlexibilityRequest import AvailableFlexibilityRequest
+from FlexibilityCalculator import FlexibilityCalculator, FLEXIBILITY_THRESHOLD_MINUTES
+from FlexSimulation import FlexibilitySimulation
+from AllocationStrategies import AllocationStrategy
+from SimulationEvents import LoadManagementEvent
+
+
+class FleetEngine:
+    """
+    Struct-of-arrays store for the queued fleet of a simulation.
+
+    Every queued request occupies one row of the NumPy columns below, in queue order, so
+    demand, flexibility and allocation can be computed for the whole fleet at once.
+    Times are kept as float minutes relative to the simulation epoch.
+    The request objects are only written back when they leave the fleet or on ``sync``.
+    """
+
+    def __init__(self, epoch, capacity: int = 1024, threshold_minutes: float = FLEXIBILITY_THRESHOLD_MINUTES):
+        self.epoch = epoch
+        self.threshold_minutes = threshold_minutes  # See FlexibilityCalculator.calculate_power_flexibility
+        self.size = 0
+        self.requests: List[AvailableFlexibilityRequest] = []
+        self.requested_energy = np.zeros(capacity)
+        self.charged_energy = np.zeros(capacity)
+        self.charged_time = np.zeros(capacity)
+        self.arrival_minutes = np.zeros(capacity)
+        self.leave_minutes = np.zeros(capacity)
+        self.nominal_power = np.zeros(capacity)
+        self.flexibility_contribution = np.zeros(capacity)
+        self.session_index = np.zeros(capacity, dtype=np.int64)  # Index of the session in a ResultRecorder
+
+    _columns = ("requested_energy", "charged_energy", "charged_time", "arrival_minutes",
+                "leave_minutes", "nominal_power", "flexibility_contribution", "session_index")
+
+    def to_minutes(self, moment):
+        """Converts a datetime to float minutes since the engine epoch."""
+        return (moment - self.epoch).total_seconds() / 60
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(2 * len(self.requested_energy), 1)
+        for name in self._columns:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, request: AvailableFlexibilityRequest, session_index: int = -1):
+        """Appends a request as the last row of the fleet."""
+        if self.size == len(self.requested_energy):
+            self._grow()
+        row = self.size
+        self.requested_energy[row] = request.requested_energy
+        self.charged_energy[row] = request.charged_energy
+        self.charged_time[row] = request.charged_time
+        self.arrival_minutes[row] = self.to_minutes(request.arrival_time)
+        self.leave_minutes[row] = self.to_minutes(request.requested_leave_time)
+        self.nominal_power[row] = request.evse_id.nominal_power_cp
+        self.flexibility_contribution[row] = request.flexibility_contribution
+        self.session_index[row] = session_index
+        self.requests.append(request)
+        self.size += 1
+
+    def sync(self, rows=None):
+        """Writes the column values of the given rows (default: all) back to the request objects."""
+        if rows is None:
+            rows = range(self.size)
+        for row in rows:
+            request = self.requests[row]
+            request.charged_energy = float(self.charged_energy[row])
+            request.charged_time = float(self.charged_time[row])
+            request.flexibility_contribution = float(self.flexibility_contribution[row])
+
+    def pop(self):
+        """Removes and returns the last request of the fleet."""
+        self.sync([self.size - 1])
+        self.size -= 1
+        return self.requests.pop()
+
+    def remove_rows(self, rows):
+        """Removes the given rows while keeping the queue order of the remaining requests."""
+        if len(rows) == 0:
+            return []
+        self.sync(rows)
+        keep = np.ones(self.size, dtype=bool)
+        keep[rows] = False
+        removed = [self.requests[row] for row in rows]
+        for name in self._columns:
+            column = getattr(self, name)
+            column[:keep.sum()] = column[:self.size][keep]
+        # mutate in place, the simulation shares this list as its queue
+        self.requests[:] = [r for r, k in zip(self.requests, keep) if k]
+        self.size = len(self.requests)
+        return removed
+
+    def advance(self, time_step):
+        """Advances the charged time of every queued request by one time step."""
+        self.charged_time[:self.size] += time_step
+
+    def active_rows(self, current_minute):
+        """Returns the rows whose plug-in window contains the current minute."""
+        n = self.size
+        return np.flatnonzero((self.arrival_minutes[:n] <= current_minute) & (current_minute < self.leave_minutes[:n]))
+
+    def departed_rows(self, current_minute):
+        """Returns the rows whose requested leave time has been reached."""
+        return np.flatnonzero(self.leave_minutes[:self.size] <= current_minute)
+
+    def flexibility_demand(self, power_supply):
+        """Vectorized counterpart of ``FlexibilitySimulation.flexibility_demand``."""
+        n = self.size
+        required_power = FlexibilityCalculator.required_power_batch(
+            self.requested_energy[:n], self.charged_energy[:n], self.arrival_minutes[:n], self.leave_minutes[:n],
+            self.charged_time[:n], self.nominal_power[:n], self.threshold_minutes)
+        return max(0.0, float(required_power.sum()) - power_supply)
+
+    def power_flexibility(self):
+        """Vectorized ``FlexibilityCalculator.calculate_power_flexibility`` for every row."""
+        n = self.size
+        return FlexibilityCalculator.power_flexibility_batch(
+            self.requested_energy[:n], self.charged_energy[:n], self.arrival_minutes[:n], self.leave_minutes[:n],
+            self.charged_time[:n], self.nominal_power[:n], self.threshold_minutes)
+
+    def flexibility_supply(self):
+        """Vectorized counterpart of ``FlexibilitySimulation.flexibility_supply``."""
+        return float(self.power_flexibility().sum())
+
+    def allocate(self, current_minute, power_supply, strategy: AllocationStrategy, step_hours: float):
+        """
+        Computes the power allocation for all active rows in one pass, splitting the supply with
+        the given strategy when the nominal power of the active rows exceeds it.
+
+        :return: tuple of (active rows, allocated power, flexibility contribution in kW or None
+                 when supply covers the instantaneous demand)
+        """
+        rows = self.active_rows(current_minute)
+        nominal = self.nominal_power[rows]
+        remaining_energy = self.requested_energy[rows] - self.charged_energy[rows]
+        remaining_time = (self.leave_minutes[rows] - current_minute) / 60
+        charging = remaining_time > 0
+
+        instantaneous_power_demand = nominal[charging].sum()
+        if instantaneous_power_demand <= power_supply:
+            return rows, nominal.copy(), None
+
+        power_flex = self.power_flexibility()[rows]
+        allocated_power = strategy.allocate(power_supply, nominal, remaining_energy, remaining_time, power_flex, step_hours)
+        return rows, allocated_power, nominal - allocated_power
+
+    def charge(self, rows, allocated_power, time_step):
+        """
+        Vectorized ``FlexibilitySimulation.allocate_power`` for the given rows.
+
+        :return: tuple of (mask of rows still within their charging window, mask of completed rows,
+                 hours after the step start at which each row completed)
+        """
+        charged = self.charged_energy[rows]
+        requested = self.requested_energy[rows]
+        remaining_time = (self.leave_minutes[rows] - self.arrival_minutes[rows] - self.charged_time[rows]) / 60
+        charging = remaining_time > 0
+        potential_energy_charged = allocated_power * (time_step / 60)
+        overshoot = charging & (charged + potential_energy_charged > requested)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            charging_complete_time = np.where(overshoot, (requested - charged) / allocated_power, time_step / 60)
+        new_charged = np.where(overshoot, charged + allocated_power * charging_complete_time,
+                               np.where(charging, charged + potential_energy_charged, charged))
+        self.charged_energy[rows] = new_charged
+        completed = charging & (new_charged >= requested)
+        return charging, completed, charging_complete_time
+
+
+class VectorizedFlexibilitySimulation(FlexibilitySimulation):
+    """
+    FlexibilitySimulation backed by a FleetEngine.
+
+    Produces the same allocations, completions and flexibility contributions as the
+    object-based path (within floating point tolerance) but computes them with array operations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engine = FleetEngine(self.start_time, threshold_minutes=self.aggregates.threshold_minutes)
+        self.queued_requests = self.engine.requests
+
+    def flexibility_demand(self):
+        return self.engine.flexibility_demand(self.power_supply)
+
+    def flexibility_supply(self):
+        return self.engine.flexibility_supply()
+
+    def add_request(self, request: AvailableFlexibilityRequest):
+        self.engine.add(request, self.recorder.session_index(request.session_id) if self.recorder is not None else -1)
+        self._on_accept(request)
+
+    def reject_new_request(self):
+        if self.engine.size:
+            self._on_reject(self.engine.pop())
+
+    def handle_departures(self):
+        departed = self.engine.departed_rows(self.engine.to_minutes(self.current_time))
+        for request in self.engine.remove_rows(departed):
+            self._on_depart(request)
+
+    def update_admission(self):
+        if self.admission is not None:
+            engine = self.engine
+            n = engine.size
+            remaining_energy = engine.requested_energy[:n] - engine.charged_energy[:n]
+            for request, energy in zip(engine.requests, remaining_energy.tolist()):
+                self.admission.update(request.session_id, energy)
+
+    def power_demand(self):
+        return self.engine.flexibility_demand(0.0)
+
+    def nominal_power_demand(self):
+        return float(self.engine.nominal_power[:self.engine.size].sum())
+
+    def has_active_requests(self):
+        return len(self.engine.active_rows(self.engine.to_minutes(self.current_time))) > 0
+
+    def allocate_flexibility_and_load_management(self):
+        engine = self.engine
+        if self.recorder is not None:
+            self.recorder.record_supply(self.current_step, self.power_supply)
+        rows, allocated_power, contribution = engine.allocate(engine.to_minutes(self.current_time), self.power_supply,
+                                                                self.allocation_strategy, self.time_step / 60)
+        if contribution is not None:
+            if self.events.enabled(LoadManagementEvent.level):
+                self.events.emit(LoadManagementEvent(self.current_time, self.power_supply))
+            contribution = np.maximum(contribution, 0.0)
+            contributing = contribution > 0
+            contributed_energy = contribution[contributing] * (self.time_step / 60)
+            engine.flexibility_contribution[rows[contributing]] += contributed_energy
+            self.book_contributions([engine.requests[row].session_id for row in rows[contributing].tolist()],
+                                    contributed_energy.tolist())
+        else:
+            contribution = np.zeros(len(rows))
+
+        charging, completed, charging_complete_time = engine.charge(rows, allocated_power, self.time_step)
+        charging_rows = rows[charging]
+        self.record_allocations([engine.requests[row] for row in charging_rows.tolist()], engine.session_index[charging_rows],
+                                allocated_power[charging], contribution[charging])
+
+        finished = engine.remove_rows(rows[completed])
+        for request, hours in zip(finished, charging_complete_time[completed].tolist()):
+            self._on_complete(request, self.current_time + timedelta(hours=hours))
+
+    def apply_steady_steps(self, max_steps: Optional[int] = None):
+        engine = self.engine
+        n = engine.size
+        next_departure_time = None
+        if n:
+            next_departure_time = engine.epoch + timedelta(minutes=float(engine.leave_minutes[:n].min()))
+        steps = 0
+        limit = self.steps_to_next_event(next_departure_time, max_steps)
+        if limit is None or limit > 1:
+            steps, charged_energy, supplies = self.steady_steps(engine.nominal_power[:n], engine.charged_energy[:n],
+                                                                engine.requested_energy[:n], limit)
+        if steps:
+            engine.charged_energy[:n] = charged_energy
+            engine.advance(steps * self.time_step)
+            self.record_steady_steps(engine.requests[:n], engine.session_index[:n], engine.nominal_power[:n], supplies)
+        return steps
+
+    def update_for_next_timestep(self):
+        self.engine.advance(self.time_step)
+        self._on_step_end()
+
+    def finish_run(self, plot: bool = False, plotter=None):
+        self.engine.sync()
+        super().finish_run(plot, plotter)
+
+    def run_simulation(self, requests: Iterable[AvailableFlexibilityRequest], plot: bool = True, plotter=None,
+                       lookahead_minutes: Optional[float] = None):
+        try:
+            super().run_simulation(requests, plot, plotter, lookahead_minutes)
+        finally:
+            self.engine.sync()
@@ -1,45 +1,90 @@
+import math
 import matplotlib.pyplot as plt
+import numpy as np
 from datetime import timedelta, datetime
-from typing import List
+from typing import Iterable, List, Optional
 from CarSpecs import CarSpecs
 from FlexibilityRequest import AvailableFlexibilityRequest
-from FlexibilityCalculator import FlexibilityCalculator
+from FlexibilityCalculator import FLEXIBILITY_THRESHOLD_MINUTES
 from ChargingPoint import ChargingPoint
+from RequestQueues import ArrivalQueue, ActiveRequestSet, StreamingArrivalQueue, WaitingQueue
+from SupplyProfile import SupplyProfile, RandomSupplyProfile
+from ResultRecorder import ResultRecorder
+from FlexibilityAggregates import FlexibilityAggregates
+from AllocationStrategies import AllocationStrategy, AllocationFactorStrategy, EarliestDeadlineFirstStrategy
+from AdmissionControl import AdmissionController
+from ConnectorPool import ConnectorPool
+from SettlementLedger import SettlementLedger
+from SessionRetention import RetentionPolicy, SessionArchive
+from SimulationProfiler import SimulationProfiler
+from SimulationPlots import SimulationPlotter
+from SimulationEvents import (EventSink, ConsoleSink, DEBUG, ArrivalEvent, AcceptanceEvent, AllocationEvent,
+                              CompletionEvent, RejectionEvent, DepartureEvent, FlexibilityEvent,
+                              LoadManagementEvent, TimeStepEvent, SupplyUpdateEvent, SimulationEndEvent)
 import random
-import math
 
 class FlexibilitySimulation:
-    def __init__(self, power_supply: float, time_step: int):
+    def __init__(self, power_supply: float, time_step: int, events: Optional[EventSink] = None,
+                 rng: Optional[random.Random] = None, start_time: Optional[datetime] = None,
+                 supply_profile: Optional[SupplyProfile] = None, recorder: Optional[ResultRecorder] = None,
+                 debug_aggregates: bool = False, profiler: Optional[SimulationProfiler] = None,
+                 allocation_strategy: Optional[AllocationStrategy] = None, adaptive_stepping: bool = False,
+                 admission: Optional[AdmissionController] = None,
+                 flexibility_threshold_minutes: float = FLEXIBILITY_THRESHOLD_MINUTES,
+                 connectors: Optional[ConnectorPool] = None, waiting_queue: Optional[WaitingQueue] = None,
+                 ledger: Optional[SettlementLedger] = None, retention: Optional[RetentionPolicy] = None):
         self.power_supply = power_supply
         self.time_step = time_step
-        self.queued_requests: List[AvailableFlexibilityRequest] = []
-        self.pending_requests: List[AvailableFlexibilityRequest] = []  # Track requests that have not arrived yet
+        self.queued_requests = ActiveRequestSet()  # Requests plugged in, indexed by session_id
+        self.pending_requests = ArrivalQueue()  # Track requests that have not arrived yet, ordered by arrival time
         self.completed_requests: List[AvailableFlexibilityRequest] = []  # Track requests that have been fully charged
-        self.current_time = datetime.now()
+        self.departed_requests: List[AvailableFlexibilityRequest] = []  # Track requests that left before being fully charged
+        self.rejected_requests: List[AvailableFlexibilityRequest] = []  # Track requests rejected for lack of flexibility
+        self.current_time = start_time if start_time is not None else datetime.now()
+        self.start_time = self.current_time  # Epoch for minute-based bookkeeping
+        self.current_step = 0
+        self.events = events if events is not None else ConsoleSink(DEBUG)  # Pass NullSink() for silent batch runs
+        self.rng = rng if rng is not None else random  # Seeded random.Random for reproducible runs
+        if supply_profile is None:
+            supply_profile = RandomSupplyProfile(self.rng)
+        else:
+            self.power_supply = supply_profile.capacity_at(0)
+        self.supply_profile = supply_profile
+        self.recorder = recorder  # When set, per-step series go to the recorder instead of per-request lists
+        # Running demand and flexibility totals
+        self.aggregates = FlexibilityAggregates(debug=debug_aggregates, threshold_minutes=flexibility_threshold_minutes)
+        self.profiler = profiler  # Per-phase timing, off when None
+        # How the supply is split when the nominal power of the active requests exceeds it; admission
+        # control plans deadline first, so the allocator follows the same order unless told otherwise
+        if allocation_strategy is None:
+            allocation_strategy = EarliestDeadlineFirstStrategy() if admission is not None else AllocationFactorStrategy()
+        self.allocation_strategy = allocation_strategy
+        self.adaptive_stepping = adaptive_stepping  # Apply runs of steady steps at once, see fast_forward
+        self.admission = admission  # Decides on arrivals up front instead of rejecting queued requests later
+        # When set, arriving cars are plugged into a free connector of the pool instead of their own evse_id,
+        # and wait in the waiting queue while every connector is busy
+        self.connectors = connectors
+        self.waiting_requests = waiting_queue if waiting_queue is not None else WaitingQueue()
+        self.ledger = ledger  # Books the reward for contributed flexibility and settles sessions as they leave
+        # When set, finished sessions are kept as compact summaries and their series kept, spilled or dropped
+        self.retention = retention
+        if retention is not None:
+            self.completed_requests = SessionArchive(self, "completed", retention)
+            self.departed_requests = SessionArchive(self, "departed", retention)
+            self.rejected_requests = SessionArchive(self, "rejected", retention)
 
     def flexibility_demand(self):       
         """Calculates total flexibility demand based on queued requests."""
-        total_power_demand = 0.0
-        for request in self.queued_requests:
-            charged_time_in_minutes = request.charged_time
-            charged_time_delta = timedelta(minutes=charged_time_in_minutes)
-            if charged_time_delta >= (request.requested_leave_time - request.arrival_time) or request.requested_energy <= request.charged_energy: 
-                continue
-            remaining_time = (request.requested_leave_time - request.arrival_time - charged_time_delta).total_seconds() / 60
-            if remaining_time <= 15: 
-                required_power = min(request.evse_id.nominal_power_cp, (request.requested_energy - request.charged_energy) / ((request.requested_leave_time - request.arrival_time - charged_time_delta).total_seconds() / 3600))
-            else:
-                required_power = request.evse_id.nominal_power_cp
-            total_power_demand += required_power
-        flexibility_demand = total_power_demand - self.power_supply
+        if self.aggregates.debug:
+            self.aggregates.verify(self.queued_requests)
+        flexibility_demand = self.aggregates.total_power_demand - self.power_supply
         return max(0.0, flexibility_demand)
 
     def flexibility_supply(self):
         """Calculates total flexibility supply available from queued requests."""
-        return sum(
-            FlexibilityCalculator.calculate_power_flexibility(request, request.evse_id.nominal_power_cp)
-            for request in self.queued_requests
-        )
+        if self.aggregates.debug:
+            self.aggregates.verify(self.queued_requests)
+        return self.aggregates.flexibility_supply
     
     def can_fulfill_requests(self,requests, power_supply):
         total_power_demand = 0.0
@@ -48,7 +93,7 @@ class FlexibilitySimulation:
         for request in requests:
             # Calculate required energy and power demand
             required_energy = request.requested_energy
-            charging_time_hours = (request.requested_leave_time - request.arrival_time).total_seconds() / 3600
+            charging_time_hours = request.duration_minutes / 60
             power_demand = required_energy / charging_time_hours
             
             total_power_demand += power_demand
@@ -70,50 +115,123 @@ class FlexibilitySimulation:
     
     def add_request(self, request: AvailableFlexibilityRequest):
         """Adds a new charging request to the queue."""
-        request.power_supplied_per_timestep = []
-        self.queued_requests.append(request)
-        print(f"Request {request.session_id} has been accepted.")
-        
+        self.queued_requests.add(request)
+        self.aggregates.update(request)
+        self._on_accept(request)
 
     def reject_new_request(self):
         """Rejects the latest charging request in the queue."""
         if self.queued_requests:
-            print(f"Rejecting request due to insufficient flexibility: {self.queued_requests[-1].session_id}")
-            print(f"It has been charged with : {self.queued_requests[-1].charged_energy} kW energy. However the requested energy was : {self.queued_requests[-1].requested_energy} kW")
-            self.queued_requests.pop()
+            request = self.queued_requests.pop()
+            self.aggregates.remove(request)
+            self._on_reject(request)
+
+    def _on_accept(self, request: AvailableFlexibilityRequest):
+        """Prepares the series, recorder, retention and ledger entries of a request that was just queued."""
+        request.queued_step = self.current_step
+        request.power_supplied_per_timestep = []
+        request.flexibility_contribution_per_timestep.clear()
+        if self.recorder is not None:
+            self.recorder.session_index(request.session_id)
+        elif self.retention is not None:
+            self.retention.queued(request.session_id, self.current_step)
+        if self.ledger is not None:
+            self.ledger.open_session(request.session_id)
+        if self.events.enabled(AcceptanceEvent.level):
+            self.events.emit(AcceptanceEvent(self.current_time, request.session_id))
+
+    def _on_reject(self, request: AvailableFlexibilityRequest):
+        """Releases and archives a request that was taken off the queue to make room."""
+        self.release_request(request)
+        self.reject_request(request)
+
+    def _on_depart(self, request: AvailableFlexibilityRequest):
+        """Releases and archives a request that reached its requested leave time."""
+        self.release_request(request)
+        if self.events.enabled(DepartureEvent.level):
+            self.events.emit(DepartureEvent(request.requested_leave_time, request.session_id, request.charged_energy, request.requested_energy))
+        self.departed_requests.append(request)
+
+    def _on_complete(self, request: AvailableFlexibilityRequest, time_of_completion: datetime):
+        """Releases and archives a request that received its requested energy at time_of_completion."""
+        request.completed_at = time_of_completion
+        if self.events.enabled(CompletionEvent.level):
+            self.events.emit(CompletionEvent(self.current_time, request.session_id, request.charged_energy, time_of_completion))
+        self.completed_requests.append(request)
+        self.release_request(request, completed=True)
+
+    def _on_step_end(self):
+        """Advances the clock after the requests were advanced, and reads the supply of the new step."""
+        self.current_time += timedelta(minutes=self.time_step)
+        self.current_step += 1
+        self.update_admission()
+        if self.events.enabled(TimeStepEvent.level):
+            self.events.emit(TimeStepEvent(self.current_time))
+        self.update_power_supply()
 
-    def allocate_power(self, request: AvailableFlexibilityRequest, requested_power, allocated_power):
+    def book_contributions(self, session_ids: Iterable[str], contributed_energy: Iterable[float]):
+        """Books the flexibility contribution in kWh of the given sessions for the current step."""
+        if self.ledger is not None:
+            self.ledger.book_many(self.current_time, session_ids, contributed_energy)
+
+    def record_allocation(self, request: AvailableFlexibilityRequest, allocated_power, flexibility_contribution=0.0):
+        """Stores the power allocated to a request and its flexibility contribution in kW in this time step."""
+        if self.recorder is None:
+            request.power_supplied_per_timestep.append(allocated_power)
+            request.flexibility_contribution_per_timestep.append(flexibility_contribution)
+        else:
+            self.recorder.record_allocation(request.session_id, self.current_step, allocated_power, flexibility_contribution)
+        if self.events.enabled(AllocationEvent.level):
+            self.events.emit(AllocationEvent(self.current_time, request.session_id, allocated_power))
+
+    def record_allocations(self, requests: List[AvailableFlexibilityRequest], sessions, allocated_power: np.ndarray,
+                           flexibility_contribution: np.ndarray):
+        """
+        Stores the power allocated to many requests in this time step.
+
+        :param sessions: recorder session indices of the requests, None without a recorder
+        """
+        if self.recorder is None:
+            for request, power, contribution in zip(requests, allocated_power.tolist(), flexibility_contribution.tolist()):
+                request.power_supplied_per_timestep.append(power)
+                request.flexibility_contribution_per_timestep.append(contribution)
+        else:
+            self.recorder.record_allocations(sessions, self.current_step, allocated_power, flexibility_contribution)
+        if self.events.enabled(AllocationEvent.level):
+            for request, power in zip(requests, allocated_power.tolist()):
+                self.events.emit(AllocationEvent(self.current_time, request.session_id, power))
+
+    def allocate_power(self, request: AvailableFlexibilityRequest, requested_power, allocated_power, flexibility_contribution=0.0):
         """Allocates power to an EV and updates its charging status."""
-        charged_time_delta = timedelta(minutes=request.charged_time)
-        remaining_time = (request.requested_leave_time - request.arrival_time - charged_time_delta).total_seconds() / 3600
+        remaining_time = (request.duration_minutes - request.charged_time) / 60
         if remaining_time > 0:
             potential_energy_charged = allocated_power * (self.time_step / 60)
             if request.charged_energy + potential_energy_charged > request.requested_energy:
                 charging_complete_time = (request.requested_energy - request.charged_energy)/allocated_power
                 potential_energy_charged = allocated_power * (charging_complete_time)
                 request.charged_energy += potential_energy_charged
-                request.power_supplied_per_timestep.append(allocated_power)
-                print(f"Allocated {allocated_power:.2f} kW to {request.session_id}")
+                self.record_allocation(request, allocated_power, flexibility_contribution)
                 if request.charged_energy >= request.requested_energy:
-                    time_of_completion = self.current_time + timedelta(minutes=(charging_complete_time*60))
-                    print(f"{request.session_id} is fully charged with {request.charged_energy:.2f} kWh. At time {time_of_completion.strftime('%Y-%m-%d %H:%M:%S')}")
                     # remove the request from the queue
-                    self.queued_requests.remove(request)
-                    self.completed_requests.append(request)
+                    self.queued_requests.remove(request.session_id)
+                    self.aggregates.remove(request)
+                    self._on_complete(request, self.current_time + timedelta(minutes=(charging_complete_time*60)))
                 return
 
             request.charged_energy += potential_energy_charged
-            request.power_supplied_per_timestep.append(allocated_power)
+            self.record_allocation(request, allocated_power, flexibility_contribution)
 
-            print(f"Allocated {allocated_power:.2f} kW to {request.session_id}")
             if request.charged_energy >= request.requested_energy:
-                print(f"{request.session_id} is fully charged with {request.charged_energy:.2f} kWh.")
-                self.queued_requests.remove(request)
-                self.completed_requests.append(request)
+                self.queued_requests.remove(request.session_id)
+                self.aggregates.remove(request)
+                self._on_complete(request, self.current_time + timedelta(minutes=self.time_step))
 
     def allocate_flexibility_and_load_management(self):
         """Allocates power based on demand, flexibility, and available supply."""
-        active_requests = [r for r in self.queued_requests if r.arrival_time <= self.current_time <= r.requested_leave_time]
+        # Requests are queued on arrival and dropped on departure, so every queued request is active
+        active_requests = list(self.queued_requests)
+        if self.recorder is not None:
+            self.recorder.record_supply(self.current_step, self.power_supply)
         
         # total_power_demand = sum(
         #     (request.requested_energy - request.charged_energy) / ((request.requested_leave_time - self.current_time).total_seconds() / 3600)
@@ -125,20 +243,12 @@ class FlexibilitySimulation:
         # for request in active_requests if request.requested_leave_time > self.current_time
         # )
         
-        total_power_demand = 0.0
+        # Integer leave minutes against the clock, without building a datetime per request
+        elapsed_minutes = self.elapsed_minutes()
+        minutes_to_leave = [self.minutes_to_leave(request, elapsed_minutes) for request in active_requests]
         instantaneous_power_demand = 0.0
-        for request in active_requests:
-            remaining_energy = request.requested_energy - request.charged_energy
-            remaining_time = (request.requested_leave_time - self.current_time).total_seconds() / 3600
-            
-            if remaining_time > 0:
-                # Calculate power required to charge fully within remaining time
-                required_power = remaining_energy / remaining_time
-                
-                # Ensure the actual power demand is capped by the nominal power of the charging point
-                actual_power_demand = min(request.evse_id.nominal_power_cp, required_power)
-                total_power_demand += actual_power_demand
-                
+        for request, remaining_minutes in zip(active_requests, minutes_to_leave):
+            if remaining_minutes > 0:
                 # Instantaneous demand is the nominal power (not based on energy/time)
                 instantaneous_power_demand += request.evse_id.nominal_power_cp
         
@@ -147,98 +257,411 @@ class FlexibilitySimulation:
             for request in active_requests:
                 self.allocate_power(request, request.evse_id.nominal_power_cp, request.evse_id.nominal_power_cp)
         else:
-            print("Demand exceeds supply, applying flexibility.")
-            flexibility_supply = self.flexibility_supply()
-            allocation_factor = (total_power_demand - self.power_supply) / flexibility_supply if flexibility_supply > 0 else 1.0
-
-            total_allocated_power = 0.0
-            for request in active_requests:
-                requested_power = (request.requested_energy - request.charged_energy) / ((request.requested_leave_time - self.current_time).total_seconds() / 3600)
-                power_flex = FlexibilityCalculator.calculate_power_flexibility(request, request.evse_id.nominal_power_cp)
-                allocated_power = max(0, requested_power - (allocation_factor * power_flex))
-                allocated_power = min(allocated_power, self.power_supply - total_allocated_power,request.evse_id.nominal_power_cp)
-
-                flexibility_contribution = request.evse_id.nominal_power_cp - allocated_power
-                if flexibility_contribution > 0:
-                    request.flexibility_contribution_per_timestep.append(flexibility_contribution*0.25)
-                    request.flexibility_contribution = sum(request.flexibility_contribution_per_timestep)  
-                     
-                total_allocated_power += allocated_power
-                self.allocate_power(request, requested_power, allocated_power)
+            if self.events.enabled(LoadManagementEvent.level):
+                self.events.emit(LoadManagementEvent(self.current_time, self.power_supply))
+            nominal_power = np.array([request.evse_id.nominal_power_cp for request in active_requests], dtype=np.float64)
+            remaining_energy = np.array([request.requested_energy - request.charged_energy for request in active_requests])
+            remaining_hours = np.array(minutes_to_leave, dtype=np.float64) / 60
+            power_flexibility = np.array([self.aggregates.power_flexibility(request.session_id) for request in active_requests])
+            allocation = self.allocation_strategy.allocate(self.power_supply, nominal_power, remaining_energy,
+                                                           remaining_hours, power_flexibility, self.time_step / 60)
+
+            step_hours = self.time_step / 60
+            contributions = np.maximum(nominal_power - allocation, 0.0).tolist()
+            contributing = [(request, contribution * step_hours) for request, contribution in zip(active_requests, contributions)
+                            if contribution > 0]
+            for request, contributed_energy in contributing:
+                request.flexibility_contribution += contributed_energy
+            self.book_contributions([request.session_id for request, _ in contributing],
+                                    [contributed_energy for _, contributed_energy in contributing])
+            for request, allocated_power, flexibility_contribution, hours in zip(
+                    active_requests, allocation.tolist(), contributions, remaining_hours.tolist()):
+                requested_power = (request.requested_energy - request.charged_energy) / hours
+                self.allocate_power(request, requested_power, allocated_power, flexibility_contribution)
 
     def update_for_next_timestep(self):
         """Moves the simulation to the next time step and logs progress."""
-        self.current_time += timedelta(minutes=self.time_step)
         for request in self.queued_requests:
             request.charged_time += self.time_step
-        print(f"Time: {self.current_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self.update_power_supply()
-        print("-----")
+            self.aggregates.update(request)  # Also picks up the energy charged in this step
+        self._on_step_end()
         
+    def elapsed_minutes(self):
+        """Minutes since the start of the simulation."""
+        return (self.current_time - self.start_time).total_seconds() / 60
+
+    def minutes_to_leave(self, request: AvailableFlexibilityRequest, elapsed_minutes: float) -> float:
+        """Minutes from the current time to a request's leave time, given elapsed_minutes()."""
+        if request.epoch == self.start_time:
+            return request.leave_minute - elapsed_minutes
+        return request.leave_minute - (self.current_time - request.epoch).total_seconds() / 60
+
     def update_power_supply(self):
-        random_power_supply = math.floor(random.uniform(30, 40))
-        self.power_supply = random_power_supply
-        print(f"Power Supply Updated to {self.power_supply} kW")
+        """Reads the available capacity for the current time step from the supply profile."""
+        self.power_supply = self.supply_profile.capacity_at(self.elapsed_minutes())
+        if self.events.enabled(SupplyUpdateEvent.level):
+            self.events.emit(SupplyUpdateEvent(self.current_time, self.power_supply))
 
     def handle_new_requests(self):
         """Checks and adds any pending requests that have arrived."""
-        arrived_requests = [r for r in self.pending_requests if r.arrival_time <= self.current_time]
-        for request in arrived_requests:
-            print(f"New request added to the queue: {request.session_id} at {self.current_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        arrivals = []
+        for request in self.pending_requests.pop_arrived(self.current_time):
+            if request.requested_leave_time <= self.current_time:
+                # Validated against the simulation clock: the car would leave before it can charge
+                self.reject_request(request)
+                continue
+            if self.events.enabled(ArrivalEvent.level):
+                self.events.emit(ArrivalEvent(self.current_time, request.session_id))
+            arrivals.append(request)
+        if self.connectors is not None:
+            arrivals = self.plug_in(arrivals)
+        if self.admission is not None:
+            arrivals, rejected = self.admission.decide(self, arrivals)
+            for request in rejected:
+                self._on_reject(request)
+        for request in arrivals:
             self.add_request(request)
-            self.pending_requests.remove(request)
-
-    def run_simulation(self, requests: List[AvailableFlexibilityRequest]):
-        """Runs the full simulation and logs charging progress."""
-        self.pending_requests = requests[:]  # Initially all requests are pending
-
-        while self.queued_requests or self.pending_requests:
-            self.handle_new_requests()
-
-            active_requests = [r for r in self.queued_requests if r.arrival_time <= self.current_time <= r.requested_leave_time]
-            if not active_requests and not self.pending_requests:
-                print("No active charging requests. Ending simulation.")
-                break
-
-            if self.flexibility_demand() > 0 or False:  # Placeholder for external flexibility check
-                flexibility_demand = self.flexibility_demand()
-                flexibility_supply = self.flexibility_supply()
-                print("Flexibility Demand ", flexibility_demand)
-                print("Flexibility Supply ", flexibility_supply)
-                if flexibility_demand > flexibility_supply:
-                    self.reject_new_request()
-                    continue
-                self.allocate_flexibility_and_load_management()
-            else:
-                self.allocate_flexibility_and_load_management()
-
-            self.update_for_next_timestep()
-
-        self.plot_power_supplied()
-        self.plot_flexibility_contribution()
-
 
+    def plug_in(self, arrivals: List[AvailableFlexibilityRequest]) -> List[AvailableFlexibilityRequest]:
+        """
+        Assigns free connectors to waiting cars and new arrivals in priority order.
+
+        Cars that find every connector busy join the waiting queue; waiting cars whose requested
+        leave time has passed are rejected. The time a car waited counts towards its charged_time,
+        so its remaining time still ends at the requested leave time.
+
+        :return: the requests that got a connector in this step
+        """
+        for request in arrivals:
+            self.waiting_requests.push(request, self.current_time)
+        minute = self.elapsed_minutes()
+        plugged = []
+        while self.connectors.free and self.waiting_requests:
+            request, since = self.waiting_requests.pop()
+            waited_minutes = (self.current_time - since).total_seconds() / 60
+            if request.requested_leave_time <= self.current_time:
+                self.connectors.record_abandoned(waited_minutes)
+                self.reject_request(request)
+                continue
+            request.charged_time += waited_minutes
+            self.connectors.assign(request, minute, waited_minutes)
+            plugged.append(request)
+        return plugged
+
+    def release_request(self, request: AvailableFlexibilityRequest, completed: bool = False):
+        """
+        Frees the connector and settles the reward of a request that left the queue.
+
+        A completed request charged through the current step, so its connector counts as busy
+        until the end of the step; it is handed out again from the next step on.
+        """
+        if self.connectors is not None:
+            minute = self.elapsed_minutes() + (self.time_step if completed else 0)
+            self.connectors.release(request.session_id, minute)
+        if self.admission is not None:
+            self.admission.release(request.session_id)
+        if self.ledger is not None:
+            self.ledger.settle(request, self.current_time)
+
+    def connector_statistics(self) -> dict:
+        """Occupancy and wait-time statistics of the connector pool up to the current time."""
+        if self.connectors is None:
+            raise ValueError("The simulation has no connector pool.")
+        statistics = self.connectors.statistics(self.elapsed_minutes())
+        statistics["waiting"] = len(self.waiting_requests)
+        return statistics
+
+    def reject_request(self, request: AvailableFlexibilityRequest):
+        """Rejects a request that was never queued."""
+        self.rejected_requests.append(request)
+        if self.events.enabled(RejectionEvent.level):
+            self.events.emit(RejectionEvent(self.current_time, request.session_id, request.charged_energy, request.requested_energy))
+
+    def update_admission(self):
+        """Books the energy the queued requests charged with the admission controller."""
+        if self.admission is not None:
+            for request in self.queued_requests:
+                self.admission.update(request.session_id, request.requested_energy - request.charged_energy)
+
+    def handle_departures(self):
+        """Removes queued requests whose requested leave time has been reached."""
+        for request in self.queued_requests.pop_departed(self.current_time):
+            self.aggregates.remove(request)
+            self._on_depart(request)
+
+    def has_active_requests(self):
+        """Checks whether any queued request is plugged in at the current time."""
+        return len(self.queued_requests) > 0
+
+    def run_simulation(self, requests: Iterable[AvailableFlexibilityRequest], plot: bool = True,
+                       plotter: Optional[SimulationPlotter] = None, lookahead_minutes: Optional[float] = None):
+        """
+        Runs the full simulation and logs charging progress.
+
+        Charts are shown interactively unless a plotter is given, which writes them to files
+        instead. Pass plot=False to skip the charts.
+        With lookahead_minutes, requests may be a lazy iterator sorted by arrival time, e.g. a
+        SessionLog reader; requests are only pulled from it once they arrive within the look-ahead.
+        """
+        self.start_run(requests, lookahead_minutes)
+        self.run_until()
+        self.finish_run(plot, plotter)
+
+    def run_until(self, until: Optional[datetime] = None):
+        """
+        Runs steps of a started run until the clock reaches `until`, or to the end without it.
+
+        The run can be continued with another call, e.g. after taking a snapshot.
+
+        :return: False once the simulation has ended
+        """
+        while self.queued_requests or self.pending_requests or self.waiting_requests:
+            max_steps = None
+            if until is not None:
+                if self.current_time >= until:
+                    return True
+                max_steps = math.ceil((until - self.current_time) / timedelta(minutes=self.time_step))
+            if not self.prepare_step():
+                return False
+            if not self.admit():
+                continue
+            if not (self.adaptive_stepping and self.fast_forward(max_steps)):
+                self.complete_step()
+        return False
+
+    def start_run(self, requests: Iterable[AvailableFlexibilityRequest], lookahead_minutes: Optional[float] = None):
+        """Queues the requests of a run; drive it with prepare_step, admit and complete_step."""
+        if lookahead_minutes is None:
+            self.pending_requests = ArrivalQueue(requests)  # Initially all requests are pending
+        else:
+            self.pending_requests = StreamingArrivalQueue(requests, lookahead_minutes)
+        if self.profiler is not None:
+            self.profiler.begin_run(self.current_step)
+
+    def prepare_step(self):
+        """
+        Handles arrivals and departures at the current time.
+
+        :return: False if the simulation has ended
+        """
+        profiler = self.profiler
+        started = profiler.start() if profiler is not None else 0.0
+        self.handle_new_requests()
+        if profiler is not None:
+            profiler.stop("handle_new_requests", started, self.current_step, len(self.queued_requests))
+            started = profiler.start()
+        self.handle_departures()
+        if profiler is not None:
+            profiler.stop("handle_departures", started, self.current_step, len(self.queued_requests))
+
+        if not self.has_active_requests() and not self.pending_requests and not self.waiting_requests:
+            if self.events.enabled(SimulationEndEvent.level):
+                self.events.emit(SimulationEndEvent(self.current_time))
+            return False
+        return True
+
+    def admit(self):
+        """
+        Compares flexibility demand and supply at the current power supply.
+
+        :return: False if the latest request had to be rejected and the step must be prepared again
+        """
+        profiler = self.profiler
+        started = profiler.start() if profiler is not None else 0.0
+        admitted = True
+        flexibility_demand = self.flexibility_demand()
+        if flexibility_demand > 0 and self.admission is None:  # Without admission control, reject and retry
+            flexibility_supply = self.flexibility_supply()
+            if self.events.enabled(FlexibilityEvent.level):
+                self.events.emit(FlexibilityEvent(self.current_time, flexibility_demand, flexibility_supply))
+            if flexibility_demand > flexibility_supply:
+                self.reject_new_request()
+                admitted = False
+        if profiler is not None:
+            profiler.stop("flexibility", started, self.current_step, len(self.queued_requests))
+        return admitted
+
+    def complete_step(self):
+        """Allocates power for the current step and advances the clock."""
+        profiler = self.profiler
+        started = profiler.start() if profiler is not None else 0.0
+        self.allocate_flexibility_and_load_management()
+        if profiler is not None:
+            profiler.stop("allocate_flexibility_and_load_management", started, self.current_step, len(self.queued_requests))
+            started = profiler.start()
+        self.update_for_next_timestep()
+        if profiler is not None:
+            profiler.stop("update_for_next_timestep", started, self.current_step - 1, len(self.queued_requests))
+
+    def fast_forward(self, max_steps: Optional[int] = None):
+        """
+        Applies the current step and the steady steps that follow it in one go.
+
+        A step is steady when the supply covers the nominal power of every queued request and no
+        arrival, departure or completion falls into it; every request then charges at nominal
+        power. The run of steady steps ends at the first step with an event or with a supply below
+        the nominal demand, which is left to the regular step. Recorded series and events are the
+        same as with fixed stepping.
+
+        :param max_steps: apply at most this many steps
+        :return: number of steps applied, 0 if the current step is not steady
+        """
+        profiler = self.profiler
+        started = profiler.start() if profiler is not None else 0.0
+        steps = self.apply_steady_steps(max_steps)
+        if profiler is not None:
+            profiler.stop("fast_forward", started, self.current_step, len(self.queued_requests))
+        return steps
+
+    def apply_steady_steps(self, max_steps: Optional[int] = None):
+        """Applies the run of steady steps from the current step on, see fast_forward; returns its length."""
+        steps = 0
+        limit = self.steps_to_next_event(self.queued_requests.next_departure_time(), max_steps)
+        if limit is None or limit > 1:
+            active_requests = list(self.queued_requests)
+            nominal_power = np.array([request.evse_id.nominal_power_cp for request in active_requests], dtype=np.float64)
+            charged_energy = np.array([request.charged_energy for request in active_requests], dtype=np.float64)
+            requested_energy = np.array([request.requested_energy for request in active_requests], dtype=np.float64)
+            steps, charged_energy, supplies = self.steady_steps(nominal_power, charged_energy, requested_energy, limit)
+        if steps:
+            for request, energy in zip(active_requests, charged_energy.tolist()):
+                request.charged_energy = energy
+                request.charged_time += steps * self.time_step
+                self.aggregates.update(request)
+            sessions = None
+            if self.recorder is not None:
+                sessions = np.array([self.recorder.session_index(request.session_id) for request in active_requests],
+                                    dtype=np.int32)
+            self.record_steady_steps(active_requests, sessions, nominal_power, supplies)
+        return steps
+
+    def steps_to_next_event(self, next_departure_time: Optional[datetime], max_steps: Optional[int] = None):
+        """Number of steps before the step that handles the next arrival or departure, None if there is none."""
+        limit = max_steps
+        for event_time in (self.pending_requests.next_arrival_time(), next_departure_time):
+            if event_time is not None:
+                # the step that starts at or after the event handles it
+                steps_to_event = math.ceil((event_time - self.current_time) / timedelta(minutes=self.time_step))
+                limit = steps_to_event if limit is None else min(limit, steps_to_event)
+        return limit
+
+    def steady_steps(self, nominal_power, charged_energy, requested_energy, limit: Optional[int]):
+        """
+        Counts the steady steps from the current time, at most limit, and reads the supply profile for them.
+
+        :return: tuple of (number of steps, charged energy after them, supply of each step followed
+                 by the supply of the first step after the run)
+        """
+        nominal_power_demand = nominal_power.sum()
+        potential_energy_charged = nominal_power * (self.time_step / 60)
+        supplies = [self.power_supply]
+        steps = 0
+        while (limit is None or steps < limit) and nominal_power_demand <= supplies[-1]:
+            next_charged_energy = charged_energy + potential_energy_charged
+            if (next_charged_energy >= requested_energy).any():
+                break  # a request completes in this step
+            charged_energy = next_charged_energy
+            steps += 1
+            moment = self.current_time + timedelta(minutes=self.time_step * steps)
+            supplies.append(self.supply_profile.capacity_at((moment - self.start_time).total_seconds() / 60))
+            if limit is None and not len(nominal_power):
+                break  # nothing queued and nothing pending
+        return steps, charged_energy, supplies
+
+    def record_steady_steps(self, requests, sessions, nominal_power, supplies):
+        """
+        Writes the supply, allocations and events of a run of steady steps and advances the clock.
+
+        :param requests: the charging requests, in the order of nominal_power
+        :param sessions: recorder session indices of the charging requests, None without a recorder
+        :param supplies: supply of each step and of the first step after the run
+        """
+        steps = len(supplies) - 1
+        if self.recorder is None:
+            for request, power in zip(requests, nominal_power.tolist()):
+                request.power_supplied_per_timestep.extend([power] * steps)
+                request.flexibility_contribution_per_timestep.extend([0.0] * steps)
+        emit_allocations = self.events.enabled(AllocationEvent.level)
+        emit_time_steps = self.events.enabled(TimeStepEvent.level)
+        emit_supply = self.events.enabled(SupplyUpdateEvent.level)
+        if self.recorder is not None:
+            contribution = np.zeros(len(nominal_power))
+        for step in range(steps):
+            if self.recorder is not None:
+                self.recorder.record_supply(self.current_step, supplies[step])
+                self.recorder.record_allocations(sessions, self.current_step, nominal_power, contribution)
+            if emit_allocations:
+                for request, power in zip(requests, nominal_power.tolist()):
+                    self.events.emit(AllocationEvent(self.current_time, request.session_id, power))
+            self.current_time += timedelta(minutes=self.time_step)
+            self.current_step += 1
+            self.power_supply = supplies[step + 1]
+            if emit_time_steps:
+                self.events.emit(TimeStepEvent(self.current_time))
+            if emit_supply:
+                self.events.emit(SupplyUpdateEvent(self.current_time, self.power_supply))
+        self.update_admission()
+
+    def finish_run(self, plot: bool = False, plotter: Optional[SimulationPlotter] = None):
+        """
+        Flushes events, closes the recorder, the ledger after settling it and the retention policy
+        with its spilled series, and draws the charts. The recorder's rows stay in memory for the
+        charts if it keeps them.
+        """
+        if self.profiler is not None:
+            self.profiler.end_run(self.current_step)
+        self.events.flush()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.ledger is not None:
+            self.ledger.settle_all(self.queued_requests, self.current_time)
+            self.ledger.close()
+        if self.retention is not None:
+            self.retention.close()
+        if plot and plotter is not None:
+            plotter.render(self)
+        elif plot and self.recorder is None and self.retention is not None and self.retention.series != "keep":
+            # The per-step series were dropped or spilled, as in SimulationPlotter.render
+            self.plot_session_summaries()
+        elif plot:
+            self.plot_power_supplied()
+            self.plot_flexibility_contribution()
+
+    def power_demand(self):
+        """Power the queued requests need in this step, before flexibility is used."""
+        return self.aggregates.total_power_demand
+
+    def nominal_power_demand(self):
+        """Sum of the nominal power of the queued requests, the most they can draw at once."""
+        return sum(request.evse_id.nominal_power_cp for request in self.queued_requests)
+
+    def session_series(self, request: AvailableFlexibilityRequest, column: str = "allocated_power"):
+        """Time steps since the simulation start and values of one request's per-step series."""
+        if self.recorder is not None:
+            steps, values = self.recorder.session_series(request.session_id, column)
+            return steps.tolist(), values.tolist()
+        if column == "allocated_power":
+            values = request.power_supplied_per_timestep
+        else:
+            values = request.flexibility_contribution_per_timestep
+        # Without a recorder the series hold one entry per step, from the step the request was queued in
+        first_step = getattr(request, "queued_step", None)
+        if first_step is None:
+            return [], []
+        return list(range(first_step, first_step + len(values))), values
 
     def plot_power_supplied(self):
-        """Generates a bar chart of power supplied to each EV per time step, starting from their respective arrival times."""
+        """Generates a bar chart of power supplied to each EV per time step, starting from the step each was queued in."""
         plt.figure(figsize=(12, 6))
 
-        # Use the initial simulation start time for reference
-        simulation_start_time = min(req.arrival_time for req in self.completed_requests)
-
         bar_width = 0.2  # Set a smaller width for the bars to avoid overlap
         for idx, request in enumerate(self.completed_requests):
-            total_steps = len(request.power_supplied_per_timestep)
-            # Calculate the step at which the car arrived relative to the simulation start time
-            arrival_time_step = (request.arrival_time - simulation_start_time).total_seconds() / (self.time_step * 60)
-            
-            # Adjust the steps to align with the car's arrival time
-            time_steps = [arrival_time_step + step for step in range(total_steps)]
+            time_steps, values = self.session_series(request, "allocated_power")
             
             # Introduce a small offset for each EV to prevent overlapping
             time_steps = [step + (idx * bar_width) for step in time_steps]
             
-            plt.bar(time_steps, request.power_supplied_per_timestep, width=bar_width, label=request.session_id)
+            plt.bar(time_steps, values, width=bar_width, label=request.session_id)
 
         plt.xlabel('Time Step')
         plt.ylabel('Power Supplied (kW)')
@@ -248,25 +671,17 @@ class FlexibilitySimulation:
         plt.show()
 
     def plot_flexibility_contribution(self):
-        """Generates a bar chart of flexibility contributions per EV at each time step, starting from their respective arrival times."""
+        """Generates a bar chart of flexibility contributions per EV at each time step, starting from the step each was queued in."""
         plt.figure(figsize=(12, 6))
 
-        # Use the initial simulation start time for reference
-        simulation_start_time = min(req.arrival_time for req in self.completed_requests)
-
         bar_width = 0.2  # Set a smaller width for the bars to avoid overlap
         for idx, request in enumerate(self.completed_requests):
-            total_steps = len(request.flexibility_contribution_per_timestep)
-            # Calculate the step at which the car arrived relative to the simulation start time
-            arrival_time_step = (request.arrival_time - simulation_start_time).total_seconds() / (self.time_step * 60)
-            
-            # Adjust the steps to align with the car's arrival time
-            time_steps = [arrival_time_step + step for step in range(total_steps)]
+            time_steps, values = self.session_series(request, "flexibility_contribution")
             
             # Introduce a small offset for each EV to prevent overlapping
             time_steps = [step + (idx * bar_width) for step in time_steps]
             
-            plt.bar(time_steps, request.flexibility_contribution_per_timestep, width=bar_width, label=request.session_id)
+            plt.bar(time_steps, values, width=bar_width, label=request.session_id)
 
         plt.xlabel('Time Step')
         plt.ylabel('Flexibility Contribution (kW)')
@@ -275,6 +690,18 @@ class FlexibilitySimulation:
         plt.grid(True)
         plt.show()
 
+    def plot_session_summaries(self):
+        """Generates histograms of the delivered share of the requested energy and of the flexibility contribution per session."""
+        for values, _, xlabel in SimulationPlotter.summary_series(self):
+            plt.figure(figsize=(12, 6))
+            if values.size:
+                plt.hist(values, bins=min(50, values.size))
+            plt.xlabel(xlabel)
+            plt.ylabel('EV Sessions')
+            plt.title(f'{xlabel} of {values.size} Sessions')
+            plt.grid(True)
+            plt.show()
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,79 @@
+import math
+from typing import Dict, Iterable
+from FlexibilityCalculator import FlexibilityCalculator, FLEXIBILITY_THRESHOLD_MINUTES
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+
+class FlexibilityAggregates:
+    """
+    Running totals of the power demand and power flexibility of the queued requests.
+
+    Every request contributes one demand term and one flexibility term. The simulation calls
+    update() when a request is added and once per step after it was charged and advanced in
+    time, and remove() when it completes, departs or is rejected. Reading the totals is O(1);
+    keeping them current costs one term update per queued request per step, instead of the
+    repeated full recomputations on every read.
+    In debug mode every read is checked against a full recomputation.
+    """
+
+    def __init__(self, debug: bool = False, tolerance: float = 1e-6,
+                 threshold_minutes: float = FLEXIBILITY_THRESHOLD_MINUTES):
+        self.debug = debug
+        self.tolerance = tolerance
+        self.threshold_minutes = threshold_minutes
+        self.__demand_terms: Dict[str, float] = {}
+        self.__flexibility_terms: Dict[str, float] = {}
+        self.__total_power_demand = 0.0
+        self.__flexibility_supply = 0.0
+
+    @property
+    def total_power_demand(self):
+        return self.__total_power_demand
+
+    @property
+    def flexibility_supply(self):
+        return self.__flexibility_supply
+
+    def power_flexibility(self, session_id: str) -> float:
+        """Flexibility term of one request as of its last update, read without recomputation."""
+        return self.__flexibility_terms[session_id]
+
+    def update(self, request: AvailableFlexibilityRequest):
+        """Recomputes the terms of a request after its state changed."""
+        nominal_power = request.evse_id.nominal_power_cp
+        demand = FlexibilityCalculator.calculate_required_power(request, nominal_power, self.threshold_minutes)
+        flexibility = FlexibilityCalculator.calculate_power_flexibility(request, nominal_power, self.threshold_minutes)
+        session_id = request.session_id
+        self.__total_power_demand += demand - self.__demand_terms.get(session_id, 0.0)
+        self.__flexibility_supply += flexibility - self.__flexibility_terms.get(session_id, 0.0)
+        self.__demand_terms[session_id] = demand
+        self.__flexibility_terms[session_id] = flexibility
+
+    def remove(self, request: AvailableFlexibilityRequest):
+        session_id = request.session_id
+        self.__total_power_demand -= self.__demand_terms.pop(session_id, 0.0)
+        self.__flexibility_supply -= self.__flexibility_terms.pop(session_id, 0.0)
+        if not self.__demand_terms:
+            # Reset instead of carrying floating point drift into the next busy period
+            self.__total_power_demand = 0.0
+            self.__flexibility_supply = 0.0
+
+    def verify(self, requests: Iterable[AvailableFlexibilityRequest]):
+        """Raises AssertionError if the running totals differ from a full recomputation."""
+        total_power_demand = 0.0
+        flexibility_supply = 0.0
+        count = 0
+        for request in requests:
+            nominal_power = request.evse_id.nominal_power_cp
+            total_power_demand += FlexibilityCalculator.calculate_required_power(request, nominal_power, self.threshold_minutes)
+            flexibility_supply += FlexibilityCalculator.calculate_power_flexibility(request, nominal_power, self.threshold_minutes)
+            count += 1
+        if count != len(self.__demand_terms):
+            raise AssertionError(f"Aggregates track {len(self.__demand_terms)} requests, queue holds {count}.")
+        if not math.isclose(total_power_demand, self.__total_power_demand, rel_tol=self.tolerance, abs_tol=self.tolerance):
+            raise AssertionError(f"Running power demand {self.__total_power_demand} differs from recomputed {total_power_demand}.")
+        if not math.isclose(flexibility_supply, self.__flexibility_supply, rel_tol=self.tolerance, abs_tol=self.tolerance):
+            raise AssertionError(f"Running flexibility supply {self.__flexibility_supply} differs from recomputed {flexibility_supply}.")
+
+    def __len__(self):
+        return len(self.__demand_terms)
@@ -1,5 +1,7 @@
+import numpy as np
 from FlexibilityRequest import AvailableFlexibilityRequest
-from datetime import timedelta
+
+FLEXIBILITY_THRESHOLD_MINUTES = 15  # Time flexibility at which a request offers its full nominal power
 
 class FlexibilityCalculator:
     @staticmethod
@@ -15,27 +17,93 @@ class FlexibilityCalculator:
         # Assuming charged_time is in minutes
         charged_time_in_minutes = charging_request.charged_time
 
-        # Convert charged_time to timedelta (minutes)
-        charged_time_delta = timedelta(minutes=charged_time_in_minutes)
-
         # Calculate the charging duration in minutes
-        remaining_chraging_time = (charging_request.requested_leave_time - charging_request.arrival_time - charged_time_delta).total_seconds() / 60
+        remaining_chraging_time = charging_request.duration_minutes - charged_time_in_minutes
         required_charging_time = ((charging_request.requested_energy - charging_request.charged_energy) /nominal_power_cp) * 60  # in minutes
         flexibility = remaining_chraging_time - required_charging_time
         return flexibility
 
     @staticmethod
-    def calculate_power_flexibility(charging_request,nominal_power_cp):
+    def calculate_power_flexibility(charging_request, nominal_power_cp, threshold_minutes=FLEXIBILITY_THRESHOLD_MINUTES):
         """
         Calculate power flexibility for a given charging request.
         
         :param charging_request: AvailableFlexibilityRequest
+        :param threshold_minutes: time flexibility from which the full nominal power is flexible
         :return: float - power flexibility in kW
         """
         time_flexibility = FlexibilityCalculator.calculate_time_flexibility(charging_request,nominal_power_cp)
-        if time_flexibility >= 15:  # If there's enough time flexibility
+        if time_flexibility >= threshold_minutes:  # If there's enough time flexibility
             return nominal_power_cp  # Full power flexibility
         else:
             # Scale the power flexibility based on available time flexibility
-            power_flexibility = (time_flexibility / 15) * nominal_power_cp
+            power_flexibility = (time_flexibility / threshold_minutes) * nominal_power_cp
             return power_flexibility
+
+    @staticmethod
+    def calculate_required_power(charging_request, nominal_power_cp, threshold_minutes=FLEXIBILITY_THRESHOLD_MINUTES):
+        """
+        Calculate the power a charging request needs in the current step.
+        
+        :param charging_request: AvailableFlexibilityRequest
+        :param threshold_minutes: remaining time below which only the power for the remaining energy counts
+        :return: float - required power in kW, 0 if the request is fully charged or out of time
+        """
+        remaining_time = charging_request.duration_minutes - charging_request.charged_time
+        if remaining_time <= 0 or charging_request.requested_energy <= charging_request.charged_energy:
+            return 0.0
+        if remaining_time <= threshold_minutes:
+            # Close to the leave time only the power needed for the remaining energy counts
+            return min(nominal_power_cp, (charging_request.requested_energy - charging_request.charged_energy) / (remaining_time / 60))
+        return nominal_power_cp
+
+    @staticmethod
+    def time_flexibility_batch(requested_energy, charged_energy, arrival_minutes, leave_minutes, charged_time,
+                               nominal_power) -> np.ndarray:
+        """
+        Vectorized calculate_time_flexibility for arrays of sessions.
+
+        Arrival and leave times are minutes on any common clock, charged time in minutes.
+
+        :return: time flexibility of every session in minutes
+        """
+        remaining_charging_time = np.subtract(leave_minutes, arrival_minutes) - charged_time
+        required_charging_time = np.subtract(requested_energy, charged_energy) / nominal_power * 60
+        return remaining_charging_time - required_charging_time
+
+    @staticmethod
+    def power_flexibility_from_time(time_flexibility, nominal_power,
+                                    threshold_minutes=FLEXIBILITY_THRESHOLD_MINUTES) -> np.ndarray:
+        """Power flexibility in kW of every session from its already computed time flexibility."""
+        nominal_power = np.asarray(nominal_power, dtype=np.float64)
+        return np.where(time_flexibility >= threshold_minutes, nominal_power,
+                        (time_flexibility / threshold_minutes) * nominal_power)
+
+    @staticmethod
+    def power_flexibility_batch(requested_energy, charged_energy, arrival_minutes, leave_minutes, charged_time,
+                                nominal_power, threshold_minutes=FLEXIBILITY_THRESHOLD_MINUTES) -> np.ndarray:
+        """
+        Vectorized calculate_power_flexibility for arrays of sessions.
+
+        :return: power flexibility of every session in kW
+        """
+        time_flexibility = FlexibilityCalculator.time_flexibility_batch(requested_energy, charged_energy, arrival_minutes,
+                                                                        leave_minutes, charged_time, nominal_power)
+        return FlexibilityCalculator.power_flexibility_from_time(time_flexibility, nominal_power, threshold_minutes)
+
+    @staticmethod
+    def required_power_batch(requested_energy, charged_energy, arrival_minutes, leave_minutes, charged_time,
+                             nominal_power, threshold_minutes=FLEXIBILITY_THRESHOLD_MINUTES) -> np.ndarray:
+        """
+        Vectorized calculate_required_power for arrays of sessions.
+
+        :return: required power of every session in kW
+        """
+        remaining_energy = np.subtract(requested_energy, charged_energy)
+        remaining_time = np.subtract(leave_minutes, arrival_minutes) - charged_time
+        nominal_power = np.asarray(nominal_power, dtype=np.float64)
+        pending = (remaining_time > 0) & (remaining_energy > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            urgent_power = np.minimum(nominal_power, remaining_energy / (remaining_time / 60))
+        required_power = np.where(remaining_time <= threshold_minutes, urgent_power, nominal_power)
+        return np.where(pending, required_power, 0.0)
@@ -1,27 +1,41 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Optional, Union
 from CarSpecs import *
 from ChargingPoint import *
 
 class AvailableFlexibilityRequest:
+    # Times are stored as whole minutes relative to an epoch, normally the simulation start.
+    # Without an explicit epoch the arrival time itself is used.
+    __slots__ = ("__session_id", "__evse_id", "__car_specs", "__requested_energy", "__epoch",
+                 "__arrival_minute", "__leave_minute", "__target_soc", "__charged_energy", "__charged_time",
+                 "__charge_complete", "__time_flexibility", "__power_flexibility", "__flexibility_contribution",
+                 "__flexibility_contribution_per_timestep", "power_supplied_per_timestep", "queued_step",
+                 "completed_at")
+
     def __init__(
         self,
         session_id: str,
         evse_id: ChargingPoint,
         requested_energy: float,
-        requested_leave_time: datetime,
-        arrival_time: datetime,
+        requested_leave_time: Union[datetime, int],
+        arrival_time: Union[datetime, int],
         car_specs: CarSpecs,
         charged_energy: float,
         charged_time:float,
-        
+        epoch: Optional[datetime] = None,
+        now: Optional[datetime] = None,
     ):
+        if epoch is None:
+            if not isinstance(arrival_time, datetime):
+                raise ValueError("An epoch is required when times are given in minutes.")
+            epoch = arrival_time
         self.__session_id = session_id
         self.__evse_id = evse_id
         self.__car_specs = car_specs
         self.__requested_energy = requested_energy
-        self.__requested_leave_time = requested_leave_time
-        self.__arrival_time = arrival_time
+        self.__epoch = epoch
+        self.__arrival_minute = self.__to_minute(arrival_time)
+        self.__leave_minute = self.__to_minute(requested_leave_time)
         self.__target_soc = car_specs.initial_soc + ((requested_energy / car_specs.battery_capacity_in_kwh)*100)
         self.__charged_energy = charged_energy
         self.__charged_time = charged_time
@@ -30,11 +44,16 @@ class AvailableFlexibilityRequest:
         self.__power_flexibility = 0
         self.__flexibility_contribution = 0
         self.__flexibility_contribution_per_timestep = []
+        self.power_supplied_per_timestep = []
+        self.queued_step = None  # Simulation step in which the request was queued, its per-step series start there
+        self.completed_at = None  # Time within a step at which the requested energy was reached
 
         # Validation when object is created
         self.__validate_requested_energy()
         self.__validate_soc()
         self.__validate_leave_time_after_start_time()
+        if now is not None:
+            self.validate_against_clock(now)
 
         # Calculate target_soc based on provided logic
         self.__calculate_target_soc()
@@ -62,11 +81,27 @@ class AvailableFlexibilityRequest:
 
     @property
     def requested_leave_time(self):
-        return self.__requested_leave_time
+        return self.__epoch + timedelta(minutes=self.__leave_minute)
 
     @property
     def arrival_time(self):
-        return self.__arrival_time
+        return self.__epoch + timedelta(minutes=self.__arrival_minute)
+
+    @property
+    def epoch(self):
+        return self.__epoch
+
+    @property
+    def arrival_minute(self):
+        return self.__arrival_minute
+
+    @property
+    def leave_minute(self):
+        return self.__leave_minute
+
+    @property
+    def duration_minutes(self):
+        return self.__leave_minute - self.__arrival_minute
 
         
     @property
@@ -85,6 +120,11 @@ class AvailableFlexibilityRequest:
     def flexibility_contribution(self):
         return self.__flexibility_contribution
     
+    # create a setter for evse_id, used when a connector is assigned on arrival
+    @evse_id.setter
+    def evse_id(self, evse_id: ChargingPoint):
+        self.__evse_id = evse_id
+
     # create a setter for charged_time
     @charged_time.setter
     def charged_time(self, charged_time):
@@ -120,11 +160,19 @@ class AvailableFlexibilityRequest:
         if not (0 <= self.car_specs.initial_soc <= 100):
             raise ValueError("State of charge (SoC) must be between 0 and 100%.")
 
-    # Validation to ensure requested leave time is in the future and after the charging start time
+    def __to_minute(self, value):
+        if isinstance(value, datetime):
+            return round((value - self.__epoch).total_seconds() / 60)
+        return int(value)
+
+    # Validation to ensure requested leave time is after the charging start time
     def __validate_leave_time_after_start_time(self):
-        if not self.__requested_leave_time > self.__arrival_time:
+        if not self.__leave_minute > self.__arrival_minute:
             raise ValueError("Requested leave time must be after charging start time.")
-        if not self.__requested_leave_time > datetime.now():
+
+    # Validation against the simulation clock instead of wall time
+    def validate_against_clock(self, now: datetime):
+        if not self.requested_leave_time > now:
             raise ValueError("Requested leave time must be in the future.")
 
     # Calculation of target_soc based on given logic
@@ -0,0 +1,115 @@
+import numpy as np
+from datetime import datetime
+from typing import Iterator, Optional, Sequence
+from CarSpecs import CarSpecs
+from ChargingPoint import ChargingPoint
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+
+class FlexibilityRequestBatch:
+    """
+    Array-backed collection of charging sessions that share one epoch.
+
+    Each field is a NumPy column, times are whole minutes since the epoch. The whole batch is
+    validated with array operations when it is built; AvailableFlexibilityRequest objects are
+    only created when a session is accessed, e.g. while the simulation consumes the batch.
+    """
+
+    def __init__(
+        self,
+        epoch: datetime,
+        requested_energy,
+        arrival_minutes,
+        leave_minutes,
+        nominal_power=11,
+        battery_capacity_in_kwh=100,
+        initial_soc=50,
+        charged_energy=0,
+        session_ids: Optional[Sequence[str]] = None,
+        session_prefix: str = "session",
+        now: Optional[datetime] = None,
+    ):
+        self.epoch = epoch
+        self.requested_energy = np.asarray(requested_energy, dtype=np.float64)
+        n = len(self.requested_energy)
+        self.arrival_minutes = self.__column(arrival_minutes, np.int32, n)
+        self.leave_minutes = self.__column(leave_minutes, np.int32, n)
+        self.nominal_power = self.__column(nominal_power, np.float32, n)
+        self.battery_capacity_in_kwh = self.__column(battery_capacity_in_kwh, np.float32, n)
+        self.initial_soc = self.__column(initial_soc, np.float32, n)
+        self.charged_energy = self.__column(charged_energy, np.float64, n)
+        if session_ids is not None and len(session_ids) != n:
+            raise ValueError("session_ids must have one entry per session.")
+        self.session_ids = session_ids
+        self.session_prefix = session_prefix
+
+        self.__validate()
+        if now is not None:
+            self.validate_against_clock(now)
+
+    @staticmethod
+    def __column(values, dtype, n):
+        column = np.asarray(values, dtype=dtype)
+        if column.ndim == 0:
+            return np.full(n, column, dtype=dtype)
+        if len(column) != n:
+            raise ValueError("All session columns must have the same length.")
+        return column
+
+    @staticmethod
+    def __first(mask):
+        return int(np.flatnonzero(mask)[0])
+
+    def __validate(self):
+        invalid = self.requested_energy <= 0
+        if invalid.any():
+            raise ValueError(f"Requested energy must be greater than 0 (session {self.__first(invalid)}).")
+        invalid = (self.initial_soc < 0) | (self.initial_soc > 100)
+        if invalid.any():
+            raise ValueError(f"State of charge (SoC) must be between 0 and 100% (session {self.__first(invalid)}).")
+        invalid = self.leave_minutes <= self.arrival_minutes
+        if invalid.any():
+            raise ValueError(f"Requested leave time must be after charging start time (session {self.__first(invalid)}).")
+
+    def validate_against_clock(self, now: datetime):
+        """Checks every leave time against the simulation clock."""
+        now_minute = (now - self.epoch).total_seconds() / 60
+        invalid = self.leave_minutes <= now_minute
+        if invalid.any():
+            raise ValueError(f"Requested leave time must be in the future (session {self.__first(invalid)}).")
+
+    def session_id(self, index: int) -> str:
+        if self.session_ids is not None:
+            return self.session_ids[index]
+        return f"{self.session_prefix}{index}"
+
+    def __len__(self):
+        return len(self.requested_energy)
+
+    def __getitem__(self, index: int) -> AvailableFlexibilityRequest:
+        if index < 0:
+            index += len(self)
+        car = CarSpecs(make="", model="", year=0,
+                       battery_capacity_in_kwh=float(self.battery_capacity_in_kwh[index]),
+                       initial_soc=float(self.initial_soc[index]))
+        return AvailableFlexibilityRequest(
+            self.session_id(index),
+            ChargingPoint(index + 1, float(self.nominal_power[index])),
+            float(self.requested_energy[index]),
+            int(self.leave_minutes[index]),
+            int(self.arrival_minutes[index]),
+            car,
+            float(self.charged_energy[index]),
+            0,
+            epoch=self.epoch,
+        )
+
+    def __iter__(self) -> Iterator[AvailableFlexibilityRequest]:
+        return (self[index] for index in range(len(self)))
+
+    def iter_by_arrival(self) -> Iterator[AvailableFlexibilityRequest]:
+        """Lazily yields the sessions ordered by arrival time."""
+        return (self[int(index)] for index in np.argsort(self.arrival_minutes, kind="stable"))
+
+    def to_requests(self):
+        return list(self)
@@ -0,0 +1,395 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from FlexibilityRequest import AvailableFlexibilityRequest
+from FlexSimulation import FlexibilitySimulation
+from SessionLog import RecordSessionLog
+from SimulationEvents import (EventSink, NullSink, DEBUG, SimulationEvent, AllocationEvent, AcceptanceEvent,
+                              CompletionEvent, DepartureEvent, RejectionEvent)
+from SupplyProfile import ConstantSupplyProfile
+
+
+class _StepCollector(EventSink):
+    """Collects the events of one step for the push update and forwards them to the user's sink."""
+
+    def __init__(self, sink: EventSink):
+        super().__init__(DEBUG)
+        self.sink = sink
+        self.allocations: Dict[str, float] = {}
+        self.accepted: List[str] = []
+        self.completed: List[str] = []
+        self.departed: List[str] = []
+        self.rejected: List[str] = []
+
+    def emit(self, event: SimulationEvent):
+        if isinstance(event, AllocationEvent):
+            self.allocations[event.session_id] = event.allocated_power
+        elif isinstance(event, AcceptanceEvent):
+            self.accepted.append(event.session_id)
+        elif isinstance(event, CompletionEvent):
+            self.completed.append(event.session_id)
+        elif isinstance(event, DepartureEvent):
+            self.departed.append(event.session_id)
+        elif isinstance(event, RejectionEvent):
+            self.rejected.append(event.session_id)
+        if self.sink.enabled(event.level):
+            self.sink.emit(event)
+
+    def take(self):
+        collected = (self.allocations, self.accepted, self.completed, self.departed, self.rejected)
+        self.allocations, self.accepted, self.completed, self.departed, self.rejected = {}, [], [], [], []
+        return collected
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+
+class StepUpdate:
+    """
+    Allocation update pushed to subscribers.
+
+    allocations holds the power of every charging session in the latest step. When a subscriber
+    lags behind, the updates of several steps are coalesced into one: the session lists then
+    cover all steps from first_step to step.
+    """
+
+    __slots__ = ("first_step", "step", "time", "power_supply", "allocations", "accepted", "completed",
+                 "departed", "rejected", "resynced")
+
+    def __init__(self, step: int, time: datetime, power_supply: float, allocations: Dict[str, float],
+                 accepted: List[str], completed: List[str], departed: List[str], rejected: List[str]):
+        self.first_step = step
+        self.step = step
+        self.time = time
+        self.power_supply = power_supply
+        self.allocations = allocations
+        self.accepted = accepted
+        self.completed = completed
+        self.departed = departed
+        self.rejected = rejected
+        self.resynced = False  # True if updates were dropped because the subscriber fell too far behind
+
+    @property
+    def coalesced_steps(self):
+        return self.step - self.first_step + 1
+
+    def copy(self) -> "StepUpdate":
+        update = StepUpdate(self.step, self.time, self.power_supply, self.allocations, self.accepted,
+                            self.completed, self.departed, self.rejected)
+        update.first_step = self.first_step
+        update.resynced = self.resynced
+        return update
+
+    def merge(self, later: "StepUpdate") -> "StepUpdate":
+        merged = StepUpdate(later.step, later.time, later.power_supply, later.allocations,
+                            self.accepted + later.accepted, self.completed + later.completed,
+                            self.departed + later.departed, self.rejected + later.rejected)
+        merged.first_step = self.first_step
+        merged.resynced = self.resynced or later.resynced
+        return merged
+
+    def to_dict(self):
+        return {
+            "first_step": self.first_step,
+            "step": self.step,
+            "time": self.time.isoformat(),
+            "power_supply": self.power_supply,
+            "allocations": self.allocations,
+            "accepted": self.accepted,
+            "completed": self.completed,
+            "departed": self.departed,
+            "rejected": self.rejected,
+            "resynced": self.resynced,
+        }
+
+
+class Subscription:
+    """
+    A subscriber's view of the update stream.
+
+    The step loop never waits for subscribers: it only appends to a shared history. Each
+    subscription reads from that history at its own pace, at most once per min_interval seconds,
+    and coalesces everything it missed into one update. A subscription that falls behind the
+    history is resynced to the latest step.
+    """
+
+    def __init__(self, service: "LiveSimulationService", min_interval: float = 0.0):
+        self.service = service
+        self.min_interval = min_interval
+        self.last_step = service.last_step
+        self.closed = False
+        self.__last_delivery = None
+
+    async def next(self) -> Optional[StepUpdate]:
+        """Waits for the next coalesced update; None once the subscription or the service has stopped."""
+        loop = asyncio.get_running_loop()
+        if self.__last_delivery is not None and self.min_interval > 0:
+            delay = self.__last_delivery + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        while not self.closed and self.service.last_step <= self.last_step:
+            if self.service.stopped:
+                return None
+            await self.service.wait_for_step()
+        if self.closed:
+            return None
+        update = self.service.updates_since(self.last_step)
+        self.last_step = update.step
+        self.__last_delivery = loop.time()
+        return update
+
+    def close(self):
+        self.closed = True
+        self.service.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        update = await self.next()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+
+class LiveSimulationService:
+    """
+    Runs a FlexibilitySimulation as an asyncio service.
+
+    Requests and supply updates can be submitted while it runs; they are applied at the start of
+    the next step. The clock advances by one time_step per tick, paced at `speed` simulated
+    seconds per wall-clock second (1 for real time, None for as fast as possible). After every
+    step an update with the allocations is published to the subscribers, see Subscription.
+    When run() ends, the simulation's run is finished: its events are flushed and its recorder,
+    ledger and retention policy are closed, so a service runs once.
+    """
+
+    def __init__(self, simulation: FlexibilitySimulation, requests: Iterable[AvailableFlexibilityRequest] = (),
+                 speed: Optional[float] = 1.0, history: int = 256):
+        self.simulation = simulation
+        self.speed = speed
+        self.running = False
+        self.stopped = False  # Set when the step loop has ended; subscriptions then run out
+        self.finished = False  # Set once run() has finished the simulation's run
+        self.steps = 0
+        self.late_steps = 0  # Steps that started behind the wall-clock schedule
+        self.max_lag = 0.0  # Largest delay behind schedule in seconds
+        self.__collector = _StepCollector(simulation.events if simulation.events is not None else NullSink())
+        simulation.events = self.__collector
+        self.__history = deque(maxlen=history)
+        self.__subscriptions: List[Subscription] = []
+        self.__submitted: deque = deque()
+        self.__supply: Optional[float] = None
+        self.__session_ids = set()
+        self.__step_event: Optional[asyncio.Event] = None
+        self.__stop = False
+        self.__parser = RecordSessionLog(path="<live>", epoch=simulation.start_time)
+        for request in requests:
+            self.submit(request)
+        simulation.start_run([])
+
+    @property
+    def last_step(self):
+        return self.__history[-1].step if self.__history else -1
+
+    @property
+    def subscribers(self):
+        return len(self.__subscriptions)
+
+    def submit(self, request: AvailableFlexibilityRequest):
+        """Queues a request; it enters the simulation at the next step after its arrival time."""
+        if request.session_id in self.__session_ids:
+            raise ValueError(f"Session {request.session_id} was already submitted.")
+        self.__session_ids.add(request.session_id)
+        self.__submitted.append(request)
+
+    def submit_record(self, record: dict) -> AvailableFlexibilityRequest:
+        """
+        Builds a request from a plain dict with the fields of a session log record and submits it.
+        Without an arrival_time the session arrives at the current simulation time.
+        """
+        record = dict(record)
+        record.setdefault("arrival_time", self.simulation.current_time)
+        request = self.__parser.build_request(record)
+        self.submit(request)
+        return request
+
+    def update_supply(self, capacity: float):
+        """Sets the available capacity from the next step on, replacing the supply profile."""
+        self.__supply = capacity
+
+    def subscribe(self, min_interval: float = 0.0) -> Subscription:
+        subscription = Subscription(self, min_interval)
+        self.__subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.__subscriptions:
+            self.__subscriptions.remove(subscription)
+
+    async def wait_for_step(self):
+        if self.__step_event is None:
+            self.__step_event = asyncio.Event()
+        await self.__step_event.wait()
+
+    def updates_since(self, step: int) -> StepUpdate:
+        """Coalesces all published updates after `step` into one."""
+        newer = [update for update in reversed(self.__history) if update.step > step]
+        newer.reverse()
+        merged = newer[0]
+        for update in newer[1:]:
+            merged = merged.merge(update)
+        if merged.first_step > step + 1:
+            # the history no longer holds all missed steps
+            merged = merged.copy()
+            merged.resynced = True
+        return merged
+
+    def stop(self):
+        self.__stop = True
+
+    def __apply_submissions(self):
+        simulation = self.simulation
+        while self.__submitted:
+            simulation.pending_requests.push(self.__submitted.popleft())
+        if self.__supply is not None:
+            simulation.supply_profile = ConstantSupplyProfile(self.__supply)
+            simulation.power_supply = self.__supply
+            self.__supply = None
+
+    def step(self):
+        """Applies the submissions, runs one time step and publishes its update."""
+        simulation = self.simulation
+        self.__apply_submissions()
+        target = simulation.current_time + timedelta(minutes=simulation.time_step)
+        supply = simulation.power_supply
+        simulation.run_until(target)
+        if simulation.current_time < target:
+            simulation.complete_step()  # Nothing queued: the clock still advances
+        allocations, accepted, completed, departed, rejected = self.__collector.take()
+        self.__history.append(StepUpdate(simulation.current_step - 1, simulation.current_time, supply, allocations,
+                                         accepted, completed, departed, rejected))
+        self.steps += 1
+        if self.__step_event is not None:
+            self.__step_event.set()
+            self.__step_event = None
+
+    async def run(self, until: Optional[datetime] = None, steps: Optional[int] = None):
+        """
+        Runs the step loop until stop() is called, the clock reaches `until` or `steps` steps are done,
+        then finishes the simulation's run.
+        """
+        if self.finished:
+            raise ValueError("The service has already run; its simulation run is finished.")
+        simulation = self.simulation
+        self.running = True
+        self.stopped = False
+        self.__stop = False
+        loop = asyncio.get_running_loop()
+        step_seconds = simulation.time_step * 60 / self.speed if self.speed else 0.0
+        started_wall = loop.time()
+        started_time = simulation.current_time
+        done = 0
+        try:
+            while not self.__stop and (until is None or simulation.current_time < until) and (steps is None or done < steps):
+                if self.speed:
+                    due = started_wall + (simulation.current_time - started_time).total_seconds() / self.speed
+                    lag = loop.time() - due
+                    if lag > 0:
+                        if lag > 0.1 * step_seconds:
+                            self.late_steps += 1
+                        self.max_lag = max(self.max_lag, lag)
+                        await asyncio.sleep(0)
+                    else:
+                        await asyncio.sleep(-lag)
+                else:
+                    await asyncio.sleep(0)
+                self.step()
+                done += 1
+        finally:
+            self.running = False
+            self.stopped = True
+            self.finished = True
+            simulation.finish_run(plot=False)
+            if self.__step_event is not None:
+                self.__step_event.set()
+                self.__step_event = None
+
+
+class LocalClient:
+    """In-process client of a LiveSimulationService, e.g. for tests and notebooks."""
+
+    def __init__(self, service: LiveSimulationService, min_interval: float = 0.0):
+        self.service = service
+        self.subscription = service.subscribe(min_interval)
+
+    def submit(self, record: dict) -> AvailableFlexibilityRequest:
+        return self.service.submit_record(record)
+
+    def update_supply(self, capacity: float):
+        self.service.update_supply(capacity)
+
+    async def next_update(self) -> Optional[StepUpdate]:
+        return await self.subscription.next()
+
+    def updates(self) -> Subscription:
+        return self.subscription
+
+    def close(self):
+        self.subscription.close()
+
+
+def attach_socketio(service: LiveSimulationService, server, min_interval: float = 0.5):
+    """
+    Serves a LiveSimulationService over an existing python-socketio AsyncServer.
+
+    Clients emit "submit" with a session record and "supply" with {"capacity": kW}; each
+    connected client receives coalesced "update" messages at most every min_interval seconds.
+    """
+    tasks = {}
+
+    async def push(sid, subscription):
+        async for update in subscription:
+            await server.emit("update", update.to_dict(), to=sid)
+
+    @server.event
+    async def connect(sid, environ, auth=None):
+        subscription = service.subscribe(min_interval)
+        tasks[sid] = (subscription, asyncio.ensure_future(push(sid, subscription)))
+
+    @server.event
+    async def disconnect(sid):
+        subscription, task = tasks.pop(sid, (None, None))
+        if subscription is not None:
+            subscription.close()
+            task.cancel()
+
+    @server.event
+    async def submit(sid, record):
+        try:
+            request = service.submit_record(record)
+        except (KeyError, ValueError, TypeError) as error:
+            return {"accepted": False, "error": str(error)}
+        return {"accepted": True, "session_id": request.session_id}
+
+    @server.event
+    async def supply(sid, data):
+        service.update_supply(float(data["capacity"]))
+        return {"accepted": True}
+
+    return server
+
+
+def create_socketio_server(service: LiveSimulationService, min_interval: float = 0.5, **kwargs):
+    """Creates an ASGI python-socketio server for the service; requires python-socketio."""
+    try:
+        import socketio
+    except ImportError as error:
+        raise ImportError("python-socketio is required for the socket.io service.") from error
+    server = socketio.AsyncServer(async_mode="asgi", **kwargs)
+    attach_socketio(service, server, min_interval)
+    return server, socketio.ASGIApp(server)
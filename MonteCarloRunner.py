@@ -0,0 +1,150 @@
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from CarSpecs import CarSpecs
+from ChargingPoint import ChargingPoint
+from FlexibilityRequest import AvailableFlexibilityRequest
+from FlexSimulation import FlexibilitySimulation
+from FleetEngine import VectorizedFlexibilitySimulation
+from SimulationEvents import NullSink
+
+
+class SessionSpec:
+    """
+    Picklable description of one charging session, relative to the scenario start.
+
+    Times are given in minutes after the start of the simulation.
+    """
+
+    def __init__(self, session_id: str, requested_energy: float, arrival_minute: float, leave_minute: float,
+                 nominal_power: float = 11, battery_capacity_in_kwh: float = 100, initial_soc: float = 50):
+        self.session_id = session_id
+        self.requested_energy = requested_energy
+        self.arrival_minute = arrival_minute
+        self.leave_minute = leave_minute
+        self.nominal_power = nominal_power
+        self.battery_capacity_in_kwh = battery_capacity_in_kwh
+        self.initial_soc = initial_soc
+
+    def build_request(self, start_time: datetime, connector_id) -> AvailableFlexibilityRequest:
+        car = CarSpecs(make="Synthetic", model="EV", year=2022,
+                       battery_capacity_in_kwh=self.battery_capacity_in_kwh, initial_soc=self.initial_soc)
+        return AvailableFlexibilityRequest(self.session_id, ChargingPoint(connector_id, self.nominal_power),
+                                           self.requested_energy, self.leave_minute, self.arrival_minute, car, 0, 0,
+                                           epoch=start_time)
+
+
+class ScenarioSpec:
+    """Everything a worker needs to rebuild and run one scenario: supply, time step and sessions."""
+
+    def __init__(self, sessions: List[SessionSpec], power_supply: float = 33.0, time_step: int = 15,
+                 vectorized: bool = False):
+        self.sessions = sessions
+        self.power_supply = power_supply
+        self.time_step = time_step
+        self.vectorized = vectorized
+
+    def build_requests(self, start_time: datetime) -> List[AvailableFlexibilityRequest]:
+        return [session.build_request(start_time, index + 1) for index, session in enumerate(self.sessions)]
+
+    def build_simulation(self, rng: random.Random, start_time: datetime) -> FlexibilitySimulation:
+        simulation_class = VectorizedFlexibilitySimulation if self.vectorized else FlexibilitySimulation
+        return simulation_class(self.power_supply, self.time_step, events=NullSink(), rng=rng, start_time=start_time)
+
+
+class ScenarioResult:
+    """Compact outcome of one seeded run; per-session values follow the order of ScenarioSpec.sessions."""
+
+    def __init__(self, seed: int, flexibility_contribution: np.ndarray, charged_energy: np.ndarray,
+                 rejected: int, completed: int, departed: int, steps: int):
+        self.seed = seed
+        self.flexibility_contribution = flexibility_contribution
+        self.charged_energy = charged_energy
+        self.rejected = rejected
+        self.completed = completed
+        self.departed = departed
+        self.steps = steps
+
+
+class MonteCarloResult:
+    """Stacked results of all runs: one row per seed, one column per session."""
+
+    def __init__(self, results: List[ScenarioResult]):
+        self.seeds = np.array([r.seed for r in results], dtype=np.int64)
+        self.flexibility_contribution = np.vstack([r.flexibility_contribution for r in results])
+        self.charged_energy = np.vstack([r.charged_energy for r in results])
+        self.rejected = np.array([r.rejected for r in results], dtype=np.int32)
+        self.completed = np.array([r.completed for r in results], dtype=np.int32)
+        self.departed = np.array([r.departed for r in results], dtype=np.int32)
+        self.steps = np.array([r.steps for r in results], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def contribution_summary(self, percentiles: Tuple[float, ...] = (5, 50, 95)):
+        """Mean, standard deviation and percentiles of the flexibility contribution per session."""
+        summary = {
+            "mean": self.flexibility_contribution.mean(axis=0),
+            "std": self.flexibility_contribution.std(axis=0),
+        }
+        for p in percentiles:
+            summary[f"p{p:g}"] = np.percentile(self.flexibility_contribution, p, axis=0)
+        return summary
+
+
+def run_scenario(spec: ScenarioSpec, seed: int, start_time: Optional[datetime] = None) -> ScenarioResult:
+    """Runs one scenario with its own seeded RNG and reduces it to a ScenarioResult."""
+    start_time = start_time if start_time is not None else datetime.now()
+    requests = spec.build_requests(start_time)
+    simulation = spec.build_simulation(random.Random(seed), start_time)
+    simulation.run_simulation(requests, plot=False)
+    steps = int((simulation.current_time - start_time) / timedelta(minutes=spec.time_step))
+    return ScenarioResult(
+        seed,
+        np.array([r.flexibility_contribution for r in requests], dtype=np.float64),
+        np.array([r.charged_energy for r in requests], dtype=np.float64),
+        len(simulation.rejected_requests),
+        len(simulation.completed_requests),
+        len(simulation.departed_requests),
+        steps,
+    )
+
+
+# Each worker receives the scenario once through the pool initializer, tasks only carry seeds
+_worker_spec: Optional[ScenarioSpec] = None
+
+
+def _init_worker(spec: ScenarioSpec):
+    global _worker_spec
+    _worker_spec = spec
+
+
+def _run_seed(seed: int) -> ScenarioResult:
+    return run_scenario(_worker_spec, seed)
+
+
+def run_monte_carlo(spec: ScenarioSpec, seeds: Iterable[int], processes: Optional[int] = None,
+                    chunksize: Optional[int] = None) -> MonteCarloResult:
+    """
+    Runs the scenario once per seed over a process pool.
+
+    :param spec: ScenarioSpec shared by all runs
+    :param seeds: one run per seed, each with its own random.Random(seed) for the power supply
+    :param processes: pool size, defaults to the number of CPUs; 1 runs in the calling process
+    :param chunksize: seeds per task, defaults to an even split of about four tasks per worker
+    :return: MonteCarloResult with one row per seed, in the order of seeds
+    """
+    seeds = list(seeds)
+    if not seeds:
+        raise ValueError("run_monte_carlo needs at least one seed.")
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(seeds) <= 1:
+        return MonteCarloResult([run_scenario(spec, seed) for seed in seeds])
+    if chunksize is None:
+        chunksize = max(1, len(seeds) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(spec,)) as pool:
+        results = list(pool.map(_run_seed, seeds, chunksize=chunksize))
+    return MonteCarloResult(results)
@@ -0,0 +1,236 @@
+import multiprocessing
+import os
+import random
+import numpy as np
+from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Union
+from AllocationStrategies import WaterFillingStrategy
+from FlexSimulation import FlexibilitySimulation
+from FleetEngine import VectorizedFlexibilitySimulation
+from MonteCarloRunner import ScenarioSpec, ScenarioResult
+from SimulationEvents import NullSink
+from SupplyProfile import SupplyProfile, ConstantSupplyProfile
+
+# Columns of the shared site table; reports are written by the workers, ALLOTMENT by the coordinator
+ACTIVE, NOMINAL_DEMAND, POWER_DEMAND, FLEXIBILITY_SUPPLY, SITE_LIMIT, ALLOTMENT = range(6)
+COLUMNS = 6
+
+
+class FeederCoordinator:
+    """
+    Splits the capacity of a shared feeder between sites at every step.
+
+    A site is never given more than its own connection limit or the nominal power of its
+    connected cars. Below that, each site first receives its firm demand, the power demand that
+    its flexibility cannot cover; when the feeder cannot supply all firm demands they are scaled
+    down proportionally. Remaining capacity is water-filled evenly over the sites.
+    """
+
+    def __init__(self, capacity: Union[float, SupplyProfile]):
+        self.supply_profile = capacity if isinstance(capacity, SupplyProfile) else ConstantSupplyProfile(capacity)
+
+    def split(self, table: np.ndarray, minute: float) -> float:
+        """Writes the allotment of every site into the table and returns the feeder capacity used."""
+        capacity = self.supply_profile.capacity_at(minute)
+        active = table[:, ACTIVE] > 0
+        cap = np.where(active, np.minimum(table[:, SITE_LIMIT], table[:, NOMINAL_DEMAND]), 0.0)
+        firm = np.minimum(np.maximum(table[:, POWER_DEMAND] - table[:, FLEXIBILITY_SUPPLY], 0.0), cap)
+        if capacity >= cap.sum():
+            allotment = cap
+        elif capacity <= firm.sum():
+            allotment = firm * (max(capacity, 0.0) / firm.sum()) if firm.sum() > 0 else np.zeros_like(firm)
+        else:
+            allotment = WaterFillingStrategy.fill(capacity, firm, cap, active.astype(np.float64))
+        table[:, ALLOTMENT] = allotment
+        return capacity
+
+
+class MultiSiteResult:
+    """Per-site results in the order of the site specs, plus the per-step feeder series."""
+
+    def __init__(self, sites: List[ScenarioResult], feeder_capacity: np.ndarray, allotments: np.ndarray):
+        self.sites = sites
+        self.feeder_capacity = feeder_capacity  # kW per step
+        self.allotments = allotments  # steps x sites, kW
+
+    @property
+    def feeder_power(self):
+        return self.allotments.sum(axis=1)
+
+    def __len__(self):
+        return len(self.sites)
+
+
+class _SiteGroup:
+    """The site simulations owned by one process, advanced in lockstep with the feeder."""
+
+    def __init__(self, indices: List[int], sites: List[ScenarioSpec], seeds: List[int], start_time: datetime):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.seeds = seeds
+        self.start_time = start_time
+        self.requests = []
+        self.simulations: List[FlexibilitySimulation] = []
+        for site, seed in zip(sites, seeds):
+            simulation_class = VectorizedFlexibilitySimulation if site.vectorized else FlexibilitySimulation
+            simulation = simulation_class(site.power_supply, site.time_step, events=NullSink(), rng=random.Random(seed),
+                                          start_time=start_time, supply_profile=ConstantSupplyProfile(site.power_supply))
+            requests = site.build_requests(start_time)
+            simulation.start_run(requests)
+            self.simulations.append(simulation)
+            self.requests.append(requests)
+        self.alive = [True] * len(self.simulations)
+
+    def report(self, table: np.ndarray):
+        """Handles arrivals and departures of every site and writes its demand to the table."""
+        for k, simulation in enumerate(self.simulations):
+            if self.alive[k]:
+                self.alive[k] = bool(simulation.queued_requests or simulation.pending_requests) and simulation.prepare_step()
+            row = table[self.indices[k]]
+            if self.alive[k]:
+                row[ACTIVE] = 1.0
+                row[NOMINAL_DEMAND] = simulation.nominal_power_demand()
+                row[POWER_DEMAND] = simulation.power_demand()
+                row[FLEXIBILITY_SUPPLY] = simulation.flexibility_supply()
+                row[SITE_LIMIT] = simulation.power_supply
+            else:
+                row[:ALLOTMENT] = 0.0
+
+    def advance(self, table: np.ndarray):
+        """Runs admission and allocation of every site with its allotment and advances the clocks."""
+        for k, simulation in enumerate(self.simulations):
+            if not self.alive[k]:
+                continue
+            site_limit = simulation.power_supply
+            simulation.power_supply = table[self.indices[k], ALLOTMENT]
+            while not simulation.admit():
+                if not (simulation.queued_requests or simulation.pending_requests) or not simulation.prepare_step():
+                    self.alive[k] = False
+                    break
+            if self.alive[k]:
+                simulation.complete_step()
+            else:
+                simulation.power_supply = site_limit
+
+    def results(self) -> List[ScenarioResult]:
+        results = []
+        for simulation, requests, seed in zip(self.simulations, self.requests, self.seeds):
+            simulation.finish_run(plot=False)
+            results.append(ScenarioResult(
+                seed,
+                np.array([r.flexibility_contribution for r in requests], dtype=np.float64),
+                np.array([r.charged_energy for r in requests], dtype=np.float64),
+                len(simulation.rejected_requests),
+                len(simulation.completed_requests),
+                len(simulation.departed_requests),
+                simulation.current_step,
+            ))
+        return results
+
+
+def _site_worker(indices, sites, seeds, start_time, memory_name, n_sites, barrier, results):
+    memory = SharedMemory(name=memory_name)
+    table = np.ndarray((n_sites + 1, COLUMNS), dtype=np.float64, buffer=memory.buf)
+    try:
+        group = _SiteGroup(indices, sites, seeds, start_time)
+        while True:
+            group.report(table)
+            barrier.wait()  # reports are complete
+            barrier.wait()  # allotments are written
+            if table[n_sites, ACTIVE] == 0:
+                break
+            group.advance(table)
+        results.put((indices, group.results()))
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del table
+        memory.close()
+
+
+def run_multi_site(sites: List[ScenarioSpec], feeder_capacity: Union[float, SupplyProfile],
+                   seeds: Optional[List[int]] = None, processes: Optional[int] = None,
+                   start_time: Optional[datetime] = None, timeout: Optional[float] = None) -> MultiSiteResult:
+    """
+    Runs many sites behind one feeder, the sites spread over worker processes.
+
+    Each ScenarioSpec describes one site; its power_supply is the site's own connection limit.
+    All sites share the start time and must share the time step. Every step the workers write
+    each site's demand and flexibility into a shared memory table, the coordinator in this
+    process writes back each site's share of the feeder capacity, and the workers allocate with
+    it. Site states stay in their worker; only the finished results are sent back.
+
+    :param sites: one ScenarioSpec per site
+    :param feeder_capacity: feeder capacity in kW, or a SupplyProfile over minutes since the start
+    :param seeds: one seed per site, defaults to the site index
+    :param processes: number of worker processes, defaults to the number of CPUs; 1 runs in this process
+    :param timeout: seconds to wait at each step for the slowest worker, None waits indefinitely
+    :return: MultiSiteResult
+    """
+    time_steps = {site.time_step for site in sites}
+    if len(time_steps) > 1:
+        raise ValueError("All sites must use the same time step.")
+    time_step = time_steps.pop() if time_steps else 15
+    seeds = list(seeds) if seeds is not None else list(range(len(sites)))
+    start_time = start_time if start_time is not None else datetime.now()
+    coordinator = FeederCoordinator(feeder_capacity)
+    n_sites = len(sites)
+    processes = max(1, min(processes or os.cpu_count() or 1, n_sites))
+    capacities, allotments = [], []
+
+    if processes == 1:
+        table = np.zeros((n_sites + 1, COLUMNS))
+        group = _SiteGroup(list(range(n_sites)), sites, seeds, start_time)
+        while True:
+            group.report(table)
+            if not table[:n_sites, ACTIVE].any():
+                break
+            capacities.append(coordinator.split(table[:n_sites], len(capacities) * time_step))
+            allotments.append(table[:n_sites, ALLOTMENT].copy())
+            group.advance(table)
+        return MultiSiteResult(group.results(), np.array(capacities), np.array(allotments).reshape(-1, n_sites))
+
+    context = multiprocessing.get_context()
+    memory = SharedMemory(create=True, size=(n_sites + 1) * COLUMNS * 8)
+    table = np.ndarray((n_sites + 1, COLUMNS), dtype=np.float64, buffer=memory.buf)
+    table[:] = 0.0
+    barrier = context.Barrier(processes + 1, timeout=timeout)
+    queue = context.Queue()
+    workers = []
+    try:
+        for indices in np.array_split(np.arange(n_sites), processes):
+            indices = indices.tolist()
+            worker = context.Process(target=_site_worker, daemon=True, args=(
+                indices, [sites[i] for i in indices], [seeds[i] for i in indices], start_time,
+                memory.name, n_sites, barrier, queue))
+            worker.start()
+            workers.append(worker)
+        while True:
+            barrier.wait()
+            if table[:n_sites, ACTIVE].any():
+                capacities.append(coordinator.split(table[:n_sites], len(capacities) * time_step))
+                allotments.append(table[:n_sites, ALLOTMENT].copy())
+                table[n_sites, ACTIVE] = 1.0
+            else:
+                table[n_sites, ACTIVE] = 0.0
+            barrier.wait()
+            if table[n_sites, ACTIVE] == 0:
+                break
+        site_results: List[Optional[ScenarioResult]] = [None] * n_sites
+        for _ in workers:
+            indices, results = queue.get()
+            for index, result in zip(indices, results):
+                site_results[index] = result
+        for worker in workers:
+            worker.join()
+    except BaseException:
+        barrier.abort()
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        del table
+        memory.close()
+        memory.unlink()
+    return MultiSiteResult(site_results, np.array(capacities), np.array(allotments).reshape(-1, n_sites))
@@ -0,0 +1,184 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+
+class ArrivalQueue:
+    """
+    Min-heap of requests that have not arrived yet, ordered by arrival_time.
+
+    Requests with the same arrival time keep the order in which they were pushed.
+    """
+
+    def __init__(self, requests: Optional[Iterable[AvailableFlexibilityRequest]] = None):
+        self.__counter = 0
+        self.__heap = []
+        if requests is not None:
+            for request in requests:
+                self.__heap.append((request.arrival_time, self.__counter, request))
+                self.__counter += 1
+            heapq.heapify(self.__heap)
+
+    def push(self, request: AvailableFlexibilityRequest):
+        heapq.heappush(self.__heap, (request.arrival_time, self.__counter, request))
+        self.__counter += 1
+
+    def next_arrival_time(self) -> Optional[datetime]:
+        """Arrival time of the earliest pending request, or None if the queue is empty."""
+        return self.__heap[0][0] if self.__heap else None
+
+    def pop_arrived(self, current_time: datetime) -> List[AvailableFlexibilityRequest]:
+        """Removes and returns all requests that have arrived by current_time, in arrival order."""
+        arrived = []
+        while self.__heap and self.__heap[0][0] <= current_time:
+            arrived.append(heapq.heappop(self.__heap)[2])
+        return arrived
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self.__heap))
+
+
+class StreamingArrivalQueue(ArrivalQueue):
+    """
+    Arrival queue fed lazily from an iterator of requests sorted by arrival_time.
+
+    Requests are pulled from the source only once they arrive within lookahead_minutes of the
+    current time, so the queue holds the sessions of the look-ahead window instead of the
+    whole log. The queue is truthy while requests are buffered or the source has more.
+    """
+
+    def __init__(self, requests: Iterable[AvailableFlexibilityRequest], lookahead_minutes: float = 60):
+        super().__init__()
+        self.lookahead = timedelta(minutes=lookahead_minutes)
+        self.__source = iter(requests)
+        self.__next = None  # First request of the source that has not been buffered yet
+        self.__advance()
+
+    def __advance(self):
+        previous = self.__next
+        self.__next = next(self.__source, None)
+        if previous is not None and self.__next is not None and self.__next.arrival_time < previous.arrival_time:
+            raise ValueError(f"Session {self.__next.session_id} is out of arrival order.")
+
+    def fill(self, until: datetime):
+        """Buffers the requests of the source that arrive by `until`."""
+        while self.__next is not None and self.__next.arrival_time <= until:
+            self.push(self.__next)
+            self.__advance()
+
+    def exhausted(self) -> bool:
+        return self.__next is None
+
+    def next_arrival_time(self) -> Optional[datetime]:
+        buffered = super().next_arrival_time()
+        if buffered is not None:
+            return buffered
+        return self.__next.arrival_time if self.__next is not None else None
+
+    def pop_arrived(self, current_time: datetime) -> List[AvailableFlexibilityRequest]:
+        self.fill(current_time + self.lookahead)
+        return super().pop_arrived(current_time)
+
+    def __bool__(self):
+        return len(self) > 0 or self.__next is not None
+
+
+class ActiveRequestSet:
+    """
+    Requests currently plugged in, indexed by session_id.
+
+    Iteration follows the order in which requests were added. Removal by session_id is O(1).
+    A lazily cleaned heap keeps an ordered view by requested_leave_time, so departures
+    only touch the sessions that actually leave.
+    """
+
+    def __init__(self):
+        self.__requests: Dict[str, AvailableFlexibilityRequest] = {}
+        self.__departures = []
+        self.__counter = 0
+
+    def add(self, request: AvailableFlexibilityRequest):
+        if request.session_id in self.__requests:
+            raise ValueError(f"Session {request.session_id} is already queued.")
+        self.__requests[request.session_id] = request
+        heapq.heappush(self.__departures, (request.requested_leave_time, self.__counter, request))
+        self.__counter += 1
+
+    def remove(self, session_id: str) -> AvailableFlexibilityRequest:
+        return self.__requests.pop(session_id)
+
+    def pop(self) -> AvailableFlexibilityRequest:
+        """Removes and returns the most recently added request."""
+        return self.__requests.popitem()[1]
+
+    def last(self) -> AvailableFlexibilityRequest:
+        """Returns the most recently added request without removing it."""
+        return next(reversed(self.__requests.values()))
+
+    def get(self, session_id: str) -> Optional[AvailableFlexibilityRequest]:
+        return self.__requests.get(session_id)
+
+    def next_departure_time(self) -> Optional[datetime]:
+        """Earliest requested_leave_time among the queued requests, or None if empty."""
+        self.__discard_stale()
+        return self.__departures[0][0] if self.__departures else None
+
+    def pop_departed(self, current_time: datetime) -> List[AvailableFlexibilityRequest]:
+        """Removes and returns the requests whose requested_leave_time has been reached."""
+        departed = []
+        while self.__departures and self.__departures[0][0] <= current_time:
+            request = heapq.heappop(self.__departures)[2]
+            if self.__requests.get(request.session_id) is request:
+                del self.__requests[request.session_id]
+                departed.append(request)
+        return departed
+
+    def __discard_stale(self):
+        # entries of requests that completed or were rejected are dropped once they reach the top
+        while self.__departures and self.__requests.get(self.__departures[0][2].session_id) is not self.__departures[0][2]:
+            heapq.heappop(self.__departures)
+
+    def __contains__(self, session_id):
+        return session_id in self.__requests
+
+    def __len__(self):
+        return len(self.__requests)
+
+    def __iter__(self):
+        return iter(list(self.__requests.values()))
+
+
+class WaitingQueue:
+    """
+    Cars that arrived while every connector was busy, ordered by priority.
+
+    The priority defaults to the requested leave time, so the car with the earliest deadline
+    gets the next free connector; pass e.g. ``lambda request: request.arrival_time`` for first
+    come, first served. Ties keep the order in which cars started waiting.
+    """
+
+    def __init__(self, priority: Optional[Callable[[AvailableFlexibilityRequest], Any]] = None):
+        self.priority = priority
+        self.__heap = []
+        self.__counter = 0
+
+    def push(self, request: AvailableFlexibilityRequest, since: datetime):
+        """Adds a car that started waiting at `since`."""
+        key = self.priority(request) if self.priority is not None else request.requested_leave_time
+        heapq.heappush(self.__heap, (key, self.__counter, request, since))
+        self.__counter += 1
+
+    def pop(self) -> Tuple[AvailableFlexibilityRequest, datetime]:
+        """Removes the waiting car with the highest priority and returns it with the time it started waiting."""
+        entry = heapq.heappop(self.__heap)
+        return entry[2], entry[3]
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self.__heap, key=lambda entry: entry[:2]))
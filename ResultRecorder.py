@@ -0,0 +1,273 @@
+import csv
+import os
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+
+def step_matrix(sessions: np.ndarray, steps: np.ndarray, values: np.ndarray, session_count: int, factor: int = 1) -> np.ndarray:
+    """
+    Sessions x steps matrix of per-step values, zero where a session has no value.
+
+    With factor > 1 each column is the mean of factor consecutive steps. The values are summed
+    into their columns directly, so the full sessions x steps matrix is never built.
+    """
+    columns = -(-(int(steps.max()) + 1) // factor) if len(steps) else 0
+    cells = np.asarray(sessions, dtype=np.int64) * columns + np.asarray(steps, dtype=np.int64) // factor
+    sums = np.bincount(cells, weights=values, minlength=session_count * columns)
+    return sums.reshape(session_count, columns) / factor
+
+
+class ChunkWriter(ABC):
+    """Receives finished chunks of a ResultRecorder table as a dict of equally long columns."""
+
+    @abstractmethod
+    def write(self, table: str, columns: Dict[str, np.ndarray]):
+        """Stores one chunk of the named table."""
+
+    def close(self):
+        pass
+
+
+class NpzChunkWriter(ChunkWriter):
+    """Writes each chunk to its own compressed file <directory>/<table>-<n>.npz."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.__counts: Dict[str, int] = {}
+
+    def write(self, table: str, columns: Dict[str, np.ndarray]):
+        index = self.__counts.get(table, 0)
+        self.__counts[table] = index + 1
+        np.savez_compressed(os.path.join(self.directory, f"{table}-{index:05d}.npz"), **columns)
+
+
+class CsvChunkWriter(ChunkWriter):
+    """Appends the chunks of every table to <directory>/<table>.csv."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.__files = {}
+
+    def write(self, table: str, columns: Dict[str, np.ndarray]):
+        if table not in self.__files:
+            handle = open(os.path.join(self.directory, f"{table}.csv"), "w", newline="", encoding="utf-8")
+            writer = csv.writer(handle)
+            writer.writerow(columns.keys())
+            self.__files[table] = (handle, writer)
+        handle, writer = self.__files[table]
+        writer.writerows(zip(*(column.tolist() for column in columns.values())))
+
+    def close(self):
+        for handle, _ in self.__files.values():
+            handle.close()
+        self.__files.clear()
+
+
+class ParquetChunkWriter(ChunkWriter):
+    """Writes every table to <directory>/<table>.parquet, one row group per chunk. Requires pyarrow."""
+
+    def __init__(self, directory: str):
+        if pq is None:
+            raise ImportError("ParquetChunkWriter requires pyarrow, install it with 'pip install pyarrow'.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.__writers = {}
+
+    def write(self, table: str, columns: Dict[str, np.ndarray]):
+        batch = pa.table(columns)
+        if table not in self.__writers:
+            self.__writers[table] = pq.ParquetWriter(os.path.join(self.directory, f"{table}.parquet"), batch.schema)
+        self.__writers[table].write_table(batch)
+
+    def close(self):
+        for writer in self.__writers.values():
+            writer.close()
+        self.__writers.clear()
+
+
+class _ChunkedTable:
+    """Typed columns filled into preallocated chunks of chunk_size rows."""
+
+    def __init__(self, name: str, dtypes: Dict[str, type], chunk_size: int):
+        self.name = name
+        self.dtypes = dtypes
+        self.chunk_size = chunk_size
+        self.chunks: List[Dict[str, np.ndarray]] = []
+        self.rows = 0  # rows used in the current chunk
+        self.current = self.__allocate()
+
+    def __allocate(self):
+        return {name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in self.dtypes.items()}
+
+    def append(self, *values):
+        if self.rows == self.chunk_size:
+            return False
+        row = self.rows
+        for column, value in zip(self.current.values(), values):
+            column[row] = value
+        self.rows += 1
+        return True
+
+    def extend(self, *columns):
+        """Appends equally long arrays, splitting them over chunks. Yields every chunk that became full."""
+        total = len(columns[0])
+        start = 0
+        while start < total:
+            count = min(total - start, self.chunk_size - self.rows)
+            for column, values in zip(self.current.values(), columns):
+                column[self.rows:self.rows + count] = values[start:start + count]
+            self.rows += count
+            start += count
+            if self.rows == self.chunk_size:
+                yield self.rotate()
+
+    def rotate(self):
+        """Closes the current chunk and starts a new one; returns the closed chunk trimmed to its rows."""
+        finished = {name: column[:self.rows] for name, column in self.current.items()}
+        self.current = self.__allocate()
+        self.rows = 0
+        return finished
+
+    def __len__(self):
+        return sum(len(next(iter(chunk.values()))) for chunk in self.chunks) + self.rows
+
+    def concatenate(self) -> Dict[str, np.ndarray]:
+        parts = self.chunks + [{name: column[:self.rows] for name, column in self.current.items()}]
+        return {name: np.concatenate([part[name] for part in parts]) for name in self.dtypes}
+
+
+class ResultRecorder:
+    """
+    Per-step simulation results in preallocated, typed columns.
+
+    Allocations are stored in long format, one row per (session, step), with the allocated power
+    and the flexibility contribution in kW. The supply is stored once per step. Sessions are
+    referred to by a dense integer index, see session_ids. Full chunks are handed to the writer,
+    if any, and kept in memory only when keep_in_memory is True.
+    """
+
+    def __init__(self, chunk_size: int = 65536, writer: Optional[ChunkWriter] = None, keep_in_memory: bool = True):
+        if writer is None and not keep_in_memory:
+            raise ValueError("A ResultRecorder without a writer must keep its chunks in memory.")
+        self.writer = writer
+        self.keep_in_memory = keep_in_memory
+        self.session_ids: List[str] = []
+        self.__session_index: Dict[str, int] = {}
+        self.allocations = _ChunkedTable("allocations", {
+            "session": np.int32, "step": np.int32, "allocated_power": np.float64, "flexibility_contribution": np.float64,
+        }, chunk_size)
+        self.supply = _ChunkedTable("supply", {"step": np.int32, "power_supply": np.float64}, max(1, chunk_size // 16))
+        self.closed = False
+        self.step_count = 0  # One past the last step with an allocation row
+        self.dropped_rows = 0  # Allocation rows handed to the writer and no longer held in memory
+        self.__by_session = None  # (row count, rows sorted by session, first row of each session), see session_series
+
+    def session_index(self, session_id: str) -> int:
+        """Dense index of a session, assigned on first use."""
+        index = self.__session_index.get(session_id)
+        if index is None:
+            index = len(self.session_ids)
+            self.__session_index[session_id] = index
+            self.session_ids.append(session_id)
+        return index
+
+    def __finish(self, table: _ChunkedTable, chunk: Dict[str, np.ndarray]):
+        if self.writer is not None:
+            self.writer.write(table.name, chunk)
+        if self.keep_in_memory:
+            table.chunks.append(chunk)
+        elif table is self.allocations:
+            self.dropped_rows += len(chunk["step"])
+
+    def record_allocation(self, session_id: str, step: int, allocated_power: float, flexibility_contribution: float = 0.0):
+        row = (self.session_index(session_id), step, allocated_power, flexibility_contribution)
+        self.step_count = max(self.step_count, step + 1)
+        if not self.allocations.append(*row):
+            self.__finish(self.allocations, self.allocations.rotate())
+            self.allocations.append(*row)
+
+    def record_allocations(self, sessions: np.ndarray, step: int, allocated_power: np.ndarray,
+                           flexibility_contribution: np.ndarray):
+        """Records one step for many sessions given by their session_index."""
+        steps = np.full(len(sessions), step, dtype=np.int32)
+        if len(sessions):
+            self.step_count = max(self.step_count, step + 1)
+        for chunk in self.allocations.extend(sessions, steps, allocated_power, flexibility_contribution):
+            self.__finish(self.allocations, chunk)
+
+    def record_supply(self, step: int, power_supply: float):
+        if not self.supply.append(step, power_supply):
+            self.__finish(self.supply, self.supply.rotate())
+            self.supply.append(step, power_supply)
+
+    def flush(self):
+        """Hands the partially filled chunks to the writer, e.g. at the end of a run."""
+        for table in (self.allocations, self.supply):
+            if table.rows:
+                self.__finish(table, table.rotate())
+
+    def close(self):
+        """Flushes, writes the "sessions" table and closes the writer; later calls do nothing."""
+        if self.closed:
+            return
+        self.flush()
+        if self.writer is not None:
+            self.writer.write("sessions", {"session": np.arange(len(self.session_ids), dtype=np.int32),
+                                           "session_id": np.array(self.session_ids, dtype=str)})
+            self.writer.close()
+        self.closed = True
+
+    def allocation_table(self) -> Dict[str, np.ndarray]:
+        """All allocation rows held in memory, as concatenated columns."""
+        return self.allocations.concatenate()
+
+    def supply_table(self) -> Dict[str, np.ndarray]:
+        return self.supply.concatenate()
+
+    def session_series(self, session_id: str, column: str = "allocated_power"):
+        """
+        Steps and values of one session, ordered by step.
+
+        The rows are sorted by session once and sorted again only after new rows were recorded,
+        so reading the series of every session costs one sort of the table rather than one scan
+        per session.
+        """
+        if self.dropped_rows:
+            raise ValueError(f"{self.dropped_rows} allocation rows were written out and dropped from memory; "
+                             "read the series from the writer's files or record with keep_in_memory=True.")
+        rows = len(self.allocations)
+        if self.__by_session is None or self.__by_session[0] != rows:
+            table = self.allocation_table()
+            order = np.argsort(table["session"], kind="stable")  # Rows of a session stay in step order
+            sorted_table = {name: column[order] for name, column in table.items()}
+            starts = np.searchsorted(sorted_table["session"], np.arange(len(self.session_ids) + 1))
+            self.__by_session = (rows, sorted_table, starts)
+        _, sorted_table, starts = self.__by_session
+        index = self.__session_index[session_id]
+        return sorted_table["step"][starts[index]:starts[index + 1]], sorted_table[column][starts[index]:starts[index + 1]]
+
+    def matrix(self, column: str = "allocated_power", factor: int = 1) -> np.ndarray:
+        """
+        Sessions x steps matrix of a column, zero where a session was not recorded.
+
+        :param factor: steps averaged into each column, see step_matrix
+        """
+        table = self.allocation_table()
+        return step_matrix(table["session"], table["step"], table[column], len(self.session_ids), factor)
+
+    def to_npz(self, path: str):
+        """Writes everything held in memory to one compressed NPZ file."""
+        allocations = self.allocation_table()
+        supply = self.supply_table()
+        np.savez_compressed(path, session_id=np.array(self.session_ids, dtype=str),
+                            **allocations, supply_step=supply["step"], power_supply=supply["power_supply"])
@@ -0,0 +1,140 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from CarSpecs import CarSpecs
+from ChargingPoint import ChargingPoint
+from FlexibilityRequest import AvailableFlexibilityRequest
+
+# Field name -> default column name in the log
+DEFAULT_COLUMNS = {
+    "session_id": "session_id",
+    "evse_id": "evse_id",
+    "requested_energy": "requested_energy",
+    "arrival_time": "arrival_time",
+    "leave_time": "leave_time",
+    "nominal_power": "nominal_power",
+    "battery_capacity_in_kwh": "battery_capacity_in_kwh",
+    "initial_soc": "initial_soc",
+    "make": "make",
+    "model": "model",
+    "year": "year",
+}
+
+
+class SessionLogReader(ABC):
+    """
+    Lazy reader of charging session logs.
+
+    Iterating yields one AvailableFlexibilityRequest per record, so a log can be passed to
+    FlexibilitySimulation.run_simulation(..., lookahead_minutes=...) without loading it first.
+    Arrival and leave times are ISO 8601 timestamps, or minutes after the epoch. Columns that
+    are missing from a record fall back to the defaults given here. Records are expected in
+    arrival order. With skip_invalid, records that fail validation are counted and skipped
+    instead of raising.
+    """
+
+    def __init__(self, path: str, epoch: Optional[datetime] = None, columns: Optional[Dict[str, str]] = None,
+                 nominal_power: float = 11, battery_capacity_in_kwh: float = 100, initial_soc: float = 50,
+                 skip_invalid: bool = False):
+        self.path = path
+        self.epoch = epoch
+        self.columns = dict(DEFAULT_COLUMNS, **(columns or {}))
+        self.nominal_power = nominal_power
+        self.battery_capacity_in_kwh = battery_capacity_in_kwh
+        self.initial_soc = initial_soc
+        self.skip_invalid = skip_invalid
+        self.skipped = 0
+
+    @abstractmethod
+    def records(self) -> Iterator[Tuple[int, dict]]:
+        """Yields (line number in the file, record) pairs, the line numbers used in error messages."""
+
+    def __iter__(self) -> Iterator[AvailableFlexibilityRequest]:
+        for line, record in self.records():
+            try:
+                yield self.build_request(record)
+            except (KeyError, ValueError, TypeError) as error:
+                if not self.skip_invalid:
+                    raise ValueError(f"{self.path}, line {line}: {error}") from error
+                self.skipped += 1
+
+    def __field(self, record: dict, name: str, default=None):
+        value = record.get(self.columns[name])
+        if value is None or value == "":
+            if default is None:
+                raise KeyError(f"Missing field '{self.columns[name]}'")
+            return default
+        return value
+
+    def __time(self, value):
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, (int, float)):
+            minutes = value
+        else:
+            try:
+                minutes = float(value)
+            except ValueError:
+                return datetime.fromisoformat(value)
+        if self.epoch is None:
+            raise ValueError("An epoch is required when times are given in minutes.")
+        return int(round(minutes))
+
+    def build_request(self, record: dict) -> AvailableFlexibilityRequest:
+        session_id = str(self.__field(record, "session_id"))
+        nominal_power = float(self.__field(record, "nominal_power", self.nominal_power))
+        car = CarSpecs(make=self.__field(record, "make", ""), model=self.__field(record, "model", ""),
+                       year=int(self.__field(record, "year", 0)),
+                       battery_capacity_in_kwh=float(self.__field(record, "battery_capacity_in_kwh",
+                                                                  self.battery_capacity_in_kwh)),
+                       initial_soc=float(self.__field(record, "initial_soc", self.initial_soc)))
+        connector = ChargingPoint(self.__field(record, "evse_id", session_id), nominal_power)
+        return AvailableFlexibilityRequest(session_id, connector, float(self.__field(record, "requested_energy")),
+                                           self.__time(self.__field(record, "leave_time")),
+                                           self.__time(self.__field(record, "arrival_time")), car, 0, 0,
+                                           epoch=self.epoch)
+
+
+class RecordSessionLog(SessionLogReader):
+    """Session log held as an iterable of dicts, e.g. records received over the network; line i is record i."""
+
+    def __init__(self, records: Iterable[dict] = (), path: str = "<records>", **kwargs):
+        super().__init__(path, **kwargs)
+        self.__records = records
+
+    def records(self) -> Iterator[Tuple[int, dict]]:
+        return enumerate(self.__records, start=1)
+
+
+class CsvSessionLog(SessionLogReader):
+    """Session log as a CSV file with a header row."""
+
+    def __init__(self, path: str, delimiter: str = ",", **kwargs):
+        super().__init__(path, **kwargs)
+        self.delimiter = delimiter
+
+    def records(self) -> Iterator[Tuple[int, dict]]:
+        with open(self.path, newline="", encoding="utf-8") as handle:
+            reader = csv.DictReader(handle, delimiter=self.delimiter)
+            for record in reader:
+                yield reader.line_num, record  # Last line of the record, after the header and any blank lines
+
+
+class JsonlSessionLog(SessionLogReader):
+    """Session log with one JSON object per line; blank lines are ignored."""
+
+    def records(self) -> Iterator[Tuple[int, dict]]:
+        with open(self.path, encoding="utf-8") as handle:
+            for number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as error:
+                    if not self.skip_invalid:
+                        raise ValueError(f"{self.path}, line {number}: {error}") from error
+                    self.skipped += 1
+                    continue
+                yield number, record
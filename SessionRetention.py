@@ -0,0 +1,236 @@
+import copyreg
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+from ResultRecorder import ChunkWriter
+
+
+class SessionSummary:
+    """
+    Compact record of a session that left the simulation.
+
+    Carries the attributes of AvailableFlexibilityRequest that reports and plots read, so it can
+    stand in for the request in completed_requests, departed_requests and rejected_requests.
+    The per-step series are only kept under the "keep" retention policy, otherwise they are empty.
+    """
+
+    __slots__ = ("session_id", "evse_id", "arrival_time", "requested_leave_time", "requested_energy",
+                 "charged_energy", "flexibility_contribution", "outcome", "finished_at", "completed_at", "missed",
+                 "late", "power_supplied_per_timestep", "flexibility_contribution_per_timestep", "queued_step")
+
+    def __init__(self, session_id: str, evse_id, arrival_time: datetime, requested_leave_time: datetime,
+                 requested_energy: float, charged_energy: float, flexibility_contribution: float, outcome: str,
+                 finished_at: datetime, completed_at: Optional[datetime], missed: bool, late: bool,
+                 power_supplied_per_timestep=(), flexibility_contribution_per_timestep=(),
+                 queued_step: Optional[int] = None):
+        self.session_id = session_id
+        self.evse_id = evse_id  # id of the ChargingPoint, not the object
+        self.arrival_time = arrival_time
+        self.requested_leave_time = requested_leave_time
+        self.requested_energy = requested_energy
+        self.charged_energy = charged_energy
+        self.flexibility_contribution = flexibility_contribution
+        self.outcome = outcome  # "completed", "departed" or "rejected"
+        self.finished_at = finished_at  # start of the time step in which the session left
+        self.completed_at = completed_at  # time the requested energy was reached, None unless completed
+        self.missed = missed  # left without the requested energy
+        self.late = late  # completed after the requested leave time
+        self.power_supplied_per_timestep = power_supplied_per_timestep
+        self.flexibility_contribution_per_timestep = flexibility_contribution_per_timestep
+        self.queued_step = queued_step  # first step of the series, None if the session was never queued
+
+    def __repr__(self):
+        return (f"SessionSummary(session_id='{self.session_id}', outcome='{self.outcome}', "
+                f"charged_energy={self.charged_energy}, requested_energy={self.requested_energy})")
+
+
+class RetentionPolicy:
+    """
+    What happens to the per-step series of a session once it has been summarized.
+
+    "keep" moves them into the summary, "drop" discards them and "spill" writes them to the
+    writer in chunks of chunk_size rows, as one "allocations" table with columns session_id,
+    step, allocated_power and flexibility_contribution (both in kW), the layout ResultRecorder
+    writes. Steps are the integer simulation steps in which the power was allocated, counted
+    from the step in which the session was queued.
+
+    :param writer: ChunkWriter for "spill", e.g. an NpzChunkWriter or CsvChunkWriter
+    """
+
+    SERIES = ("keep", "spill", "drop")
+
+    def __init__(self, series: str = "drop", writer: Optional[ChunkWriter] = None, chunk_size: int = 65536):
+        if series not in self.SERIES:
+            raise ValueError(f"Series retention must be one of {self.SERIES}.")
+        if series == "spill" and writer is None:
+            raise ValueError("Spilling series requires a ChunkWriter.")
+        self.series = series
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.__queued_steps: Dict[str, int] = {}  # session_id -> step it was queued in, for open sessions
+        self.__buffer = ([], [], [], [])
+        self.closed = False
+
+    def queued(self, session_id: str, step: int):
+        """Notes the step in which a session was queued; its series start with that step."""
+        if self.series == "spill":
+            self.__queued_steps[session_id] = step
+
+    def spill(self, session_id: str, nominal_power: float, power_supplied: List[float]):
+        """
+        Buffers the series of one session and writes the buffer once it is full.
+
+        The flexibility contribution of a step is the nominal power minus the allocated power, as
+        the simulation books it.
+        """
+        first_step = self.__queued_steps.pop(session_id, None)
+        if first_step is None or not power_supplied:
+            return
+        session_ids, steps, allocated_power, contribution = self.__buffer
+        session_ids.extend([session_id] * len(power_supplied))
+        steps.extend(range(first_step, first_step + len(power_supplied)))
+        allocated_power.extend(power_supplied)
+        contribution.extend(max(0.0, nominal_power - power) for power in power_supplied)
+        if len(steps) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows."""
+        session_ids, steps, allocated_power, contribution = self.__buffer
+        if not steps:
+            return
+        self.writer.write("allocations", {
+            "session_id": np.array(session_ids, dtype=str),
+            "step": np.array(steps, dtype=np.int32),
+            "allocated_power": np.array(allocated_power, dtype=np.float64),
+            "flexibility_contribution": np.array(contribution, dtype=np.float64),
+        })
+        for column in self.__buffer:
+            column.clear()
+
+    def close(self):
+        """Writes the buffered rows and closes the writer; later calls do nothing."""
+        if self.closed:
+            return
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+        self.closed = True
+
+
+class SessionArchive(list):
+    """
+    List of finished sessions that stores a SessionSummary in place of each added request.
+
+    Every method that adds items summarizes them, and every method that adds or removes items
+    updates running totals, so statistics() is O(1) however long the run.
+
+    :param outcome: "completed", "departed" or "rejected"
+    """
+
+    def __init__(self, simulation, outcome: str, policy: RetentionPolicy):
+        super().__init__()
+        self.simulation = simulation
+        self.outcome = outcome
+        self.policy = policy
+        self.requested_energy = 0.0
+        self.charged_energy = 0.0
+        self.flexibility_contribution = 0.0
+        self.missed = 0
+        self.late = 0
+
+    def __reduce_ex__(self, protocol):
+        # The items are restored with the totals in __setstate__, not appended one by one
+        return copyreg.__newobj__, (type(self),), (self.__dict__, list(self))
+
+    def __setstate__(self, state):
+        attributes, summaries = state
+        self.__dict__.update(attributes)
+        super().extend(summaries)
+
+    def __count(self, summaries, sign: int):
+        for summary in summaries:
+            self.requested_energy += sign * summary.requested_energy
+            self.charged_energy += sign * summary.charged_energy
+            self.flexibility_contribution += sign * summary.flexibility_contribution
+            self.missed += sign * summary.missed
+            self.late += sign * summary.late
+
+    def append(self, request):
+        summary = self.summarize(request)
+        super().append(summary)
+        self.__count((summary,), 1)
+
+    def insert(self, index, request):
+        summary = self.summarize(request)
+        super().insert(index, summary)
+        self.__count((summary,), 1)
+
+    def extend(self, requests):
+        summaries = [self.summarize(request) for request in requests]
+        super().extend(summaries)
+        self.__count(summaries, 1)
+
+    def __iadd__(self, requests):
+        self.extend(requests)
+        return self
+
+    def __setitem__(self, index, requests):
+        if isinstance(index, slice):
+            removed = self[index]
+            summaries = [self.summarize(request) for request in requests]
+            super().__setitem__(index, summaries)
+        else:
+            removed = [self[index]]
+            summaries = [self.summarize(requests)]
+            super().__setitem__(index, summaries[0])
+        self.__count(removed, -1)
+        self.__count(summaries, 1)
+
+    def __delitem__(self, index):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self.__count(removed, -1)
+
+    def pop(self, index=-1):
+        summary = super().pop(index)
+        self.__count((summary,), -1)
+        return summary
+
+    def remove(self, summary):
+        super().remove(summary)
+        self.__count((summary,), -1)
+
+    def clear(self):
+        self.__count(self, -1)
+        super().clear()
+
+    def summarize(self, request) -> SessionSummary:
+        """Turns a request that left the simulation into its summary and applies the retention policy."""
+        if isinstance(request, SessionSummary):
+            return request
+        simulation = self.simulation
+        completed_at = getattr(request, "completed_at", None) if self.outcome == "completed" else None
+        missed = request.charged_energy < request.requested_energy
+        late = completed_at is not None and completed_at > request.requested_leave_time
+        power_supplied = request.power_supplied_per_timestep
+        contribution = request.flexibility_contribution_per_timestep
+        if self.policy.series == "spill" and simulation.recorder is None:
+            self.policy.spill(request.session_id, request.evse_id.nominal_power_cp, power_supplied)
+        keep = self.policy.series == "keep"
+        return SessionSummary(request.session_id, getattr(request.evse_id, "evse_id", request.evse_id),
+                              request.arrival_time, request.requested_leave_time, request.requested_energy,
+                              request.charged_energy, request.flexibility_contribution, self.outcome,
+                              simulation.current_time, completed_at, missed, late,
+                              list(power_supplied) if keep else (), list(contribution) if keep else (),
+                              getattr(request, "queued_step", None))
+
+    def statistics(self) -> dict:
+        return {
+            "sessions": len(self),
+            "requested_energy": self.requested_energy,
+            "charged_energy": self.charged_energy,
+            "flexibility_contribution": self.flexibility_contribution,
+            "missed": self.missed,
+            "late": self.late,
+        }
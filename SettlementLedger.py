@@ -0,0 +1,286 @@
+import csv
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    from fpdf import FPDF
+except ImportError:  # PDF statements are optional
+    FPDF = None
+
+
+class Tariff(ABC):
+    """Price paid per kWh of flexibility contributed at a given moment."""
+
+    currency = "EUR"
+
+    @abstractmethod
+    def price_at(self, moment: datetime) -> float:
+        """Price per kWh for the step starting at moment."""
+
+
+class FlatTariff(Tariff):
+    """The same price for every kWh contributed."""
+
+    def __init__(self, price_per_kwh: float, currency: str = "EUR"):
+        self.price_per_kwh = price_per_kwh
+        self.currency = currency
+
+    def price_at(self, moment: datetime) -> float:
+        return self.price_per_kwh
+
+
+class TimeOfUseTariff(Tariff):
+    """
+    Price per kWh by hour of the day, e.g. higher in the evening peak.
+
+    :param hourly_prices: 24 prices, the first one for 00:00-01:00
+    """
+
+    def __init__(self, hourly_prices: Sequence[float], currency: str = "EUR"):
+        if len(hourly_prices) != 24:
+            raise ValueError("A time-of-use tariff needs one price per hour of the day.")
+        self.hourly_prices = [float(price) for price in hourly_prices]
+        self.currency = currency
+
+    def price_at(self, moment: datetime) -> float:
+        return self.hourly_prices[moment.hour]
+
+
+class SessionStatement:
+    """Settled flexibility contribution and reward of one session."""
+
+    __slots__ = ("session_id", "evse_id", "arrival_time", "requested_leave_time", "contributed_energy",
+                 "reward", "contributing_steps", "settled_at")
+
+    FIELDS = __slots__
+
+    def __init__(self, session_id: str, evse_id, arrival_time: Optional[datetime], requested_leave_time: Optional[datetime],
+                 contributed_energy: float, reward: float, contributing_steps: int, settled_at: datetime):
+        self.session_id = session_id
+        self.evse_id = evse_id
+        self.arrival_time = arrival_time
+        self.requested_leave_time = requested_leave_time
+        self.contributed_energy = contributed_energy  # kWh
+        self.reward = reward
+        self.contributing_steps = contributing_steps
+        self.settled_at = settled_at
+
+    def row(self) -> List:
+        return [getattr(self, field) for field in self.FIELDS]
+
+
+class StatementWriter(ABC):
+    """Receives the statements of settled sessions one at a time."""
+
+    @abstractmethod
+    def write(self, statement: SessionStatement):
+        """Stores the statement of one settled session."""
+
+    def close(self):
+        pass
+
+
+class CsvStatementWriter(StatementWriter):
+    """Appends one row per settled session to a CSV file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__handle = open(path, "w", newline="", encoding="utf-8")
+        self.__writer = csv.writer(self.__handle)
+        self.__writer.writerow(SessionStatement.FIELDS)
+
+    def write(self, statement: SessionStatement):
+        self.__writer.writerow(statement.row())
+
+    def close(self):
+        if not self.__handle.closed:
+            self.__handle.close()
+
+
+class PdfStatementWriter(StatementWriter):
+    """
+    Writes the statements to PDF files of at most sessions_per_file sessions each, as
+    <directory>/statements-<n>.pdf with one table row per session. Requires fpdf.
+
+    A file is written out and dropped once it is full, so only one file is held in memory.
+    """
+
+    COLUMNS = (("Session", 45), ("EVSE", 20), ("Arrival", 35), ("Leave", 35), ("Energy (kWh)", 25), ("Reward", 25))
+
+    def __init__(self, directory: str, sessions_per_file: int = 5000, title: str = "Flexibility reward statements",
+                 currency: str = "EUR"):
+        if FPDF is None:
+            raise ImportError("PdfStatementWriter requires fpdf, install it with 'pip install fpdf'.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sessions_per_file = sessions_per_file
+        self.title = title
+        self.currency = currency
+        self.files = 0
+        self.__pdf = None
+        self.__rows = 0
+        self.__energy = 0.0
+        self.__reward = 0.0
+
+    def write(self, statement: SessionStatement):
+        if self.__pdf is None:
+            self.__open()
+        pdf = self.__pdf
+        if pdf.get_y() > pdf.h - pdf.b_margin - 6:
+            pdf.add_page()
+            self.__header()
+        values = (str(statement.session_id), str(statement.evse_id),
+                  self.__time(statement.arrival_time), self.__time(statement.requested_leave_time),
+                  f"{statement.contributed_energy:.3f}", f"{statement.reward:.2f}")
+        for (_, width), value in zip(self.COLUMNS, values):
+            pdf.cell(width, 5, value[:28], border=0)
+        pdf.ln()
+        self.__rows += 1
+        self.__energy += statement.contributed_energy
+        self.__reward += statement.reward
+        if self.__rows >= self.sessions_per_file:
+            self.__finish()
+
+    def close(self):
+        if self.__pdf is not None:
+            self.__finish()
+
+    def __open(self):
+        self.__pdf = FPDF()
+        self.__pdf.set_auto_page_break(False)
+        self.__pdf.add_page()
+        self.__pdf.set_font("Helvetica", "B", 12)
+        self.__pdf.cell(0, 8, f"{self.title} ({self.files + 1})", ln=1)
+        self.__header()
+
+    def __header(self):
+        pdf = self.__pdf
+        pdf.set_font("Helvetica", "B", 8)
+        for name, width in self.COLUMNS:
+            pdf.cell(width, 6, name, border="B")
+        pdf.ln()
+        pdf.set_font("Helvetica", "", 8)
+
+    def __finish(self):
+        pdf = self.__pdf
+        pdf.ln(2)
+        pdf.set_font("Helvetica", "B", 8)
+        pdf.cell(0, 6, f"{self.__rows} sessions, {self.__energy:.3f} kWh, {self.__reward:.2f} {self.currency}", ln=1)
+        pdf.output(os.path.join(self.directory, f"statements-{self.files:05d}.pdf"), "F")
+        self.files += 1
+        self.__pdf = None
+        self.__rows = 0
+        self.__energy = 0.0
+        self.__reward = 0.0
+
+    @staticmethod
+    def __time(moment: Optional[datetime]) -> str:
+        return moment.strftime("%Y-%m-%d %H:%M") if moment is not None else ""
+
+
+class SettlementLedger:
+    """
+    Running flexibility energy and reward of every open session.
+
+    Each step the simulation books the energy a session gave up (its flexibility contribution
+    times the step length) at the tariff's price for that step, an O(1) update per session.
+    When a session leaves, its entry is settled: turned into a SessionStatement, handed to the
+    writers and dropped, so the ledger only holds the sessions currently on site.
+
+    The simulation opens an entry for every session it queues, so sessions that never had to
+    give up power are settled with a zero reward as well. Cars rejected before they were queued
+    get no statement.
+
+    :param keep_statements: also keep the settled statements in memory, e.g. for small runs
+    :param include_zero_sessions: also write statements for sessions that never contributed;
+        when False they are settled without a statement and only counted in zero_sessions
+    """
+
+    def __init__(self, tariff: Tariff, writers: Iterable[StatementWriter] = (), keep_statements: bool = False,
+                 include_zero_sessions: bool = True):
+        self.tariff = tariff
+        self.writers = list(writers)
+        self.keep_statements = keep_statements
+        self.include_zero_sessions = include_zero_sessions
+        self.statements: List[SessionStatement] = []
+        self.__open: Dict[str, List[float]] = {}  # session_id -> [energy, reward, steps]
+        self.settled_sessions = 0
+        self.zero_sessions = 0  # Settled sessions that never contributed
+        self.total_energy = 0.0
+        self.total_reward = 0.0
+
+    def open_session(self, session_id: str):
+        """Opens the entry of a session that was queued, so it is settled even if it never contributes."""
+        if session_id not in self.__open:
+            self.__open[session_id] = [0.0, 0.0, 0]
+
+    def book(self, moment: datetime, session_id: str, energy: float):
+        """Books the contributed energy in kWh of one session for the step starting at moment."""
+        self.book_many(moment, (session_id,), (energy,))
+
+    def book_many(self, moment: datetime, session_ids: Iterable[str], energies: Iterable[float]):
+        """Books the contributed energy in kWh of the given sessions for the step starting at moment."""
+        price = self.tariff.price_at(moment)
+        entries = self.__open
+        for session_id, energy in zip(session_ids, energies):
+            entry = entries.get(session_id)
+            if entry is None:
+                entry = entries[session_id] = [0.0, 0.0, 0]
+            entry[0] += energy
+            entry[1] += energy * price
+            entry[2] += 1
+
+    def balance(self, session_id: str):
+        """Energy in kWh and reward booked so far for an open session, zeros if it has none."""
+        entry = self.__open.get(session_id)
+        return (entry[0], entry[1]) if entry is not None else (0.0, 0.0)
+
+    def settle(self, request, moment: datetime) -> Optional[SessionStatement]:
+        """
+        Closes the entry of a request that left the site.
+
+        :return: the statement, or None if the request has no entry or never contributed and
+            include_zero_sessions is False
+        """
+        entry = self.__open.pop(request.session_id, None)
+        if entry is None:
+            return None
+        if entry[2] == 0:
+            self.zero_sessions += 1
+            if not self.include_zero_sessions:
+                return None
+        evse_id = getattr(request.evse_id, "evse_id", request.evse_id)  # id of the ChargingPoint
+        statement = SessionStatement(request.session_id, evse_id, request.arrival_time,
+                                     request.requested_leave_time, entry[0], entry[1], entry[2], moment)
+        self.settled_sessions += 1
+        self.total_energy += entry[0]
+        self.total_reward += entry[1]
+        for writer in self.writers:
+            writer.write(statement)
+        if self.keep_statements:
+            self.statements.append(statement)
+        return statement
+
+    def settle_all(self, requests: Iterable, moment: datetime):
+        """Settles every request of an iterable that still has an open entry."""
+        for request in requests:
+            self.settle(request, moment)
+
+    def open_sessions(self) -> int:
+        return len(self.__open)
+
+    def summary(self) -> dict:
+        return {
+            "settled_sessions": self.settled_sessions,
+            "zero_sessions": self.zero_sessions,
+            "open_sessions": len(self.__open),
+            "contributed_energy": self.total_energy,
+            "reward": self.total_reward,
+            "currency": self.tariff.currency,
+        }
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
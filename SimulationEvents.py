@@ -0,0 +1,236 @@
+import json
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import ClassVar, List
+
+# Event levels, same numbering as the logging module
+DEBUG = 10
+INFO = 20
+WARNING = 30
+DISABLED = 100
+
+
+@dataclass(frozen=True)
+class SimulationEvent:
+    """Base class of all events emitted by FlexibilitySimulation."""
+    time: datetime
+    level: ClassVar[int] = INFO
+    kind: ClassVar[str] = "event"
+
+    def to_dict(self):
+        record = asdict(self)
+        record["kind"] = self.kind
+        for key, value in record.items():
+            if isinstance(value, datetime):
+                record[key] = value.isoformat()
+        return record
+
+    def message(self):
+        return f"{self.kind}: {self.to_dict()}"
+
+
+@dataclass(frozen=True)
+class ArrivalEvent(SimulationEvent):
+    session_id: str
+    kind: ClassVar[str] = "arrival"
+
+    def message(self):
+        return f"New request added to the queue: {self.session_id} at {self.time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+@dataclass(frozen=True)
+class AcceptanceEvent(SimulationEvent):
+    session_id: str
+    kind: ClassVar[str] = "acceptance"
+
+    def message(self):
+        return f"Request {self.session_id} has been accepted."
+
+
+@dataclass(frozen=True)
+class AllocationEvent(SimulationEvent):
+    session_id: str
+    allocated_power: float
+    level: ClassVar[int] = DEBUG
+    kind: ClassVar[str] = "allocation"
+
+    def message(self):
+        return f"Allocated {self.allocated_power:.2f} kW to {self.session_id}"
+
+
+@dataclass(frozen=True)
+class CompletionEvent(SimulationEvent):
+    session_id: str
+    charged_energy: float
+    completion_time: datetime
+    kind: ClassVar[str] = "completion"
+
+    def message(self):
+        return f"{self.session_id} is fully charged with {self.charged_energy:.2f} kWh. At time {self.completion_time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+@dataclass(frozen=True)
+class RejectionEvent(SimulationEvent):
+    session_id: str
+    charged_energy: float
+    requested_energy: float
+    level: ClassVar[int] = WARNING
+    kind: ClassVar[str] = "rejection"
+
+    def message(self):
+        return (f"Rejecting request due to insufficient flexibility: {self.session_id}\n"
+                f"It has been charged with : {self.charged_energy} kW energy. However the requested energy was : {self.requested_energy} kW")
+
+
+@dataclass(frozen=True)
+class DepartureEvent(SimulationEvent):
+    session_id: str
+    charged_energy: float
+    requested_energy: float
+    level: ClassVar[int] = WARNING
+    kind: ClassVar[str] = "departure"
+
+    def message(self):
+        return f"{self.session_id} left at {self.time.strftime('%Y-%m-%d %H:%M:%S')} with {self.charged_energy:.2f} of {self.requested_energy:.2f} kWh charged."
+
+
+@dataclass(frozen=True)
+class FlexibilityEvent(SimulationEvent):
+    flexibility_demand: float
+    flexibility_supply: float
+    level: ClassVar[int] = DEBUG
+    kind: ClassVar[str] = "flexibility"
+
+    def message(self):
+        return f"Flexibility Demand  {self.flexibility_demand}\nFlexibility Supply  {self.flexibility_supply}"
+
+
+@dataclass(frozen=True)
+class LoadManagementEvent(SimulationEvent):
+    power_supply: float
+    level: ClassVar[int] = DEBUG
+    kind: ClassVar[str] = "load_management"
+
+    def message(self):
+        return "Demand exceeds supply, applying flexibility."
+
+
+@dataclass(frozen=True)
+class TimeStepEvent(SimulationEvent):
+    level: ClassVar[int] = DEBUG
+    kind: ClassVar[str] = "time_step"
+
+    def message(self):
+        return f"Time: {self.time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+@dataclass(frozen=True)
+class SupplyUpdateEvent(SimulationEvent):
+    power_supply: float
+    level: ClassVar[int] = DEBUG
+    kind: ClassVar[str] = "supply_update"
+
+    def message(self):
+        return f"Power Supply Updated to {self.power_supply} kW\n-----"
+
+
+@dataclass(frozen=True)
+class SimulationEndEvent(SimulationEvent):
+    kind: ClassVar[str] = "simulation_end"
+
+    def message(self):
+        return "No active charging requests. Ending simulation."
+
+
+class EventSink(ABC):
+    """
+    Receives simulation events at or above its level.
+
+    Callers check ``enabled(level)`` before building an event, so a sink that rejects a
+    level costs one comparison per call site and no formatting.
+    """
+
+    def __init__(self, level: int = INFO):
+        self.level = level
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    @abstractmethod
+    def emit(self, event: SimulationEvent):
+        """Handles one event; only called for levels the sink is enabled for."""
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(EventSink):
+    """Discards every event."""
+
+    def __init__(self):
+        super().__init__(DISABLED)
+
+    def enabled(self, level: int) -> bool:
+        return False
+
+    def emit(self, event: SimulationEvent):
+        pass
+
+
+class ConsoleSink(EventSink):
+    """Prints the human readable message of each event, as the simulation used to."""
+
+    def emit(self, event: SimulationEvent):
+        print(event.message())
+
+
+class JsonlFileSink(EventSink):
+    """Writes one JSON object per event to a file, buffering buffer_size events between writes."""
+
+    def __init__(self, path: str, level: int = INFO, buffer_size: int = 4096):
+        super().__init__(level)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.__buffer: List[str] = []
+        self.__file = open(path, "w", encoding="utf-8")
+
+    def emit(self, event: SimulationEvent):
+        self.__buffer.append(json.dumps(event.to_dict()))
+        if len(self.__buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.__buffer:
+            self.__file.write("\n".join(self.__buffer) + "\n")
+            self.__buffer.clear()
+        self.__file.flush()
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RingBufferSink(EventSink):
+    """Keeps the most recent capacity events in memory."""
+
+    def __init__(self, capacity: int = 10000, level: int = INFO):
+        super().__init__(level)
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, event: SimulationEvent):
+        self.events.append(event)
+
+    def of_kind(self, kind: str) -> List[SimulationEvent]:
+        return [event for event in self.events if event.kind == kind]
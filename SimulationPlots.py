@@ -0,0 +1,155 @@
+import os
+import numpy as np
+from typing import Optional
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from ResultRecorder import step_matrix
+
+
+class SimulationPlotter:
+    """
+    Non-interactive renderer for the per-step charts of a finished simulation.
+
+    Draws on a standalone Agg figure, so it never opens a window and works on servers without
+    a display. All sessions are drawn in one call, either as a stacked area chart or as a
+    sessions x steps heatmap. Runs with more time steps than horizontal pixels are
+    downsampled to one column per pixel by averaging consecutive steps.
+    """
+
+    MODES = ("stacked", "heatmap")
+
+    def __init__(self, output_dir: str = ".", file_format: str = "png", mode: str = "stacked",
+                 width_px: int = 1200, height_px: int = 600, dpi: int = 100, max_legend_entries: int = 20):
+        if mode not in self.MODES:
+            raise ValueError(f"Plot mode must be one of {self.MODES}.")
+        if file_format not in ("png", "svg"):
+            raise ValueError("File format must be 'png' or 'svg'.")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.mode = mode
+        self.width_px = width_px
+        self.height_px = height_px
+        self.dpi = dpi
+        self.max_legend_entries = max_legend_entries
+
+    @staticmethod
+    def series_matrix(simulation, column: str = "allocated_power", max_columns: Optional[int] = None):
+        """
+        Builds a sessions x steps matrix of one per-step series, with at most max_columns columns.
+
+        Without a recorder the rows are the sessions that were queued, rejected ones included, in
+        the order they were queued, as the recorder lists them.
+
+        :return: tuple of (session ids, matrix, steps per column)
+        """
+        recorder = simulation.recorder
+        if recorder is not None:
+            factor = SimulationPlotter.downsample_factor(recorder.step_count, max_columns)
+            return list(recorder.session_ids), recorder.matrix(column, factor), factor
+        requests = [request for request in
+                    simulation.completed_requests + simulation.departed_requests + simulation.rejected_requests
+                    if getattr(request, "queued_step", None) is not None]
+        requests.sort(key=lambda request: request.queued_step)
+        series = [simulation.session_series(request, column) for request in requests]
+        lengths = [len(values) for _, values in series]
+        sessions = np.repeat(np.arange(len(requests)), lengths)
+        steps = np.concatenate([np.asarray(time_steps, dtype=np.int64) for time_steps, _ in series] or [np.zeros(0, np.int64)])
+        values = np.concatenate([np.asarray(values, dtype=np.float64) for _, values in series] or [np.zeros(0)])
+        factor = SimulationPlotter.downsample_factor(int(steps.max()) + 1 if len(steps) else 0, max_columns)
+        return [request.session_id for request in requests], step_matrix(sessions, steps, values, len(requests), factor), factor
+
+    @staticmethod
+    def downsample_factor(steps: int, max_columns: Optional[int]) -> int:
+        """Number of consecutive steps to average so that at most max_columns columns remain."""
+        if max_columns is None or steps <= max_columns:
+            return 1
+        return -(-steps // max_columns)
+
+    def render(self, simulation, name: str = "simulation"):
+        """
+        Writes the power and flexibility charts of a simulation and returns the file paths.
+
+        When a retention policy dropped or spilled the per-step series and no recorder holds
+        them, the per-session summary charts are written instead.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        retention = getattr(simulation, "retention", None)
+        if simulation.recorder is None and retention is not None and retention.series != "keep":
+            return self.render_summary(simulation, name)
+        charts = (
+            ("allocated_power", "power_supplied", "Power Supplied (kW)", "Power Supplied to Each EV at Each Time Step"),
+            ("flexibility_contribution", "flexibility_contribution", "Flexibility Contribution (kW)",
+             "Flexibility Contributions (Energy Reduction) by Each EV at Each Time Step"),
+        )
+        paths = []
+        for column, suffix, ylabel, title in charts:
+            session_ids, matrix, factor = self.series_matrix(simulation, column, self.width_px)
+            path = os.path.join(self.output_dir, f"{name}_{suffix}.{self.file_format}")
+            self.render_matrix(session_ids, matrix, ylabel, title, path, factor)
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def summary_series(simulation):
+        """
+        Per-session values of the summary charts, drawn from the finished sessions or their summaries.
+
+        :return: tuple of (values, file suffix, axis label) per chart
+        """
+        finished = simulation.completed_requests + simulation.departed_requests
+        requested_energy = np.array([request.requested_energy for request in finished], dtype=np.float64)
+        charged_energy = np.array([request.charged_energy for request in finished], dtype=np.float64)
+        contribution = np.array([request.flexibility_contribution for request in finished], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delivered = np.where(requested_energy > 0, charged_energy / requested_energy, 1.0) * 100
+        return (
+            (delivered, "delivered_share", "Delivered Share of Requested Energy (%)"),
+            (contribution, "contribution_per_session", "Flexibility Contribution per Session (kWh)"),
+        )
+
+    def render_summary(self, simulation, name: str = "simulation"):
+        """
+        Writes histograms of the delivered share of the requested energy and of the flexibility
+        contribution per session, drawn from the finished sessions or their summaries.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        for values, suffix, xlabel in self.summary_series(simulation):
+            figure = Figure(figsize=(self.width_px / self.dpi, self.height_px / self.dpi), dpi=self.dpi)
+            FigureCanvasAgg(figure)
+            axes = figure.add_subplot()
+            if values.size:
+                axes.hist(values, bins=min(50, max(values.size, 1)))
+            axes.set_xlabel(xlabel)
+            axes.set_ylabel('EV Sessions')
+            axes.set_title(f'{xlabel} of {values.size} Sessions')
+            axes.grid(True)
+            path = os.path.join(self.output_dir, f"{name}_{suffix}.{self.file_format}")
+            figure.savefig(path, format=self.file_format)
+            paths.append(path)
+        return paths
+
+    def render_matrix(self, session_ids, matrix: np.ndarray, ylabel: str, title: str, path: str, factor: int = 1):
+        """Draws a sessions x columns matrix whose columns each average factor steps."""
+        figure = Figure(figsize=(self.width_px / self.dpi, self.height_px / self.dpi), dpi=self.dpi)
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        x = np.arange(matrix.shape[1]) * factor
+        xlabel = 'Time Step' if factor == 1 else f'Time Step (mean of {factor} steps)'
+
+        if self.mode == "heatmap":
+            image = axes.imshow(matrix, aspect="auto", interpolation="nearest", origin="lower",
+                                extent=(0, max(matrix.shape[1] * factor, 1), 0, max(matrix.shape[0], 1)))
+            figure.colorbar(image, ax=axes, label=ylabel)
+            axes.set_ylabel('EV Session')
+        else:
+            if matrix.size:
+                axes.stackplot(x, matrix, labels=session_ids, step="post")
+            axes.set_ylabel(ylabel)
+            if 0 < len(session_ids) <= self.max_legend_entries:
+                axes.legend(title="EV Session IDs")
+            axes.grid(True)
+
+        axes.set_xlabel(xlabel)
+        axes.set_title(title)
+        figure.savefig(path, format=self.file_format)
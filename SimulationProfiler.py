@@ -0,0 +1,130 @@
+import cProfile
+import json
+import pstats
+import time
+from array import array
+from typing import Dict, Optional
+
+# Phases of one step of FlexibilitySimulation.run_simulation, in loop order
+PHASES = ("handle_new_requests", "handle_departures", "flexibility", "allocate_flexibility_and_load_management",
+          "update_for_next_timestep", "fast_forward")
+
+
+class PhaseStats:
+    """Accumulated wall time and call count of one phase."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.max_seconds = 0.0
+
+    @property
+    def mean_seconds(self):
+        return self.seconds / self.calls if self.calls else 0.0
+
+    def to_dict(self):
+        return {"seconds": self.seconds, "calls": self.calls, "mean_seconds": self.mean_seconds,
+                "max_seconds": self.max_seconds}
+
+
+class SimulationProfiler:
+    """
+    Per-phase timing counters for FlexibilitySimulation.
+
+    Pass an instance as FlexibilitySimulation(profiler=...) to instrument a run. Each phase of
+    each step is timed with perf_counter and counted; with record_steps the individual
+    measurements are kept as (step, phase, start, duration, active sessions) in compact arrays,
+    which export_trace writes as a Chrome trace (chrome://tracing, Perfetto). With use_cprofile
+    the whole run is also profiled with cProfile, see export_cprofile.
+    A simulation without a profiler only pays one `is None` check per phase.
+    """
+
+    def __init__(self, record_steps: bool = True, use_cprofile: bool = False):
+        self.record_steps = record_steps
+        self.phases: Dict[str, PhaseStats] = {name: PhaseStats(name) for name in PHASES}
+        self.run_seconds = 0.0
+        self.steps = 0
+        self.__origin = time.perf_counter()
+        self.__run_started = None
+        self.__run_first_step = 0
+        self.__phase_index = {name: index for index, name in enumerate(PHASES)}
+        self.__step = array("l")
+        self.__phase = array("b")
+        self.__start = array("d")
+        self.__duration = array("d")
+        self.__active = array("l")
+        self.__cprofile = cProfile.Profile() if use_cprofile else None
+
+    def begin_run(self, step: int = 0):
+        self.__run_started = time.perf_counter()
+        self.__run_first_step = step
+        if self.__cprofile is not None:
+            self.__cprofile.enable()
+
+    def end_run(self, step: int):
+        if self.__cprofile is not None:
+            self.__cprofile.disable()
+        if self.__run_started is not None:
+            self.run_seconds += time.perf_counter() - self.__run_started
+            self.__run_started = None
+        self.steps += step - self.__run_first_step
+
+    def start(self) -> float:
+        return time.perf_counter()
+
+    def stop(self, phase: str, started: float, step: int, active_sessions: int):
+        """Records one execution of a phase that began at `started` (a value returned by start())."""
+        duration = time.perf_counter() - started
+        stats = self.phases[phase]
+        stats.seconds += duration
+        stats.calls += 1
+        if duration > stats.max_seconds:
+            stats.max_seconds = duration
+        if self.record_steps:
+            self.__step.append(step)
+            self.__phase.append(self.__phase_index[phase])
+            self.__start.append(started - self.__origin)
+            self.__duration.append(duration)
+            self.__active.append(active_sessions)
+
+    def stats(self):
+        """Summary of the instrumented runs as a plain dict."""
+        return {
+            "run_seconds": self.run_seconds,
+            "steps": self.steps,
+            "steps_per_second": self.steps / self.run_seconds if self.run_seconds > 0 else None,
+            "phases": {name: stats.to_dict() for name, stats in self.phases.items()},
+        }
+
+    def step_records(self):
+        """Per-step measurements as parallel lists: step, phase, start and duration in seconds, active sessions."""
+        return {
+            "step": self.__step.tolist(),
+            "phase": [PHASES[index] for index in self.__phase],
+            "start": self.__start.tolist(),
+            "duration": self.__duration.tolist(),
+            "active_sessions": self.__active.tolist(),
+        }
+
+    def export_trace(self, path: str):
+        """Writes the per-step measurements in Chrome trace event format."""
+        events = [
+            {"name": PHASES[phase], "ph": "X", "pid": 0, "tid": 0, "ts": start * 1e6, "dur": duration * 1e6,
+             "args": {"step": step, "active_sessions": active}}
+            for step, phase, start, duration, active in
+            zip(self.__step, self.__phase, self.__start, self.__duration, self.__active)
+        ]
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+    def export_cprofile(self, path: str):
+        """Writes the cProfile statistics of the instrumented runs, readable with pstats or snakeviz."""
+        if self.__cprofile is None:
+            raise ValueError("Profiler was created without use_cprofile=True.")
+        self.__cprofile.dump_stats(path)
+
+    def print_cprofile(self, sort: str = "cumulative", limit: Optional[int] = 20):
+        if self.__cprofile is None:
+            raise ValueError("Profiler was created without use_cprofile=True.")
+        pstats.Stats(self.__cprofile).sort_stats(sort).print_stats(limit)
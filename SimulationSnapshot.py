@@ -0,0 +1,168 @@
+import io
+import os
+import pickle
+import random
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence
+from FlexSimulation import FlexibilitySimulation
+from SimulationEvents import EventSink, NullSink
+from SimulationProfiler import SimulationProfiler
+
+MAGIC = b"FLEXSNAP"
+VERSION = 1
+
+
+class _SnapshotPickler(pickle.Pickler):
+    # Event sinks and profilers hold files and timers of the running process; they are left out
+    # and supplied again on restore. The random module stands in for the global RNG.
+    def persistent_id(self, obj):
+        if obj is random:
+            return "random"
+        if isinstance(obj, EventSink):
+            return "events"
+        if isinstance(obj, SimulationProfiler):
+            return "profiler"
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, events: EventSink, profiler: Optional[SimulationProfiler]):
+        super().__init__(file)
+        self.events = events
+        self.profiler = profiler
+
+    def persistent_load(self, pid):
+        if pid == "random":
+            return random
+        if pid == "events":
+            return self.events
+        if pid == "profiler":
+            return self.profiler
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid!r}.")
+
+
+def snapshot(simulation: FlexibilitySimulation, level: int = 6) -> bytes:
+    """
+    Serializes the full state of a simulation paused between steps (see run_until): clock,
+    queues, requests with their charged energy and series, aggregates, supply profile,
+    RNG state and recorder, as zlib compressed pickle.
+
+    Event sinks and the profiler are not part of the snapshot. Runs that stream their requests
+    from a generator, or use a recorder writer or supply profile with open files, cannot be
+    snapshotted.
+    """
+    buffer = io.BytesIO()
+    state = {
+        "simulation": simulation,
+        # the global RNG is not pickled with the simulation, its state is carried separately
+        "random_state": random.getstate() if simulation.rng is random else None,
+    }
+    try:
+        _SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+    except (TypeError, pickle.PicklingError, AttributeError) as error:
+        raise ValueError(f"Simulation state cannot be snapshotted: {error}") from error
+    return MAGIC + VERSION.to_bytes(2, "little") + zlib.compress(buffer.getvalue(), level)
+
+
+def restore(data: bytes, events: Optional[EventSink] = None,
+            profiler: Optional[SimulationProfiler] = None) -> FlexibilitySimulation:
+    """
+    Rebuilds a simulation from a snapshot; continue it with run_until() and finish_run().
+
+    A simulation that used the global random module sets its state again.
+
+    Snapshots are pickle data and unpickling can run arbitrary code: only restore snapshots
+    from trusted sources, never ones received from users or over the network. The header is
+    checked for format and version only, it does not authenticate the data.
+
+    :param events: event sink of the restored simulation, NullSink() by default
+    :param profiler: profiler of the restored simulation, none by default
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a simulation snapshot.")
+    version = int.from_bytes(data[len(MAGIC):len(MAGIC) + 2], "little")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}.")
+    payload = zlib.decompress(data[len(MAGIC) + 2:])
+    state = _SnapshotUnpickler(io.BytesIO(payload), events if events is not None else NullSink(), profiler).load()
+    if state["random_state"] is not None:
+        random.setstate(state["random_state"])
+    return state["simulation"]
+
+
+def save_snapshot(simulation: FlexibilitySimulation, path: str, level: int = 6):
+    data = snapshot(simulation, level)
+    with open(path, "wb") as handle:
+        handle.write(data)
+    return len(data)
+
+
+def load_snapshot(path: str, events: Optional[EventSink] = None,
+                  profiler: Optional[SimulationProfiler] = None) -> FlexibilitySimulation:
+    """Restores a snapshot file; like restore(), only load files from trusted sources."""
+    with open(path, "rb") as handle:
+        return restore(handle.read(), events, profiler)
+
+
+def summarize(simulation: FlexibilitySimulation) -> dict:
+    """Default reduction of a finished fork: outcome counts and energy totals."""
+    finished = simulation.completed_requests + simulation.departed_requests
+    return {
+        "steps": simulation.current_step,
+        "completed": len(simulation.completed_requests),
+        "departed": len(simulation.departed_requests),
+        "rejected": len(simulation.rejected_requests),
+        "charged_energy": sum(request.charged_energy for request in finished),
+        "flexibility_contribution": sum(request.flexibility_contribution for request in finished),
+    }
+
+
+def run_fork(data: bytes, variant: Optional[Callable[[FlexibilitySimulation], None]] = None,
+             until: Optional[datetime] = None, reduce: Callable[[FlexibilitySimulation], object] = summarize):
+    """Restores a snapshot, applies a variant to it, runs it to `until` or the end and reduces it."""
+    simulation = restore(data)
+    if variant is not None:
+        variant(simulation)
+    simulation.run_until(until)
+    simulation.finish_run(plot=False)
+    return reduce(simulation)
+
+
+# Each worker receives the snapshot once through the pool initializer, tasks only carry variants
+_worker_snapshot: Optional[bytes] = None
+
+
+def _init_worker(data: bytes):
+    global _worker_snapshot
+    _worker_snapshot = data
+
+
+def _run_variant(arguments):
+    variant, until, reduce = arguments
+    return run_fork(_worker_snapshot, variant, until, reduce)
+
+
+def fork(data: bytes, variants: Sequence[Optional[Callable[[FlexibilitySimulation], None]]],
+         until: Optional[datetime] = None, processes: Optional[int] = None,
+         reduce: Callable[[FlexibilitySimulation], object] = summarize) -> List[object]:
+    """
+    Runs what-if variants from one checkpoint, in parallel.
+
+    :param data: snapshot taken after the shared warm-up, from a trusted source (see restore)
+    :param variants: one callable per variant that modifies the restored simulation, e.g. swaps
+                     its supply profile or allocation strategy; None runs the snapshot unchanged.
+                     They must be picklable, e.g. module level functions or functools.partial
+    :param until: stop each variant at this time instead of at the end of the run
+    :param processes: pool size, defaults to the number of CPUs; 1 runs in the calling process
+    :param reduce: turns each finished simulation into the returned result
+    :return: one result per variant, in order
+    """
+    variants = list(variants)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(variants) <= 1:
+        return [run_fork(data, variant, until, reduce) for variant in variants]
+    with ProcessPoolExecutor(max_workers=min(processes, len(variants)), initializer=_init_worker,
+                             initargs=(data,)) as pool:
+        return list(pool.map(_run_variant, [(variant, until, reduce) for variant in variants]))
@@ -0,0 +1,152 @@
+import csv
+import math
+import random
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class SupplyProfile(ABC):
+    """Source of the available power supply (kW) for each minute of a simulation run."""
+
+    @abstractmethod
+    def capacity_at(self, minute: float) -> float:
+        """
+        Returns the available capacity at the given time.
+
+        :param minute: minutes since the simulation start
+        :return: float - capacity in kW
+        """
+
+
+class RandomSupplyProfile(SupplyProfile):
+    """Uniformly random whole-kW supply, the simulation's original behaviour."""
+
+    def __init__(self, rng=random, low: float = 30, high: float = 40):
+        self.rng = rng
+        self.low = low
+        self.high = high
+
+    def capacity_at(self, minute: float) -> float:
+        return math.floor(self.rng.uniform(self.low, self.high))
+
+
+class ConstantSupplyProfile(SupplyProfile):
+    """The same capacity at every step."""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+
+    def capacity_at(self, minute: float) -> float:
+        return self.capacity
+
+
+class ArraySupplyProfile(SupplyProfile):
+    """
+    Capacity time series backed by an array, typically a read-only memory map.
+
+    Sample i holds the capacity at start_minute + i * resolution_minutes. Lookups between samples
+    are linearly interpolated (or hold the previous sample when interpolate is False), and lookups
+    outside the series hold the first or last sample. Only the pages that are read get loaded,
+    so year-long profiles of many sites can share one file.
+    """
+
+    def __init__(self, values, resolution_minutes: float, start_minute: float = 0, interpolate: bool = True):
+        if len(values) == 0:
+            raise ValueError("Supply profile must contain at least one sample.")
+        if resolution_minutes <= 0:
+            raise ValueError("Profile resolution must be greater than 0.")
+        self.values = values
+        self.resolution_minutes = resolution_minutes
+        self.start_minute = start_minute
+        self.interpolate = interpolate
+
+    @classmethod
+    def from_npy(cls, path: str, resolution_minutes: float, site: Optional[int] = None, **kwargs):
+        """
+        Memory-maps a .npy file. A 2-D array is read as one row per site.
+        """
+        values = np.load(path, mmap_mode="r")
+        if values.ndim == 2:
+            values = values[site if site is not None else 0]
+        return cls(values, resolution_minutes, **kwargs)
+
+    @classmethod
+    def from_binary(cls, path: str, resolution_minutes: float, dtype="float32", sites: int = 1,
+                    site: int = 0, **kwargs):
+        """
+        Memory-maps a raw binary file of native-endian dtype samples, laid out as sites x samples.
+        """
+        values = np.memmap(path, dtype=dtype, mode="r")
+        if sites > 1:
+            values = values.reshape(sites, -1)[site]
+        return cls(values, resolution_minutes, **kwargs)
+
+    def capacity_at(self, minute: float) -> float:
+        position = (minute - self.start_minute) / self.resolution_minutes
+        last = len(self.values) - 1
+        if position <= 0:
+            return float(self.values[0])
+        if position >= last:
+            return float(self.values[last])
+        index = int(position)
+        fraction = position - index
+        if not self.interpolate or fraction == 0:
+            return float(self.values[index])
+        lower = float(self.values[index])
+        return lower + (float(self.values[index + 1]) - lower) * fraction
+
+
+class CsvSupplyProfile(SupplyProfile):
+    """
+    Streams a capacity series from a CSV file without loading it.
+
+    The file is read forward while the simulation advances and only the two samples around the
+    current time are kept. Sample times come from minute_column if given, otherwise row i is at
+    start_minute + i * resolution_minutes. Lookups must not go back in time.
+    """
+
+    def __init__(self, path: str, column: str = "capacity_kw", resolution_minutes: float = 15,
+                 minute_column: Optional[str] = None, start_minute: float = 0, interpolate: bool = True):
+        self.path = path
+        self.column = column
+        self.resolution_minutes = resolution_minutes
+        self.minute_column = minute_column
+        self.start_minute = start_minute
+        self.interpolate = interpolate
+        self.__file = open(path, newline="", encoding="utf-8")
+        self.__rows = csv.DictReader(self.__file)
+        self.__index = 0
+        self.__previous = self.__read_sample()
+        if self.__previous is None:
+            raise ValueError(f"Supply profile {path} contains no samples.")
+        self.__next = self.__read_sample()
+        self.__last_minute = -math.inf
+
+    def __read_sample(self):
+        row = next(self.__rows, None)
+        if row is None:
+            self.__file.close()
+            return None
+        if self.minute_column is not None:
+            minute = float(row[self.minute_column])
+        else:
+            minute = self.start_minute + self.__index * self.resolution_minutes
+        self.__index += 1
+        return minute, float(row[self.column])
+
+    def capacity_at(self, minute: float) -> float:
+        if minute < self.__last_minute:
+            raise ValueError("CsvSupplyProfile can only be read forward in time.")
+        self.__last_minute = minute
+        while self.__next is not None and self.__next[0] <= minute:
+            self.__previous = self.__next
+            self.__next = self.__read_sample()
+        previous_minute, previous_value = self.__previous
+        if self.__next is None or minute <= previous_minute or not self.interpolate:
+            return previous_value
+        next_minute, next_value = self.__next
+        return previous_value + (next_value - previous_value) * (minute - previous_minute) / (next_minute - previous_minute)
+
+    def close(self):
+        self.__file.close()
@@ -0,0 +1,96 @@
+import numpy as np
+from datetime import datetime
+from typing import Callable, Sequence
+from FlexibilityRequestBatch import FlexibilityRequestBatch
+
+# A distribution draws `size` samples from a NumPy Generator
+Distribution = Callable[[np.random.Generator, int], np.ndarray]
+
+
+def constant(value: float) -> Distribution:
+    return lambda rng, size: np.full(size, value, dtype=np.float64)
+
+
+def uniform(low: float, high: float) -> Distribution:
+    return lambda rng, size: rng.uniform(low, high, size)
+
+
+def normal(mean: float, std: float, low: float = -np.inf, high: float = np.inf) -> Distribution:
+    """Normal distribution clipped to [low, high]."""
+    return lambda rng, size: np.clip(rng.normal(mean, std, size), low, high)
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Log-normal distribution given by its median and the sigma of the underlying normal."""
+    return lambda rng, size: rng.lognormal(np.log(median), sigma, size)
+
+
+def exponential(mean: float) -> Distribution:
+    return lambda rng, size: rng.exponential(mean, size)
+
+
+def choice(values: Sequence[float], weights: Sequence[float] = None) -> Distribution:
+    """Weighted choice among discrete values, e.g. battery sizes or charging point powers."""
+    values = np.asarray(values, dtype=np.float64)
+    p = None if weights is None else np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    return lambda rng, size: rng.choice(values, size, p=p)
+
+
+class SyntheticFleetGenerator:
+    """
+    Seeded generator of synthetic charging sessions.
+
+    Arrivals follow the inter-arrival distribution (a Poisson process by default), each car stays
+    for a dwell time, and requests an energy that is capped by the free capacity of its battery.
+    Battery sizes, initial SoC and charging point powers are drawn per session. Times are rounded
+    to whole minutes; dwell times shorter than min_dwell_minutes are raised to it.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        inter_arrival_minutes: Distribution = exponential(10),
+        dwell_minutes: Distribution = lognormal(240, 0.5),
+        requested_energy: Distribution = lognormal(20, 0.5),
+        battery_capacity_in_kwh: Distribution = choice([40, 60, 75, 100], [0.2, 0.35, 0.3, 0.15]),
+        initial_soc: Distribution = uniform(10, 60),
+        nominal_power: Distribution = choice([11, 22], [0.8, 0.2]),
+        min_dwell_minutes: int = 15,
+    ):
+        self.seed = seed
+        self.inter_arrival_minutes = inter_arrival_minutes
+        self.dwell_minutes = dwell_minutes
+        self.requested_energy = requested_energy
+        self.battery_capacity_in_kwh = battery_capacity_in_kwh
+        self.initial_soc = initial_soc
+        self.nominal_power = nominal_power
+        self.min_dwell_minutes = min_dwell_minutes
+
+    def columns(self, n: int):
+        """Draws n sessions and returns them as a dict of NumPy columns, sorted by arrival."""
+        rng = np.random.default_rng(self.seed)
+        arrivals = np.floor(np.cumsum(self.inter_arrival_minutes(rng, n))).astype(np.int64)
+        dwell = np.maximum(np.rint(self.dwell_minutes(rng, n)), self.min_dwell_minutes).astype(np.int64)
+        battery = self.battery_capacity_in_kwh(rng, n)
+        soc = np.clip(self.initial_soc(rng, n), 0, 100)
+        free_capacity = battery * (100 - soc) / 100
+        energy = np.clip(self.requested_energy(rng, n), 0.5, np.maximum(free_capacity, 0.5))
+        return {
+            "arrival_minutes": arrivals,
+            "leave_minutes": arrivals + dwell,
+            "requested_energy": energy,
+            "battery_capacity_in_kwh": battery,
+            "initial_soc": soc,
+            "nominal_power": self.nominal_power(rng, n),
+        }
+
+    def generate(self, n: int, epoch: datetime, session_prefix: str = "synthetic"):
+        """Draws n sessions as a FlexibilityRequestBatch relative to epoch."""
+        columns = self.columns(n)
+        return FlexibilityRequestBatch(epoch, session_prefix=session_prefix, **columns)
+
+    def expected_concurrency(self, n: int = 10000):
+        """Average number of cars plugged in at once, estimated from a sample."""
+        columns = self.columns(n)
+        horizon = columns["leave_minutes"].max() - columns["arrival_minutes"].min()
+        return float((columns["leave_minutes"] - columns["arrival_minutes"]).sum() / max(horizon, 1))
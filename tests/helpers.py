@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from CarSpecs import CarSpecs
+from ChargingPoint import ChargingPoint
+from FlexibilityRequest import AvailableFlexibilityRequest
+from SimulationEvents import NullSink
+from SyntheticFleet import SyntheticFleetGenerator, exponential
+
+START = datetime(2024, 1, 1)
+
+
+def fleet(sessions=150, inter_arrival_minutes=10.0, seed=3):
+    """Seeded synthetic sessions starting at START."""
+    generator = SyntheticFleetGenerator(seed=seed, inter_arrival_minutes=exponential(inter_arrival_minutes))
+    return generator.generate(sessions, START)
+
+
+def request(session_id, requested_energy, arrival_minute, leave_minute, nominal_power=11.0, evse_id=1):
+    """A request with times in whole minutes after START."""
+    car = CarSpecs(make="Test", model="EV", year=2024, battery_capacity_in_kwh=100, initial_soc=20)
+    return AvailableFlexibilityRequest(session_id, ChargingPoint(evse_id, nominal_power), requested_energy, leave_minute,
+                                       arrival_minute, car, 0, 0, epoch=START)
+
+
+def run(simulation_class, supply_profile, adaptive_stepping=False, sessions=150, inter_arrival_minutes=10.0, **kwargs):
+    """Runs a silent simulation of a synthetic fleet on a 60 kW site with 15 minute steps."""
+    simulation = simulation_class(60.0, 15, events=NullSink(), start_time=START, supply_profile=supply_profile,
+                                  adaptive_stepping=adaptive_stepping, **kwargs)
+    simulation.run_simulation(fleet(sessions, inter_arrival_minutes), plot=False)
+    return simulation
+
+
+def outcomes(simulation):
+    """Outcome, charged energy and flexibility contribution of every session that left the site."""
+    result = {}
+    for outcome, requests in (("completed", simulation.completed_requests), ("departed", simulation.departed_requests),
+                              ("rejected", simulation.rejected_requests)):
+        for request in requests:
+            result[request.session_id] = (outcome, request.charged_energy, request.flexibility_contribution)
+    return result
+
+
+def assert_same_outcomes(expected, actual):
+    assert expected.keys() == actual.keys()
+    for session_id, (outcome, charged_energy, contribution) in expected.items():
+        assert actual[session_id][0] == outcome, session_id
+        assert actual[session_id][1] == pytest.approx(charged_energy, rel=1e-9, abs=1e-9), session_id
+        assert actual[session_id][2] == pytest.approx(contribution, rel=1e-9, abs=1e-9), session_id
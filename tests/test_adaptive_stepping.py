@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from ResultRecorder import ResultRecorder
+from SupplyProfile import ConstantSupplyProfile
+from helpers import assert_same_outcomes, outcomes, run
+
+ENGINES = [FlexibilitySimulation, VectorizedFlexibilitySimulation]
+
+
+@pytest.mark.parametrize("simulation_class", ENGINES)
+@pytest.mark.parametrize("capacity", [30.0, 200.0])
+@pytest.mark.parametrize("inter_arrival_minutes", [10.0, 90.0])  # A sparse fleet leaves long steady runs
+def test_fast_forward_matches_step_by_step(simulation_class, capacity, inter_arrival_minutes):
+    expected = run(simulation_class, ConstantSupplyProfile(capacity), inter_arrival_minutes=inter_arrival_minutes)
+    actual = run(simulation_class, ConstantSupplyProfile(capacity), adaptive_stepping=True,
+                 inter_arrival_minutes=inter_arrival_minutes)
+    assert_same_outcomes(outcomes(expected), outcomes(actual))
+    assert actual.current_step == expected.current_step
+
+
+@pytest.mark.parametrize("simulation_class", ENGINES)
+def test_fast_forward_skips_steady_steps(simulation_class):
+    class CountingSimulation(simulation_class):
+        skipped = 0
+
+        def apply_steady_steps(self, max_steps=None):
+            steps = super().apply_steady_steps(max_steps)
+            CountingSimulation.skipped += steps
+            return steps
+
+    simulation = run(CountingSimulation, ConstantSupplyProfile(200.0), adaptive_stepping=True, sessions=60,
+                     inter_arrival_minutes=90.0)
+    assert CountingSimulation.skipped > simulation.current_step // 2
+
+
+@pytest.mark.parametrize("simulation_class", ENGINES)
+def test_fast_forward_records_the_same_tables(simulation_class):
+    tables = []
+    for adaptive_stepping in (False, True):
+        recorder = ResultRecorder()
+        run(simulation_class, ConstantSupplyProfile(45.0), adaptive_stepping, inter_arrival_minutes=30.0, recorder=recorder)
+        tables.append((recorder.session_ids, recorder.allocation_table(), recorder.supply_table()))
+    (expected_ids, expected_allocations, expected_supply), (ids, allocations, supply) = tables
+    assert ids == expected_ids
+    for name, column in expected_allocations.items():
+        np.testing.assert_allclose(allocations[name], column, atol=1e-9)
+    for name, column in expected_supply.items():
+        np.testing.assert_allclose(supply[name], column)
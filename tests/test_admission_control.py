@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from AdmissionControl import AdmissionController, DeadlineHeadroomIndex
+from AllocationStrategies import EarliestDeadlineFirstStrategy
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from SimulationEvents import NullSink
+from SupplyProfile import ConstantSupplyProfile
+from helpers import START, assert_same_outcomes, outcomes, request, run
+
+
+def test_deadline_headroom_index_matches_brute_force():
+    rng = random.Random(5)
+    for size in (1, 2, 7, 64, 100):
+        headroom = [rng.uniform(-50.0, 50.0) for _ in range(size)]
+        index = DeadlineHeadroomIndex(headroom)
+        for _ in range(300):
+            slot = rng.randint(1, size + 2)
+            if rng.random() < 0.5:
+                value = rng.uniform(-20.0, 20.0)
+                index.add(slot, value)
+                for k in range(slot - 1, size):
+                    headroom[k] += value
+            elif slot > size:
+                assert index.min_from(slot) == float("inf")
+            else:
+                assert index.min_from(slot) == pytest.approx(min(headroom[slot - 1:]), abs=1e-9)
+        assert index.values() == pytest.approx(headroom, abs=1e-9)
+
+
+def test_rejects_arrivals_that_cannot_be_served_in_time():
+    simulation = FlexibilitySimulation(22.0, 15, events=NullSink(), start_time=START, admission=AdmissionController(),
+                                       supply_profile=ConstantSupplyProfile(22.0))
+    simulation.run_simulation([
+        request("first", 10.0, 0, 60),
+        request("second", 10.0, 0, 60),
+        request("too_slow", 12.0, 0, 60),  # 11 kW for one hour delivers 11 kWh
+        request("over_capacity", 5.0, 0, 60),  # fits its charger, but the site delivers only 22 kWh in the hour
+        request("later", 10.0, 60, 120),
+    ], plot=False)
+    assert [request.session_id for request in simulation.rejected_requests] == ["too_slow", "over_capacity"]
+    assert sorted(request.session_id for request in simulation.completed_requests) == ["first", "later", "second"]
+    assert simulation.admission.admitted == 3 and simulation.admission.rejected == 2
+
+
+def test_uses_deadline_first_allocation_by_default():
+    simulation = FlexibilitySimulation(60.0, 15, events=NullSink(), admission=AdmissionController())
+    assert isinstance(simulation.allocation_strategy, EarliestDeadlineFirstStrategy)
+
+
+@pytest.mark.parametrize("simulation_class", [FlexibilitySimulation, VectorizedFlexibilitySimulation])
+def test_releases_every_booking(simulation_class):
+    admission = AdmissionController()
+    simulation = run(simulation_class, ConstantSupplyProfile(60.0), sessions=200, admission=admission)
+    assert len(admission) == 0
+    assert admission.admitted == len(simulation.completed_requests) + len(simulation.departed_requests)
+
+
+def test_engines_agree_with_admission_control():
+    expected = run(FlexibilitySimulation, ConstantSupplyProfile(60.0), sessions=200, admission=AdmissionController())
+    actual = run(VectorizedFlexibilitySimulation, ConstantSupplyProfile(60.0), sessions=200,
+                 admission=AdmissionController())
+    assert_same_outcomes(outcomes(expected), outcomes(actual))
+
+
+def test_reserve_reduces_admitted_sessions_that_miss_their_energy():
+    missed = []
+    for capacity_factor in (1.0, 0.8):
+        simulation = run(FlexibilitySimulation, ConstantSupplyProfile(60.0), sessions=200,
+                         admission=AdmissionController(capacity_factor=capacity_factor))
+        missed.append(len(simulation.departed_requests))
+    assert missed[1] < missed[0]
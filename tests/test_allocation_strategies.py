@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from AllocationStrategies import (AllocationFactorStrategy, AllocationStrategy, EarliestDeadlineFirstStrategy,
+                                  ProportionalFairStrategy, WaterFillingStrategy)
+from FlexSimulation import FlexibilitySimulation
+from ResultRecorder import ResultRecorder
+from SupplyProfile import ConstantSupplyProfile
+from helpers import run
+
+
+STRATEGIES = [AllocationFactorStrategy(), WaterFillingStrategy(), ProportionalFairStrategy(),
+              EarliestDeadlineFirstStrategy()]
+FLOOR_RESPECTING = STRATEGIES[1:]
+
+
+def fleet(rng, sessions, step_hours=0.25):
+    nominal_power = rng.choice([3.7, 7.4, 11.0, 22.0], size=sessions)
+    remaining_energy = rng.uniform(0.5, 40.0, size=sessions)
+    remaining_hours = rng.uniform(0.05, 8.0, size=sessions)
+    remaining_hours[rng.random(sessions) < 0.1] = 0.0  # Sessions that are about to leave
+    power_flexibility = np.maximum(nominal_power - remaining_energy / np.maximum(remaining_hours, step_hours), 0.0)
+    return nominal_power, remaining_energy, remaining_hours, power_flexibility
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES, ids=lambda strategy: type(strategy).__name__)
+def test_allocation_respects_supply_and_nominal_power(strategy):
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        nominal_power, remaining_energy, remaining_hours, power_flexibility = fleet(rng, int(rng.integers(1, 40)))
+        power_supply = float(rng.uniform(0.0, nominal_power.sum()))
+        allocated_power = strategy.allocate(power_supply, nominal_power, remaining_energy, remaining_hours,
+                                            power_flexibility, 0.25)
+        assert allocated_power.shape == nominal_power.shape
+        assert allocated_power.sum() <= power_supply + 1e-9
+        assert np.all(allocated_power >= -1e-9)
+        assert np.all(allocated_power <= nominal_power + 1e-9)
+        assert np.all(allocated_power[remaining_hours <= 0] == 0)
+
+
+@pytest.mark.parametrize("strategy", FLOOR_RESPECTING, ids=lambda strategy: type(strategy).__name__)
+def test_allocation_serves_floors_and_caps(strategy):
+    rng = np.random.default_rng(11)
+    step_hours = 0.25
+    for _ in range(200):
+        nominal_power, remaining_energy, remaining_hours, power_flexibility = fleet(rng, int(rng.integers(1, 40)))
+        charging = remaining_hours > 0
+        cap = np.where(charging, np.minimum(nominal_power, remaining_energy / step_hours), 0.0)
+        floor = np.where(charging, np.minimum(np.maximum(
+            remaining_energy - nominal_power * np.maximum(remaining_hours - step_hours, 0), 0) / step_hours, cap), 0.0)
+
+        # A supply between the floors and the caps serves every floor and uses all of it
+        power_supply = float(rng.uniform(floor.sum(), cap.sum()))
+        allocated_power = strategy.allocate(power_supply, nominal_power, remaining_energy, remaining_hours,
+                                            power_flexibility, step_hours)
+        assert np.all(allocated_power >= floor - 1e-9)
+        assert np.all(allocated_power <= cap + 1e-9)
+        assert allocated_power.sum() == pytest.approx(power_supply, abs=1e-6)
+
+        # A supply that covers every cap serves every cap
+        allocated_power = strategy.allocate(cap.sum() + 1.0, nominal_power, remaining_energy, remaining_hours,
+                                            power_flexibility, step_hours)
+        np.testing.assert_allclose(allocated_power, cap, atol=1e-9)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES, ids=lambda strategy: type(strategy).__name__)
+def test_simulation_allocations_stay_within_the_supply(strategy):
+    recorder = ResultRecorder()
+    simulation = run(FlexibilitySimulation, ConstantSupplyProfile(30.0), recorder=recorder, allocation_strategy=strategy)
+    table = recorder.allocation_table()
+    per_step = np.bincount(table["step"], weights=table["allocated_power"])
+    assert per_step.max() <= 30.0 + 1e-9
+    assert simulation.completed_requests
+
+
+def test_a_strategy_without_allocate_cannot_be_created():
+    class Incomplete(AllocationStrategy):
+        pass
+
+    with pytest.raises(TypeError, match="allocate"):
+        Incomplete()
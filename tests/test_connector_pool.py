@@ -0,0 +1,70 @@
+import pytest
+
+from ConnectorPool import ConnectorPool
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from RequestQueues import WaitingQueue
+from SimulationEvents import NullSink
+from SupplyProfile import ConstantSupplyProfile
+from helpers import START, assert_same_outcomes, fleet, outcomes, request
+
+
+def test_connectors_are_reused_lowest_index_first():
+    pool = ConnectorPool.uniform(2, nominal_power=22)
+    first, second, third = request("a", 10, 0, 60), request("b", 10, 0, 60), request("c", 10, 0, 60)
+    assert pool.assign(first, 0).evse_id == 1 and pool.assign(second, 0).evse_id == 2
+    assert first.evse_id.nominal_power_cp == 22 and pool.free == 0
+    with pytest.raises(IndexError):
+        pool.assign(third, 0)
+    with pytest.raises(ValueError, match="already holds"):
+        pool.assign(first, 0)
+    assert pool.release("a", 30).evse_id == 1
+    assert pool.release("a", 30) is None
+    assert pool.assign(third, 30, waited_minutes=30) is pool.connector_of("c") and pool.connector_of("c").evse_id == 1
+
+
+def test_statistics_integrate_occupancy_and_waits():
+    pool = ConnectorPool.uniform(2)
+    pool.assign(request("a", 10, 0, 60), 0)
+    pool.assign(request("b", 10, 0, 60), 30, waited_minutes=10)
+    pool.release("a", 60)
+    pool.record_abandoned(20)
+    statistics = pool.statistics(120)
+    # a is busy 0-60 and b 30-120: 150 connector minutes out of 240
+    assert statistics["mean_occupancy"] == pytest.approx(150 / 240)
+    assert (statistics["peak_busy"], statistics["served"], statistics["waited"], statistics["abandoned"]) == (2, 2, 1, 1)
+    assert statistics["mean_wait_minutes"] == pytest.approx(15.0) and statistics["max_wait_minutes"] == 20
+
+
+def test_an_empty_pool_is_refused():
+    with pytest.raises(ValueError):
+        ConnectorPool([])
+
+
+def simulate(simulation_class, connectors=3, **kwargs):
+    simulation = simulation_class(60.0, 15, events=NullSink(), start_time=START, supply_profile=ConstantSupplyProfile(60.0),
+                                  connectors=ConnectorPool.uniform(connectors), **kwargs)
+    simulation.run_simulation(fleet(60, inter_arrival_minutes=8.0), plot=False)
+    return simulation
+
+
+def test_cars_wait_for_a_free_connector_and_engines_agree():
+    expected = simulate(FlexibilitySimulation)
+    statistics = expected.connector_statistics()
+    assert statistics["peak_busy"] <= 3 and statistics["waiting"] == 0
+    assert statistics["waited"] > 0 and statistics["served"] + statistics["abandoned"] == 60
+    assert len(expected.rejected_requests) >= statistics["abandoned"]
+    assert_same_outcomes(outcomes(expected), outcomes(simulate(VectorizedFlexibilitySimulation)))
+
+
+def test_waiting_queue_priority_decides_who_plugs_in_next():
+    first_come = simulate(FlexibilitySimulation, connectors=1,
+                          waiting_queue=WaitingQueue(priority=lambda waiting: waiting.arrival_time))
+    deadline = simulate(FlexibilitySimulation, connectors=1)
+    assert outcomes(first_come) != outcomes(deadline)
+
+
+def test_statistics_need_a_pool():
+    simulation = FlexibilitySimulation(60.0, 15, events=NullSink(), start_time=START)
+    with pytest.raises(ValueError, match="no connector pool"):
+        simulation.connector_statistics()
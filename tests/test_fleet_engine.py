@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from SupplyProfile import RandomSupplyProfile
+from helpers import assert_same_outcomes, outcomes, run
+
+
+@pytest.mark.parametrize("adaptive_stepping", [False, True])
+def test_vectorized_engine_matches_object_engine(adaptive_stepping):
+    expected = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(1)), adaptive_stepping)
+    actual = run(VectorizedFlexibilitySimulation, RandomSupplyProfile(random.Random(1)), adaptive_stepping)
+    assert_same_outcomes(outcomes(expected), outcomes(actual))
+
+
+def test_vectorized_engine_matches_object_engine_per_step():
+    expected = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(2)))
+    actual = run(VectorizedFlexibilitySimulation, RandomSupplyProfile(random.Random(2)))
+    series = {request.session_id: request.power_supplied_per_timestep
+              for request in expected.completed_requests + expected.departed_requests}
+    for request in actual.completed_requests + actual.departed_requests:
+        assert request.power_supplied_per_timestep == pytest.approx(series[request.session_id], abs=1e-9)
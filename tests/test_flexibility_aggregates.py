@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from FlexSimulation import FlexibilitySimulation
+from FlexibilityAggregates import FlexibilityAggregates
+from FlexibilityCalculator import FlexibilityCalculator
+from SupplyProfile import RandomSupplyProfile
+from helpers import assert_same_outcomes, outcomes, request, run
+
+
+def requests():
+    return [request("a", 10.0, 0, 120), request("b", 20.0, 0, 150, nominal_power=22.0), request("c", 4.0, 0, 30)]
+
+
+def test_running_totals_match_a_full_recomputation():
+    aggregates = FlexibilityAggregates(debug=True)
+    queued = requests()
+    for queued_request in queued:
+        aggregates.update(queued_request)
+    queued[0].charged_energy = 5.0
+    queued[0].charged_time = 30
+    aggregates.update(queued[0])
+    aggregates.verify(queued)
+    assert aggregates.total_power_demand == pytest.approx(sum(
+        FlexibilityCalculator.calculate_required_power(r, r.evse_id.nominal_power_cp) for r in queued))
+    assert aggregates.power_flexibility("a") == pytest.approx(
+        FlexibilityCalculator.calculate_power_flexibility(queued[0], 11.0))
+
+    aggregates.remove(queued.pop(1))
+    aggregates.verify(queued)
+    assert len(aggregates) == 2
+
+
+def test_verify_detects_stale_terms_and_untracked_requests():
+    aggregates = FlexibilityAggregates(debug=True)
+    queued = requests()
+    for queued_request in queued[:2]:
+        aggregates.update(queued_request)
+    with pytest.raises(AssertionError, match="track 2 requests, queue holds 3"):
+        aggregates.verify(queued)
+    queued[0].charged_energy = 9.0  # Changed without update()
+    queued[0].charged_time = 100
+    with pytest.raises(AssertionError, match="differs from recomputed"):
+        aggregates.verify(queued[:2])
+
+
+def test_totals_reset_once_the_queue_is_empty():
+    aggregates = FlexibilityAggregates()
+    queued = requests()
+    for queued_request in queued:
+        aggregates.update(queued_request)
+    for queued_request in queued:
+        aggregates.remove(queued_request)
+    assert (aggregates.total_power_demand, aggregates.flexibility_supply, len(aggregates)) == (0.0, 0.0, 0)
+
+
+def test_debug_run_verifies_every_read_and_changes_nothing():
+    expected = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(8)))
+    checked = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(8)), debug_aggregates=True)
+    assert checked.aggregates.debug
+    assert_same_outcomes(outcomes(expected), outcomes(checked))
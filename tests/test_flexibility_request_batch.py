@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from CarSpecs import CarSpecs
+from ChargingPoint import ChargingPoint
+from FlexSimulation import FlexibilitySimulation
+from FlexibilityRequest import AvailableFlexibilityRequest
+from FlexibilityRequestBatch import FlexibilityRequestBatch
+from SimulationEvents import NullSink
+from SupplyProfile import ConstantSupplyProfile
+from helpers import START, assert_same_outcomes, outcomes
+
+
+def batch(**kwargs):
+    columns = dict(requested_energy=[10.0, 5.0, 8.0], arrival_minutes=[30, 0, 15], leave_minutes=[240, 120, 200])
+    columns.update(kwargs)
+    return FlexibilityRequestBatch(START, **columns)
+
+
+def test_requests_store_whole_minutes_since_the_epoch():
+    car = CarSpecs(make="Test", model="EV", year=2024, battery_capacity_in_kwh=100, initial_soc=20)
+    from_times = AvailableFlexibilityRequest("a", ChargingPoint(1, 11), 10, START + timedelta(minutes=90, seconds=20),
+                                             START + timedelta(minutes=15), car, 0, 0, epoch=START)
+    from_minutes = AvailableFlexibilityRequest("a", ChargingPoint(1, 11), 10, 90, 15, car, 0, 0, epoch=START)
+    assert (from_times.arrival_minute, from_times.leave_minute) == (15, 90)
+    assert from_minutes.arrival_time == START + timedelta(minutes=15)
+    assert from_minutes.requested_leave_time == START + timedelta(minutes=90)
+    assert from_minutes.duration_minutes == 75
+    without_epoch = AvailableFlexibilityRequest("b", ChargingPoint(1, 11), 10, START + timedelta(hours=1), START, car, 0, 0)
+    assert without_epoch.epoch == START and without_epoch.leave_minute == 60
+    with pytest.raises(ValueError, match="epoch"):
+        AvailableFlexibilityRequest("c", ChargingPoint(1, 11), 10, 60, 0, car, 0, 0)
+
+
+def test_batch_builds_requests_on_access():
+    sessions = batch(nominal_power=[7.4, 11, 22], session_ids=["x", "y", "z"])
+    assert len(sessions) == 3
+    request = sessions[-1]
+    assert request.session_id == "z" and request.evse_id.nominal_power_cp == pytest.approx(22.0)
+    assert request.arrival_time == START + timedelta(minutes=15)
+    assert [request.session_id for request in sessions.iter_by_arrival()] == ["y", "z", "x"]
+    assert [request.session_id for request in batch()] == ["session0", "session1", "session2"]
+
+
+def test_batch_validation_names_the_first_invalid_session():
+    with pytest.raises(ValueError, match="session 1"):
+        batch(requested_energy=[10.0, 0.0, -1.0])
+    with pytest.raises(ValueError, match="session 2"):
+        batch(leave_minutes=[240, 120, 15])
+    with pytest.raises(ValueError, match="SoC"):
+        batch(initial_soc=[50, 120, 50])
+    with pytest.raises(ValueError, match="same length"):
+        batch(nominal_power=[11, 11])
+    with pytest.raises(ValueError, match="future"):
+        FlexibilityRequestBatch(START, [10.0], [0], [60], now=START + timedelta(hours=2))
+
+
+def test_batch_runs_like_the_same_requests():
+    arrivals = np.arange(0, 600, 20)
+    sessions = FlexibilityRequestBatch(START, np.full(len(arrivals), 12.0), arrivals, arrivals + 180)
+
+    def simulate(requests):
+        simulation = FlexibilitySimulation(33.0, 15, events=NullSink(), start_time=START,
+                                           supply_profile=ConstantSupplyProfile(33.0))
+        simulation.run_simulation(requests, plot=False)
+        return simulation
+
+    assert_same_outcomes(outcomes(simulate(sessions.to_requests())), outcomes(simulate(sessions.iter_by_arrival())))
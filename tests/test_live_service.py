@@ -0,0 +1,71 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from FlexSimulation import FlexibilitySimulation
+from LiveService import LiveSimulationService, LocalClient
+from ResultRecorder import ResultRecorder
+from SettlementLedger import FlatTariff, SettlementLedger
+from SimulationEvents import NullSink
+from helpers import START
+
+
+def service(**kwargs):
+    simulation = FlexibilitySimulation(22.0, 15, events=NullSink(), start_time=START, **kwargs)
+    return LiveSimulationService(simulation, speed=None)
+
+
+def record(session_id, requested_energy=5.0, leave_minutes=240):
+    return {"session_id": session_id, "requested_energy": requested_energy, "nominal_power": 11.0,
+            "leave_time": (START + timedelta(minutes=leave_minutes)).isoformat()}
+
+
+def test_local_client_submits_and_receives_updates():
+    live = service()
+    client = LocalClient(live)
+    client.submit(record("a"))
+    client.submit(record("b", requested_energy=20.0))
+
+    async def session():
+        runner = asyncio.ensure_future(live.run(steps=4))
+        first = await client.next_update()
+        client.update_supply(11.0)
+        await runner
+        later = [update async for update in client.updates()]
+        return first, later
+
+    first, later = asyncio.run(session())
+    assert first.step == 0 and first.accepted == ["a", "b"]
+    assert first.allocations == {"a": 11.0, "b": 11.0}
+    assert later and later[-1].step == 3
+    assert sum(later[-1].allocations.values()) <= 11.0  # The new supply applies from the next step
+    assert live.steps == 4 and live.stopped
+
+
+def test_submitting_a_session_twice_is_refused():
+    live = service()
+    live.submit_record(record("a"))
+    with pytest.raises(ValueError, match="already submitted"):
+        live.submit_record(record("a"))
+
+
+def test_shutdown_finishes_the_simulation_run():
+    recorder = ResultRecorder()
+    ledger = SettlementLedger(FlatTariff(0.2), keep_statements=True)
+    live = service(recorder=recorder, ledger=ledger)
+    live.submit_record(record("a", requested_energy=50.0))
+
+    async def stop_after_two_steps():
+        subscription = live.subscribe()
+        runner = asyncio.ensure_future(live.run())
+        await subscription.next()
+        await subscription.next()
+        live.stop()
+        await runner
+
+    asyncio.run(stop_after_two_steps())
+    assert live.finished and recorder.closed
+    assert ledger.open_sessions() == 0 and [statement.session_id for statement in ledger.statements] == ["a"]
+    with pytest.raises(ValueError, match="already run"):
+        asyncio.run(live.run(steps=1))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from MonteCarloRunner import ScenarioSpec, SessionSpec, run_monte_carlo, run_scenario
+from helpers import START
+
+
+def scenario(vectorized=False):
+    sessions = [SessionSpec(f"s{index}", 8.0 + index % 5, index * 20, index * 20 + 240) for index in range(12)]
+    return ScenarioSpec(sessions, power_supply=33.0, vectorized=vectorized)
+
+
+def test_a_seed_reproduces_its_run():
+    first = run_scenario(scenario(), 7, START)
+    second = run_scenario(scenario(), 7, START)
+    np.testing.assert_array_equal(first.flexibility_contribution, second.flexibility_contribution)
+    np.testing.assert_array_equal(first.charged_energy, second.charged_energy)
+    assert (first.completed, first.departed, first.rejected) == (second.completed, second.departed, second.rejected)
+    assert first.completed + first.departed + first.rejected == len(scenario().sessions)
+
+
+def test_engines_give_the_same_scenario_result():
+    expected = run_scenario(scenario(), 3, START)
+    actual = run_scenario(scenario(vectorized=True), 3, START)
+    np.testing.assert_allclose(actual.flexibility_contribution, expected.flexibility_contribution, atol=1e-9)
+    np.testing.assert_allclose(actual.charged_energy, expected.charged_energy, atol=1e-9)
+
+
+def test_pool_returns_one_row_per_seed_in_seed_order():
+    seeds = [5, 1, 9, 4]
+    serial = run_monte_carlo(scenario(), seeds, processes=1)
+    pooled = run_monte_carlo(scenario(), seeds, processes=2, chunksize=1)
+    assert len(pooled) == 4 and pooled.seeds.tolist() == seeds
+    assert pooled.flexibility_contribution.shape == (4, len(scenario().sessions))
+    np.testing.assert_array_equal(pooled.charged_energy, serial.charged_energy)
+    np.testing.assert_array_equal(pooled.completed, serial.completed)
+
+
+def test_contribution_summary_has_one_value_per_session():
+    summary = run_monte_carlo(scenario(), range(3), processes=1).contribution_summary((10, 90))
+    assert sorted(summary) == ["mean", "p10", "p90", "std"]
+    assert all(values.shape == (len(scenario().sessions),) for values in summary.values())
+    assert np.all(summary["p10"] <= summary["p90"])
+
+
+def test_empty_seed_list_is_rejected():
+    with pytest.raises(ValueError, match="at least one seed"):
+        run_monte_carlo(scenario(), [])
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from MonteCarloRunner import ScenarioSpec, SessionSpec
+from MultiSiteRunner import (ACTIVE, ALLOTMENT, COLUMNS, FLEXIBILITY_SUPPLY, NOMINAL_DEMAND, POWER_DEMAND, SITE_LIMIT,
+                             FeederCoordinator, run_multi_site)
+from helpers import START
+
+
+def site_table(rows):
+    table = np.zeros((len(rows), COLUMNS))
+    for index, (nominal_demand, power_demand, flexibility_supply, site_limit) in enumerate(rows):
+        table[index, [ACTIVE, NOMINAL_DEMAND, POWER_DEMAND, FLEXIBILITY_SUPPLY, SITE_LIMIT]] = (
+            1.0, nominal_demand, power_demand, flexibility_supply, site_limit)
+    return table
+
+
+ROWS = [(44.0, 44.0, 22.0, 33.0), (22.0, 22.0, 0.0, 50.0), (11.0, 11.0, 11.0, 11.0)]  # Caps 33, 22, 11; firm 22, 22, 0
+
+
+@pytest.mark.parametrize("capacity, expected", [
+    (100.0, [33.0, 22.0, 11.0]),  # Every site gets its cap
+    (22.0, [11.0, 11.0, 0.0]),  # Firm demands scaled down
+])
+def test_feeder_gives_caps_or_scaled_firm_demand(capacity, expected):
+    table = site_table(ROWS)
+    assert FeederCoordinator(capacity).split(table, 0) == capacity
+    np.testing.assert_allclose(table[:, ALLOTMENT], expected)
+
+
+def test_feeder_water_fills_above_the_firm_demand():
+    table = site_table(ROWS)
+    FeederCoordinator(54.0).split(table, 0)
+    allotment = table[:, ALLOTMENT]
+    assert allotment.sum() == pytest.approx(54.0)
+    assert np.all(allotment >= [22.0, 22.0, 0.0]) and np.all(allotment <= [33.0, 22.0, 11.0])
+    np.testing.assert_allclose(allotment, [22.0, 22.0, 10.0])  # The last site is filled up towards the others' level
+
+
+def sites(count=4):
+    return [ScenarioSpec([SessionSpec(f"site{site}-{index}", 6.0 + (site + index) % 7, index * 25 + site * 5,
+                                      index * 25 + site * 5 + 180) for index in range(10)], power_supply=33.0)
+            for site in range(count)]
+
+
+def test_workers_reproduce_the_single_process_run():
+    serial = run_multi_site(sites(), 60.0, processes=1, start_time=START)
+    pooled = run_multi_site(sites(), 60.0, processes=2, start_time=START, timeout=60)
+    assert len(pooled) == 4
+    np.testing.assert_allclose(pooled.allotments, serial.allotments)
+    for expected, actual in zip(serial.sites, pooled.sites):
+        np.testing.assert_allclose(actual.charged_energy, expected.charged_energy)
+        assert (actual.completed, actual.departed, actual.rejected) == (expected.completed, expected.departed, expected.rejected)
+
+
+def test_sites_never_draw_more_than_the_feeder():
+    result = run_multi_site(sites(), 60.0, processes=1, start_time=START)
+    assert result.allotments.shape == (len(result.feeder_capacity), 4)
+    assert np.all(result.feeder_power <= result.feeder_capacity + 1e-9)
+    assert np.all(result.allotments <= 33.0 + 1e-9)
+    for site in result.sites:
+        assert site.completed + site.departed + site.rejected == 10
+
+
+def test_sites_must_share_the_time_step():
+    mixed = sites(2)
+    mixed[1].time_step = 5
+    with pytest.raises(ValueError, match="same time step"):
+        run_multi_site(mixed, 60.0, processes=1)
@@ -0,0 +1,102 @@
+import csv
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from FlexSimulation import FlexibilitySimulation
+from ResultRecorder import ChunkWriter, CsvChunkWriter, NpzChunkWriter, ParquetChunkWriter, ResultRecorder
+from SupplyProfile import ConstantSupplyProfile
+from helpers import run
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def recorded_run(recorder, sessions=60):
+    return run(FlexibilitySimulation, ConstantSupplyProfile(30.0), sessions=sessions, recorder=recorder)
+
+
+def test_run_leaves_complete_csv_files(tmp_path):
+    recorder = ResultRecorder(chunk_size=64, writer=CsvChunkWriter(str(tmp_path)))
+    recorded_run(recorder)
+    table = recorder.allocation_table()
+
+    allocations = read_csv(tmp_path / "allocations.csv")
+    assert len(allocations) == len(table["step"])
+    assert [int(row["step"]) for row in allocations] == table["step"].tolist()
+    assert len(read_csv(tmp_path / "supply.csv")) == len(recorder.supply_table()["step"])
+    sessions = read_csv(tmp_path / "sessions.csv")
+    assert [row["session_id"] for row in sessions] == recorder.session_ids
+
+    recorder.close()  # A second close neither writes nor fails
+    assert len(read_csv(tmp_path / "sessions.csv")) == len(recorder.session_ids)
+
+
+def test_npz_chunks_hold_every_row_when_not_kept_in_memory(tmp_path):
+    expected = ResultRecorder()
+    recorded_run(expected)
+    recorder = ResultRecorder(chunk_size=100, writer=NpzChunkWriter(str(tmp_path)), keep_in_memory=False)
+    recorded_run(recorder)
+
+    paths = sorted(glob.glob(os.path.join(str(tmp_path), "allocations-*.npz")))
+    assert len(paths) > 1
+    chunks = [np.load(path) for path in paths]
+    for name, column in expected.allocation_table().items():
+        np.testing.assert_allclose(np.concatenate([chunk[name] for chunk in chunks]), column)
+
+
+def test_parquet_file_is_readable_after_the_run(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    recorder = ResultRecorder(chunk_size=64, writer=ParquetChunkWriter(str(tmp_path)))
+    recorded_run(recorder)
+    table = pq.read_table(str(tmp_path / "allocations.parquet"))
+    assert table.num_rows == len(recorder.allocation_table()["step"])
+
+
+def test_matrix_places_rows_by_session_and_step():
+    recorder = ResultRecorder(chunk_size=16)
+    recorder.record_allocation("a", 0, 11.0, 0.0)
+    recorder.record_allocation("b", 2, 5.0, 6.0)
+    recorder.record_allocations(np.array([0, 1]), 3, np.array([7.0, 3.0]), np.array([4.0, 8.0]))
+    np.testing.assert_array_equal(recorder.matrix(), [[11.0, 0, 0, 7.0], [0, 0, 5.0, 3.0]])
+    np.testing.assert_array_equal(recorder.matrix("flexibility_contribution"), [[0, 0, 0, 4.0], [0, 0, 6.0, 8.0]])
+    np.testing.assert_array_equal(recorder.matrix(factor=3), [[11.0 / 3, 7.0 / 3], [5.0 / 3, 3.0 / 3]])
+    assert recorder.step_count == 4
+
+
+def test_session_series_matches_the_table_rows_of_each_session():
+    recorder = ResultRecorder(chunk_size=64)
+    recorded_run(recorder)
+    table = recorder.allocation_table()
+    for index, session_id in enumerate(recorder.session_ids):
+        steps, power = recorder.session_series(session_id)
+        mask = table["session"] == index
+        np.testing.assert_array_equal(steps, table["step"][mask])
+        np.testing.assert_array_equal(power, table["allocated_power"][mask])
+
+
+def test_session_series_follows_rows_recorded_after_a_read():
+    recorder = ResultRecorder(chunk_size=16)
+    recorder.record_allocation("a", 0, 11.0, 0.0)
+    assert recorder.session_series("a")[1].tolist() == [11.0]
+    recorder.record_allocation("a", 1, 4.0, 7.0)
+    assert recorder.session_series("a")[1].tolist() == [11.0, 4.0]
+
+
+def test_session_series_refuses_rows_dropped_from_memory(tmp_path):
+    recorder = ResultRecorder(chunk_size=32, writer=NpzChunkWriter(str(tmp_path)), keep_in_memory=False)
+    recorded_run(recorder)
+    with pytest.raises(ValueError, match="dropped"):
+        recorder.session_series(recorder.session_ids[0])
+
+
+def test_a_writer_without_write_cannot_be_created():
+    class Incomplete(ChunkWriter):
+        pass
+
+    with pytest.raises(TypeError, match="write"):
+        Incomplete()
@@ -0,0 +1,114 @@
+import csv
+import json
+from datetime import timedelta
+
+import pytest
+
+from FlexSimulation import FlexibilitySimulation
+from SessionLog import CsvSessionLog, JsonlSessionLog, RecordSessionLog, SessionLogReader
+from SimulationEvents import NullSink
+from SupplyProfile import ConstantSupplyProfile
+from helpers import START, assert_same_outcomes, fleet, outcomes
+
+FIELDS = ["session_id", "evse_id", "requested_energy", "arrival_time", "leave_time", "nominal_power",
+          "battery_capacity_in_kwh", "initial_soc", "make", "model", "year"]
+
+
+def records(sessions=60):
+    for request in fleet(sessions):
+        car = request.car_specs
+        yield {"session_id": request.session_id, "evse_id": request.evse_id.evse_id,
+               "requested_energy": request.requested_energy, "arrival_time": request.arrival_time.isoformat(),
+               "leave_time": request.requested_leave_time.isoformat(), "nominal_power": request.evse_id.nominal_power_cp,
+               "battery_capacity_in_kwh": car.battery_capacity_in_kwh, "initial_soc": car.initial_soc,
+               "make": car.make, "model": car.model, "year": car.year}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_jsonl(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def simulate(requests, lookahead_minutes=None):
+    simulation = FlexibilitySimulation(60.0, 15, events=NullSink(), start_time=START,
+                                       supply_profile=ConstantSupplyProfile(30.0))
+    simulation.run_simulation(requests, plot=False, lookahead_minutes=lookahead_minutes)
+    return simulation
+
+
+def test_streamed_logs_run_like_the_generated_fleet(tmp_path):
+    expected = outcomes(simulate(fleet(60)))
+    csv_log = CsvSessionLog(write_csv(tmp_path / "log.csv", records()), epoch=START)
+    jsonl_log = JsonlSessionLog(write_jsonl(tmp_path / "log.jsonl", [json.dumps(row) for row in records()]), epoch=START)
+    assert_same_outcomes(expected, outcomes(simulate(csv_log, lookahead_minutes=60)))
+    assert_same_outcomes(expected, outcomes(simulate(jsonl_log, lookahead_minutes=60)))
+
+
+def test_streaming_pulls_records_only_within_the_lookahead(tmp_path):
+    log = CsvSessionLog(write_csv(tmp_path / "log.csv", records()), epoch=START)
+    pulled = []
+
+    def counted():
+        for request in log:
+            pulled.append(request.session_id)
+            yield request
+
+    simulation = FlexibilitySimulation(60.0, 15, events=NullSink(), start_time=START,
+                                       supply_profile=ConstantSupplyProfile(30.0))
+    simulation.start_run(counted(), lookahead_minutes=30)
+    simulation.run_until(START + timedelta(hours=1))
+    arrived = [request for request in fleet(60) if request.arrival_time <= START + timedelta(hours=1, minutes=30)]
+    assert len(arrived) < 60
+    assert len(pulled) <= len(arrived) + 1  # The next request beyond the window is read ahead
+
+
+def test_minutes_need_an_epoch(tmp_path):
+    rows = [{"session_id": "a", "requested_energy": 10, "arrival_time": 0, "leave_time": 120}]
+    path = write_csv(tmp_path / "log.csv", rows)
+    request, = CsvSessionLog(path, epoch=START)
+    assert request.arrival_time == START and request.requested_leave_time == START + timedelta(hours=2)
+    with pytest.raises(ValueError, match="epoch"):
+        list(CsvSessionLog(path))
+
+
+def test_csv_errors_name_the_file_line(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("session_id,requested_energy,arrival_time,leave_time\n"
+                    "a,10,0,120\n"
+                    "\n"
+                    "b,,0,120\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"line 4: .*requested_energy"):
+        list(CsvSessionLog(str(path), epoch=START))
+
+
+def test_jsonl_errors_name_the_file_line(tmp_path):
+    valid = json.dumps({"session_id": "a", "requested_energy": 10, "arrival_time": 0, "leave_time": 120})
+    path = write_jsonl(tmp_path / "log.jsonl", [valid, "", json.dumps({"session_id": "b", "arrival_time": 0}), "{"])
+    with pytest.raises(ValueError, match="line 3: "):
+        list(JsonlSessionLog(path, epoch=START))
+    log = JsonlSessionLog(path, epoch=START, skip_invalid=True)
+    assert [request.session_id for request in log] == ["a"]
+    assert log.skipped == 2
+
+
+def test_record_log_numbers_records_from_one():
+    log = RecordSessionLog([{"session_id": "a", "requested_energy": 10, "arrival_time": 0, "leave_time": 60},
+                            {"session_id": "b", "arrival_time": 0, "leave_time": 60}], epoch=START)
+    with pytest.raises(ValueError, match="<records>, line 2: "):
+        list(log)
+
+
+def test_a_reader_without_records_cannot_be_created():
+    class Incomplete(SessionLogReader):
+        pass
+
+    with pytest.raises(TypeError, match="records"):
+        Incomplete("<none>")
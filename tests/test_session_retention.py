@@ -0,0 +1,95 @@
+import csv
+import pickle
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from FlexSimulation import FlexibilitySimulation
+from ResultRecorder import CsvChunkWriter, ParquetChunkWriter
+from SessionRetention import RetentionPolicy, SessionArchive, SessionSummary
+from SupplyProfile import RandomSupplyProfile
+from helpers import START, request, run
+
+
+def series_rows(simulation_kwargs=None):
+    """Allocation rows of the same run without retention, one per session and step."""
+    simulation = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(5)), sessions=80, **(simulation_kwargs or {}))
+    return sum(len(request.power_supplied_per_timestep) for request in
+               simulation.completed_requests + simulation.departed_requests + simulation.rejected_requests)
+
+
+def test_spilled_csv_is_complete_after_the_run(tmp_path):
+    policy = RetentionPolicy("spill", CsvChunkWriter(str(tmp_path)), chunk_size=100)
+    run(FlexibilitySimulation, RandomSupplyProfile(random.Random(5)), sessions=80, retention=policy)
+    assert policy.closed
+    with open(tmp_path / "allocations.csv", newline="", encoding="utf-8") as handle:
+        assert len(list(csv.DictReader(handle))) == series_rows()
+    policy.close()  # A second close neither writes nor fails
+
+
+def test_spilled_parquet_is_readable_after_the_run(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    policy = RetentionPolicy("spill", ParquetChunkWriter(str(tmp_path)), chunk_size=100)
+    run(FlexibilitySimulation, RandomSupplyProfile(random.Random(5)), sessions=80, retention=policy)
+    assert pq.read_table(str(tmp_path / "allocations.parquet")).num_rows == series_rows()
+
+
+def archive(outcome="completed", series="keep"):
+    return SessionArchive(SimpleNamespace(recorder=None, current_time=START, time_step=15), outcome, RetentionPolicy(series))
+
+
+def finished(session_id, charged_energy, completed_minute=None, requested_energy=10.0, leave_minute=12):
+    finished_request = request(session_id, requested_energy, 0, leave_minute)
+    finished_request.charged_energy = charged_energy
+    if completed_minute is not None:
+        finished_request.completed_at = START + timedelta(minutes=completed_minute)
+    return finished_request
+
+
+def test_late_follows_the_completion_time_not_the_step_end():
+    sessions = archive()
+    sessions.append(finished("on_time", 10.0, completed_minute=10))
+    sessions.append(finished("late", 10.0, completed_minute=14))
+    assert [summary.late for summary in sessions] == [False, True]
+    assert sessions[1].completed_at == START + timedelta(minutes=14)
+    assert sessions.statistics()["late"] == 1
+
+
+def test_every_way_of_adding_stores_summaries_and_keeps_totals():
+    sessions = archive("departed")
+    sessions.append(finished("a", 1.0))
+    sessions.extend([finished("b", 2.0)])
+    sessions += [finished("c", 3.0)]
+    sessions.insert(0, finished("d", 4.0))
+    sessions[0] = finished("e", 5.0)
+    sessions[1:3] = [finished("f", 6.0), finished("g", 7.0), finished("h", 8.0)]
+    assert all(isinstance(summary, SessionSummary) for summary in sessions)
+    assert [summary.session_id for summary in sessions] == ["e", "f", "g", "h", "c"]
+    assert sessions.statistics()["charged_energy"] == pytest.approx(29.0)
+    assert sessions.statistics()["missed"] == 5
+
+    del sessions[0]
+    sessions.pop()
+    sessions.remove(sessions[0])
+    assert sessions.statistics()["charged_energy"] == pytest.approx(15.0)
+    sessions.clear()
+    assert sessions.statistics() == {"sessions": 0, "requested_energy": 0.0, "charged_energy": 0.0,
+                                     "flexibility_contribution": 0.0, "missed": 0, "late": 0}
+
+
+def test_archive_survives_pickling_with_its_totals():
+    sessions = archive()
+    sessions.extend([finished("a", 10.0, completed_minute=14), finished("b", 10.0, completed_minute=5)])
+    restored = pickle.loads(pickle.dumps(sessions))
+    assert [summary.session_id for summary in restored] == ["a", "b"]
+    assert restored.statistics() == sessions.statistics()
+
+
+def test_completed_sessions_of_a_run_carry_their_completion_time():
+    policy = RetentionPolicy("drop")
+    simulation = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(5)), sessions=80, retention=policy)
+    for summary in simulation.completed_requests:
+        assert summary.finished_at <= summary.completed_at <= summary.finished_at + timedelta(minutes=15)
+        assert summary.late == (summary.completed_at > summary.requested_leave_time)
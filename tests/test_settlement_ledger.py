@@ -0,0 +1,92 @@
+import csv
+import glob
+import os
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from SettlementLedger import (CsvStatementWriter, FlatTariff, PdfStatementWriter, SessionStatement, SettlementLedger,
+                              StatementWriter, Tariff, TimeOfUseTariff)
+from SupplyProfile import RandomSupplyProfile
+from helpers import START, run
+
+
+def session(session_id):
+    return SimpleNamespace(session_id=session_id, evse_id=SimpleNamespace(evse_id=3), arrival_time=START,
+                           requested_leave_time=START + timedelta(hours=4))
+
+
+def test_contributions_are_priced_at_the_hour_of_their_step():
+    tariff = TimeOfUseTariff([0.1] * 18 + [0.5] * 6)
+    ledger = SettlementLedger(tariff, keep_statements=True)
+    ledger.book(START + timedelta(hours=10), "a", 2.0)
+    ledger.book_many(START + timedelta(hours=19), ["a", "b"], [1.0, 4.0])
+    assert ledger.balance("a") == pytest.approx((3.0, 0.7))
+    statement = ledger.settle(session("a"), START + timedelta(hours=20))
+    assert (statement.evse_id, statement.contributing_steps) == (3, 2)
+    assert statement.reward == pytest.approx(0.7)
+    assert ledger.summary()["open_sessions"] == 1 and ledger.balance("a") == (0.0, 0.0)
+    with pytest.raises(ValueError, match="one price per hour"):
+        TimeOfUseTariff([0.1] * 23)
+
+
+@pytest.mark.parametrize("include_zero_sessions", [True, False])
+def test_sessions_that_never_contributed_are_settled_with_zero(include_zero_sessions):
+    ledger = SettlementLedger(FlatTariff(0.2), keep_statements=True, include_zero_sessions=include_zero_sessions)
+    ledger.open_session("idle")
+    statement = ledger.settle(session("idle"), START)
+    assert (statement is not None) == include_zero_sessions
+    assert ledger.zero_sessions == 1 and ledger.open_sessions() == 0
+    assert ledger.settle(session("unknown"), START) is None
+
+
+def simulate(simulation_class, tmp_path):
+    ledger = SettlementLedger(FlatTariff(0.25), [CsvStatementWriter(str(tmp_path / f"{simulation_class.__name__}.csv"))],
+                              keep_statements=True)
+    simulation = run(simulation_class, RandomSupplyProfile(random.Random(9)), ledger=ledger)
+    return simulation, ledger
+
+
+def test_run_settles_every_queued_session_once(tmp_path):
+    simulation, ledger = simulate(FlexibilitySimulation, tmp_path)
+    finished = simulation.completed_requests + simulation.departed_requests + simulation.rejected_requests
+    contributions = {request.session_id: request.flexibility_contribution for request in finished}
+    statements = {statement.session_id: statement for statement in ledger.statements}
+    assert len(statements) == len(ledger.statements) == ledger.settled_sessions and ledger.open_sessions() == 0
+    for session_id, statement in statements.items():
+        assert statement.contributed_energy == pytest.approx(contributions[session_id], abs=1e-9)
+        assert statement.reward == pytest.approx(0.25 * statement.contributed_energy)
+    assert ledger.total_energy == pytest.approx(sum(contributions.values()))
+    with open(tmp_path / "FlexibilitySimulation.csv", newline="", encoding="utf-8") as handle:
+        assert len(list(csv.DictReader(handle))) == len(statements)
+
+
+def test_engines_write_the_same_statements(tmp_path):
+    _, expected = simulate(FlexibilitySimulation, tmp_path)
+    _, actual = simulate(VectorizedFlexibilitySimulation, tmp_path)
+    assert [statement.session_id for statement in actual.statements] == [s.session_id for s in expected.statements]
+    for statement, reference in zip(actual.statements, expected.statements):
+        assert statement.reward == pytest.approx(reference.reward, abs=1e-9)
+        assert statement.settled_at == reference.settled_at
+
+
+def test_pdf_statements_are_split_into_files(tmp_path):
+    pytest.importorskip("fpdf")
+    writer = PdfStatementWriter(str(tmp_path), sessions_per_file=2)
+    for index in range(5):
+        writer.write(SessionStatement(f"s{index}", 1, START, START + timedelta(hours=2), 1.5, 0.3, 2, START))
+    writer.close()
+    assert writer.files == 3
+    assert [os.path.basename(path) for path in sorted(glob.glob(str(tmp_path / "*.pdf")))] == [
+        "statements-00000.pdf", "statements-00001.pdf", "statements-00002.pdf"]
+
+
+@pytest.mark.parametrize("base, method", [(Tariff, "price_at"), (StatementWriter, "write")])
+def test_incomplete_tariffs_and_writers_cannot_be_created(base, method):
+    incomplete = type("Incomplete", (base,), {})
+    with pytest.raises(TypeError, match=method):
+        incomplete()
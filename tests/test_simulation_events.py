@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from SimulationEvents import (DEBUG, INFO, AllocationEvent, ArrivalEvent, EventSink, JsonlFileSink, NullSink,
+                              RingBufferSink)
+from helpers import START
+
+
+def test_a_sink_without_emit_cannot_be_created():
+    class Incomplete(EventSink):
+        pass
+
+    with pytest.raises(TypeError, match="emit"):
+        Incomplete()
+
+
+def test_sinks_filter_by_level():
+    sink = RingBufferSink(capacity=2, level=INFO)
+    assert sink.enabled(ArrivalEvent.level) and not sink.enabled(AllocationEvent.level)
+    assert not NullSink().enabled(INFO)
+    for session_id in ("a", "b", "c"):
+        sink.emit(ArrivalEvent(START, session_id))
+    assert [event.session_id for event in sink.of_kind("arrival")] == ["b", "c"]
+
+
+def test_jsonl_sink_writes_buffered_events_on_close(tmp_path):
+    path = tmp_path / "events.jsonl"
+    with JsonlFileSink(str(path), level=DEBUG, buffer_size=10) as sink:
+        sink.emit(AllocationEvent(START, "a", 11.0))
+        assert path.read_text(encoding="utf-8") == ""
+    record, = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert record == {"time": START.isoformat(), "session_id": "a", "allocated_power": 11.0, "kind": "allocation"}
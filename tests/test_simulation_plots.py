@@ -0,0 +1,77 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from ResultRecorder import ResultRecorder, step_matrix
+from SimulationPlots import SimulationPlotter
+from SupplyProfile import RandomSupplyProfile
+from helpers import run
+
+
+def rows_by_session(simulation, column):
+    session_ids, matrix, _ = SimulationPlotter.series_matrix(simulation, column)
+    return dict(zip(session_ids, matrix))
+
+
+@pytest.mark.parametrize("simulation_class", [FlexibilitySimulation, VectorizedFlexibilitySimulation])
+@pytest.mark.parametrize("adaptive_stepping", [False, True])
+@pytest.mark.parametrize("column", ["allocated_power", "flexibility_contribution"])
+def test_series_matrix_without_recorder_matches_recorder(simulation_class, adaptive_stepping, column):
+    recorded = run(simulation_class, RandomSupplyProfile(random.Random(4)), adaptive_stepping,
+                   recorder=ResultRecorder(chunk_size=256))
+    plain = run(simulation_class, RandomSupplyProfile(random.Random(4)), adaptive_stepping)
+    expected = rows_by_session(recorded, column)
+    actual = rows_by_session(plain, column)
+    assert plain.rejected_requests and expected.keys() == actual.keys()
+    steps = max(len(row) for row in expected.values())
+    for session_id, row in expected.items():
+        np.testing.assert_allclose(np.pad(actual[session_id], (0, steps - len(actual[session_id]))),
+                                   np.pad(row, (0, steps - len(row))), atol=1e-9, err_msg=session_id)
+
+
+def test_contribution_series_has_one_entry_in_kw_per_step():
+    simulation = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(4)))
+    hours = simulation.time_step / 60
+    for request in simulation.completed_requests + simulation.departed_requests:
+        assert len(request.flexibility_contribution_per_timestep) == len(request.power_supplied_per_timestep)
+        assert sum(request.flexibility_contribution_per_timestep) * hours == pytest.approx(
+            request.flexibility_contribution, abs=1e-9)
+
+
+def test_step_matrix_averages_consecutive_steps():
+    sessions, steps, values = np.array([0, 0, 1, 1, 1]), np.array([0, 4, 1, 2, 6]), np.array([2.0, 4.0, 6.0, 3.0, 9.0])
+    dense = np.zeros((2, 9))  # Padded to a multiple of the factor
+    dense[sessions, steps] = values
+    np.testing.assert_allclose(step_matrix(sessions, steps, values, 2), dense[:, :7])
+    np.testing.assert_allclose(step_matrix(sessions, steps, values, 2, 3), dense.reshape(2, 3, 3).mean(axis=2))
+
+
+@pytest.mark.parametrize("recorder", [None, ResultRecorder(chunk_size=256)])
+def test_series_matrix_is_downsampled_to_max_columns(recorder):
+    simulation = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(4)), recorder=recorder)
+    session_ids, full, factor = SimulationPlotter.series_matrix(simulation)
+    assert factor == 1
+    session_ids, matrix, factor = SimulationPlotter.series_matrix(simulation, max_columns=10)
+    assert matrix.shape[1] <= 10 and factor == SimulationPlotter.downsample_factor(full.shape[1], 10)
+    padded = np.pad(full, ((0, 0), (0, matrix.shape[1] * factor - full.shape[1])))
+    np.testing.assert_allclose(matrix, padded.reshape(len(session_ids), -1, factor).mean(axis=2), atol=1e-9)
+
+
+@pytest.mark.parametrize("mode", SimulationPlotter.MODES)
+def test_render_writes_both_charts(tmp_path, mode):
+    simulation = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(4)), sessions=40)
+    plotter = SimulationPlotter(str(tmp_path), file_format="svg", mode=mode, width_px=300, height_px=200)
+    paths = plotter.render(simulation, "run")
+    assert [os.path.basename(path) for path in paths] == ["run_power_supplied.svg", "run_flexibility_contribution.svg"]
+    assert all(os.path.getsize(path) > 0 for path in paths)
+
+
+def test_plotter_rejects_unknown_mode_and_format():
+    with pytest.raises(ValueError):
+        SimulationPlotter(mode="bars")
+    with pytest.raises(ValueError):
+        SimulationPlotter(file_format="jpg")
@@ -0,0 +1,72 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from FleetEngine import VectorizedFlexibilitySimulation
+from FlexSimulation import FlexibilitySimulation
+from SimulationEvents import NullSink
+from SimulationSnapshot import fork, load_snapshot, restore, run_fork, save_snapshot, snapshot, summarize
+from SupplyProfile import ConstantSupplyProfile, RandomSupplyProfile
+from helpers import START, assert_same_outcomes, fleet, outcomes, run
+
+WARM_UP = START + timedelta(hours=8)
+
+
+def started(simulation_class=FlexibilitySimulation, requests=None):
+    simulation = simulation_class(60.0, 15, events=NullSink(), start_time=START,
+                                  supply_profile=RandomSupplyProfile(random.Random(6)))
+    simulation.start_run(fleet(100) if requests is None else requests)
+    simulation.run_until(WARM_UP)
+    return simulation
+
+
+def low_supply(simulation):
+    simulation.supply_profile = ConstantSupplyProfile(20.0)
+
+
+@pytest.mark.parametrize("simulation_class", [FlexibilitySimulation, VectorizedFlexibilitySimulation])
+def test_restored_run_finishes_like_an_uninterrupted_run(simulation_class):
+    expected = run(simulation_class, RandomSupplyProfile(random.Random(6)), sessions=100)
+    simulation = restore(snapshot(started(simulation_class)))
+    assert simulation.current_time == WARM_UP
+    simulation.run_until()
+    simulation.finish_run(plot=False)
+    assert_same_outcomes(outcomes(expected), outcomes(simulation))
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    simulation = started()
+    path = str(tmp_path / "warm.snap")
+    assert save_snapshot(simulation, path) > 0
+    events = NullSink()
+    restored = load_snapshot(path, events)
+    assert restored.events is events
+    assert restored.current_step == simulation.current_step
+    assert len(restored.queued_requests) == len(simulation.queued_requests)
+
+
+def test_restore_refuses_other_data():
+    with pytest.raises(ValueError, match="Not a simulation snapshot"):
+        restore(b"not a snapshot")
+    data = snapshot(started())
+    with pytest.raises(ValueError, match="Unsupported snapshot version"):
+        restore(data[:8] + (99).to_bytes(2, "little") + data[10:])
+
+
+def test_streamed_runs_cannot_be_snapshotted():
+    simulation = FlexibilitySimulation(60.0, 15, events=NullSink(), start_time=START)
+    simulation.start_run((request for request in fleet(20)), lookahead_minutes=60)
+    with pytest.raises(ValueError, match="cannot be snapshotted"):
+        snapshot(simulation)
+
+
+def test_fork_runs_each_variant_from_the_checkpoint():
+    data = snapshot(started())
+    serial = fork(data, [None, low_supply], processes=1)
+    assert fork(data, [None, low_supply], processes=2) == serial
+    assert serial[0] == run_fork(data)
+    assert serial[1]["charged_energy"] < serial[0]["charged_energy"]  # The variant ran on less power
+    uninterrupted = run(FlexibilitySimulation, RandomSupplyProfile(random.Random(6)), sessions=100)
+    assert serial[0]["completed"] == len(uninterrupted.completed_requests)
+    assert serial[0] == {**summarize(uninterrupted), "steps": serial[0]["steps"]}
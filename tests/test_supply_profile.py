@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from SupplyProfile import ArraySupplyProfile, CsvSupplyProfile, SupplyProfile
+
+
+def write_profile(path, values, minutes=None):
+    lines = ["minute,capacity_kw"] if minutes is not None else ["capacity_kw"]
+    for index, value in enumerate(values):
+        lines.append(f"{minutes[index]},{value}" if minutes is not None else f"{value}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_array_profile_interpolates_between_samples_and_holds_the_ends():
+    profile = ArraySupplyProfile(np.array([10.0, 20.0, 40.0]), resolution_minutes=15, start_minute=30)
+    assert [profile.capacity_at(minute) for minute in (0, 30, 37.5, 45, 52.5, 60, 90)] == [
+        10.0, 10.0, 15.0, 20.0, 30.0, 40.0, 40.0]
+
+
+def test_array_profile_holds_the_previous_sample_without_interpolation():
+    profile = ArraySupplyProfile([10.0, 20.0, 40.0], resolution_minutes=15, interpolate=False)
+    assert [profile.capacity_at(minute) for minute in (0, 14.9, 15, 29, 31)] == [10.0, 10.0, 20.0, 20.0, 40.0]
+
+
+def test_array_profile_rejects_empty_series_and_bad_resolution():
+    with pytest.raises(ValueError):
+        ArraySupplyProfile([], 15)
+    with pytest.raises(ValueError):
+        ArraySupplyProfile([1.0], 0)
+
+
+def test_memory_mapped_profiles_read_one_site(tmp_path):
+    sites = np.array([[10.0, 20.0], [30.0, 50.0]], dtype=np.float32)
+    np.save(tmp_path / "sites.npy", sites)
+    sites.tofile(tmp_path / "sites.bin")
+    from_npy = ArraySupplyProfile.from_npy(str(tmp_path / "sites.npy"), 60, site=1)
+    from_binary = ArraySupplyProfile.from_binary(str(tmp_path / "sites.bin"), 60, sites=2, site=1)
+    assert from_npy.capacity_at(30) == from_binary.capacity_at(30) == 40.0
+
+
+def test_csv_profile_matches_the_array_profile(tmp_path):
+    values = [12.0, 30.0, 18.0, 25.0]
+    csv_profile = CsvSupplyProfile(write_profile(tmp_path / "supply.csv", values), resolution_minutes=15)
+    array_profile = ArraySupplyProfile(values, resolution_minutes=15)
+    for minute in np.arange(0, 60, 2.5):
+        assert csv_profile.capacity_at(minute) == pytest.approx(array_profile.capacity_at(minute))
+
+
+def test_csv_profile_reads_sample_times_and_only_forward(tmp_path):
+    profile = CsvSupplyProfile(write_profile(tmp_path / "supply.csv", [10.0, 30.0], minutes=[0, 40]),
+                               minute_column="minute")
+    assert profile.capacity_at(10) == 15.0
+    assert profile.capacity_at(100) == 30.0
+    with pytest.raises(ValueError, match="forward"):
+        profile.capacity_at(50)
+
+
+def test_a_profile_without_capacity_at_cannot_be_created():
+    class Incomplete(SupplyProfile):
+        pass
+
+    with pytest.raises(TypeError, match="capacity_at"):
+        Incomplete()